@@ -32,11 +32,9 @@
 # Thanks for reading this! Have fun (I hope) playing this demented game!
 
 
-# high-level modules
-import Game
-import Text
-import Image
-
+# high-level modules (imported when first needed, see module: starting up only loads what the first screen uses)
+import importlib
+import prefetch
 import pickle
 import sys, os
 
@@ -56,14 +54,45 @@ L = 'labyrinth'
 
 ETYPES = {'T':T, 'I':I, 'L':L}
 FOLDERS = {T:'texts', I:'images', L:'labs'}
-MODULES = {T:Text, I:Image, L:Game}
+MODULES = {T:'Text', I:'Image', L:'Game'}
+
+def module(etype):
+    'returns the high-level module managing the given etype (importing it if needed)'
+    return importlib.import_module(MODULES[etype])
+
+PREFETCHDEPTH = 2         # number of screens loaded ahead, by default
+PREFETCHBUDGET = 16 << 20 # bytes of data loaded ahead, by default
 
 import time
 def start(scenario, settings={}):
-    """Yet another load function: turn a list into a playable scenario"""
-    for etype, filename in scenario:
-        fullfile = os.path.join(FOLDERS[etype], filename)
-        MODULES[etype].load( fullfile, settings )
+    """Yet another load function: turn a list into a playable scenario.
+    While a screen is displayed, the next ones are read in the background (see prefetch).
+    The settings may set:
+    * the number of screens read ahead ("PrefetchDepth", 0 to read each one when reached)
+    * the memory budget of the screens read ahead ("PrefetchBudget", in bytes)
+    * the memory budget of the assets (images, texts), in bytes: "AssetBudget"."""
+    if "AssetBudget" in settings:
+        import assets
+        assets.manager().setbudget(settings["AssetBudget"])
+    steps = [(etype, os.path.join(FOLDERS[etype], filename)) for etype, filename in scenario]
+    prefetcher = prefetch.Prefetcher(steps, prefetchstep, footprint,
+                                     settings.get("PrefetchDepth", PREFETCHDEPTH),
+                                     settings.get("PrefetchBudget", PREFETCHBUDGET))
+    try:
+        for index, (etype, fullfile) in enumerate(steps):
+            module(etype).show( prefetcher.get(index)[1], settings )
+    finally:
+        prefetcher.stop()
+
+def prefetchstep(step):
+    'read (and parse) the file of one step of a scenario, returning its etype and data (see start)'
+    etype, fullfile = step
+    return etype, module(etype).prefetch(fullfile)
+
+def footprint(stepdata):
+    'returns the memory used by the data of one step, as returned by prefetchstep (in bytes)'
+    etype, data = stepdata
+    return module(etype).footprint(data)
 
 def read_scenario(filename):
     'read a scenario from a file'
@@ -89,13 +118,12 @@ def load(filename, settings):
 if __name__ == '__main__':
     filename = 'scenario/default.txt'
     settings = {}
-    if len(sys.argv) > 1:
-	if sys.argv[1] == '-k':
+    for arg in sys.argv[1:]:
+	if arg == '-k':
 	    settings["UseAzerty"] = True
+	elif arg == '-w': # (reload the labyrinths when their files change: see labwatch)
+	    settings["Watch"] = True
 	else:
-            filename = sys.argv[1]
-    if len(sys.argv) > 2:
-	if sys.argv[2] == '-k':
-	    settings["UseAzerty"] = True
+            filename = arg
     load(filename, settings)
     sys.exit(0)
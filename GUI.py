@@ -1,11 +1,15 @@
 # Main GUI module, used to draw the maze, the player and the goal.
+# Labyrinths larger than the screen scroll: the camera follows the player, and only the blocks of tiles around the
+# screen are rendered (see visibleblocks). OVERVIEWKEY toggles a zoomed-out view of the whole XY plane, and HINTKEY
+# the hints: the moves that get closer to the goal (see distfield) are highlighted.
 
+import assets
+import cache
 import geometry as geo
 
 import pygame
 import pygame.draw
-pygame.init()
-pygame.mouse.set_visible(False)
+import struct
 
 
 
@@ -15,107 +19,236 @@ SCRH = 240
 TILE = 40
 BOTTOMMARGIN = 10
 RIGHTMARGIN  = 10
+LAYERBUDGET = 8 << 20 # bytes of rendered boards kept in memory (see assets.cost)
+BLOCKW = SCRW/TILE # size (in tiles) of the blocks rendered separately, when the labyrinth scrolls
+BLOCKH = SCRH/TILE
+MARGIN = 1 # tiles rendered beyond the edges of the screen, when the labyrinth scrolls
+EDGE = 4   # pixels left between the border of a scrolling labyrinth and the edges of the screen
+OVERVIEWKEY = pygame.K_m
+HINTKEY = pygame.K_h
 
 
-# constants for the images and fonts (loaded once!)
-GOALIMAGE = pygame.image.load("images/star.gif")
-SELECTIMAGE = pygame.image.load("images/selection.gif")
-VICTFONT = pygame.font.Font('orbitron.ttf', 40)
-ROTAFONT = pygame.font.Font('orbitron.ttf', 13)
+# images and font sizes (loaded once, by the shared asset manager: see assets)
+GOALFILE = "images/star.gif"
+SELECTFILE = "images/selection.gif"
+VICTSIZE = 40
+ROTASIZE = 13
+OVERLAYSIZE = 10
 
 class GUI:
     "Main GUI class"
     def __init__(self, lab):
         'create a GUI with screen'
+        assets.setup()
         self.lab = lab
-        self.xdim = self.lab.size[0]
-        self.ydim = self.lab.size[1]
         self.screen = pygame.display.set_mode((SCRW, SCRH))
+        self.assets = assets.manager()
+        self.textalpha = self.screen.get_bitsize() > 8 # (a palettized display has no alpha to convert the texts to)
+        self.selectrect = self.assets.image(SELECTFILE, convert=False).get_rect(top=0,right=SCRW)
         self.colorman = ColorMan(self.lab.size)
-        # compute square dimensions for the grid
-        w, h = self.xdim*TILE, self.ydim*TILE
-        self.gridrect = pygame.Rect(SCRW/2-w/2, SCRH/2-h/2, w, h)
+        self.layout()
+        self.overview = False # if True, show the whole XY plane, zoomed out (see drawoverview)
+        self.showhints = False # if True, show the moves that get closer to the goal (see togglehints)
+        self.distances = None  # distance field of the labyrinth, once needed for the hints
+        # rendered boards, by orientation, color coordinates and filter (see draw)
+        self.layers = cache.LRUCache(maxcost=LAYERBUDGET)
+        self.labversion = self.lab.version
+        # what was drawn last frame (see draw)
+        self.lastscene = self.lastsprite = self.lastselection = None
+        self.goalkey = self.drawgoal = None # visibility of the goal, and the color coordinates it was computed for
+        self.key = self.keycolor = None # key of the last board drawn (see draw), and the color of the player there
+        self.overlayrect = None # area covered by the diagnostics overlay, if shown (see overlay)
+        self.overlaylines = self.overlaysurface = None
         # additional constants and attributes
         self.selectioncolor = [None, None, (255,0,0), (0,255,0), (0,0,255)]
+        self.filters = [None, None, (1,0,0), (0,1,0), (0,0,1)] # filter of every selection (see draw)
+        self.colordims = tuple(range(2, self.lab.ndim))
         self.won = False # if True, victory mode
 	self.rotation = 0 # current rotation state
+        self.buildstatics()
 
-    def draw(self, player, selection=2, usefilter=False):
-	"""draw the full scene. The following parameters apply:
+    def layout(self):
+        """compute where the grid is drawn on the screen (from the size of the XY plane). A grid larger than the
+        screen scrolls: it is then moved by the camera (see follow), and drawn by blocks (see visibleblocks)."""
+        self.xdim = self.lab.size[0]
+        self.ydim = self.lab.size[1]
+        # compute square dimensions for the grid
+        w, h = self.xdim*TILE, self.ydim*TILE
+        self.gridrect = pygame.Rect(SCRW/2-w/2, SCRH/2-h/2, w, h)
+        self.boardrect = self.gridrect.inflate(8, 8) # leave room for the border
+        self.scrolling = w > SCRW or h > SCRH
+        # size of the tiles in overview, so that the whole XY plane fits on the screen
+        self.overviewtile = max(1, min(TILE, (SCRW-2*EDGE)/self.xdim, (SCRH-2*EDGE)/self.ydim))
+        w, h = self.xdim*self.overviewtile, self.ydim*self.overviewtile
+        self.overviewrect = pygame.Rect(SCRW/2-w/2, SCRH/2-h/2, w, h)
+
+    def buildstatics(self):
+        """pre-render (in the display format) everything that does not change while playing:
+        the empty grid, the goal, the selection swatches, the rotation letters and the victory banner.
+        Must be called again when the lab changes size or orientation."""
+        self.statics = {}
+        # empty grid (border and lines), on which the boards are drawn (the blocks draw their own, see renderblock)
+        if not self.scrolling:
+            grid = pygame.Surface(self.boardrect.size).convert()
+            self.drawgrid(grid, self.gridrect.move(-self.boardrect.left, -self.boardrect.top))
+            self.statics['grid'] = grid
+        self.statics['goal'] = self.assets.image(GOALFILE, convert=False) # (colorkeyed: see assets.image)
+        # selection box, for every color dimension (the colorkeyed frame is blitted over it: see paintinfo)
+        swatches = {}
+        for selection in range(2, len(self.selectioncolor)):
+            s = pygame.Surface(size=(TILE, TILE))
+            s.fill(self.selectioncolor[selection])
+            swatches[selection] = s.convert()
+        self.statics['swatches'] = swatches
+        self.statics['select'] = self.assets.image(SELECTFILE, convert=False)
+        self.statics['letters'] = [self.assets.text(letter, ROTASIZE, (255,255,255), alpha=self.textalpha)
+                                   for letter in "XYRGB"[:self.lab.ndim]] # select only interesting letters
+        self.statics['banner'] = self.assets.text("SUCCESS!", VICTSIZE, (255,255,0), alpha=self.textalpha)
+
+    def draw(self, player, selection=2, usefilter=False, others=(), lag=0.0):
+	"""draw the scene. The following parameters apply:
 	* selection is the currently selected color (to display topright);
-	* usefilter tells if all the other colors must be filtered."""
-        self.screen.fill((0,0,0))
+	* usefilter tells if all the other colors must be filtered;
+	* others are the other players (of a networked game, see netplay): those on the same floor are drawn too;
+	* lag is the time since the last logic step, in steps (0<=lag<1): the animations are drawn that much further.
+	Only the parts of the screen that changed since the last call are redrawn (see paint)."""
         # first, pre-compute filter
         if not usefilter:
             filter = (1,1,1)
         else:
-            filter = [0,0,0]
-            filter[selection-2] = 1
-        # draw the rectangle
-        pygame.draw.rect(self.screen, (255,255,255), self.gridrect, 4)
-        for x in range(self.gridrect.left+TILE/2,self.gridrect.right,TILE/2):
-            pygame.draw.line(self.screen, (255,255,255), (x,self.gridrect.bottom), (x, self.gridrect.top), 2)
-        for y in range(self.gridrect.top+TILE/2,self.gridrect.bottom,TILE/2):
-            pygame.draw.line(self.screen, (255,255,255), (self.gridrect.left,y), (self.gridrect.right,y))
-        # draw all the tiles
-        for x in range(1,self.xdim+1):
-            for y in range(1,self.ydim+1):
-                # draw tile
-                fullpos = self.lab.fulluppermost(x, y, player.pos)
-                color = self.colorman.getcolor(fullpos[2:], filter)
-                if color != (0,0,0):
-                    pygame.draw.rect(self.screen, color, self.gettilepos(x,y))
+            filter = self.filters[selection]
+        # the board (grid and tiles) and the visibility of the goal only depend on the color coordinates
+        # of the player, the orientation and the filter: reuse them while the player walks on the XY plane
+        # (the key is kept too, with the color of the player: a frame on the same floor allocates next to nothing)
+        # (the statics only change with the orientation, and are rendered again by rotate)
+        if self.labversion != self.lab.version:
+            self.layers.clear()
+            self.goalkey = self.key = None
+            self.labversion = self.lab.version
+        key = self.key
+        if key is None or key[2] != filter or not self.samefloor(player.pos, key[1]):
+            key = self.key = (self.rotation, tuple(player.pos[2:]), tuple(filter))
+            self.keycolor = self.colorman.getcolor(key[1], filter)
+        if key != self.goalkey:
+            self.drawgoal = self.goalvisible(player.pos)
+            self.goalkey = key
+        drawgoal = self.drawgoal
+        if self.overview:
+            self.drawoverview(player, selection, filter, key, others)
+            return
+
+        # compute where and how to draw the player
+        pos = self.spritepos(player, lag)
+        color = self.keycolor
+        if player.animation and player.animation.dim >= 2:
+            # partial color feedback
+            color = list(self.colorman.getcolor(player.animation.pos[2:], filter))
+            addcomp = self.colorman.incomplete(player.animation.dim, player.animation.completion(lag))
+            color[player.animation.dim-2] += addcomp * player.animation.mov # -2 since we need to work in color dimensions
+            color[player.animation.dim-2] = min(255, max(0, color[player.animation.dim-2])) # truncature
+
+        # the boards to draw: the whole grid at once, or (when scrolling) the blocks around the screen
+        if self.scrolling:
+            pos = self.follow(pos)
+            boards = self.visibleblocks(player.pos, filter, key)
+        else:
+            board = self.layers.get(key)
+            if board is None:
+                board = self.renderlayer(player.pos, filter)
+                self.layers.put(key, board, assets.cost(board))
+            boards = [(board, self.boardrect)]
+        # (and the other players on the same floor, with their own color)
+        remote = ()
+        if others:
+            remote = tuple((self.spritepos(other, lag), self.colorman.getcolor(other.pos[2:], filter))
+                           for other in others if other.pos[2:] == player.pos[2:])
+        # the hints: tiles to highlight (XY moves) and letters of the color dimensions, with the direction
+        hints = ((), ())
+        if self.showhints:
+            moves = self.distances.hints(self.lab, player.pos)
+            x, y = player.pos[0:2]
+            hints = (tuple(tuple(self.gettilepos(x+mov*(dim == 0), y+mov*(dim == 1)).inflate(-TILE/2, -TILE/2))
+                           for dim, mov in moves if dim < 2),
+                     tuple("XYRGB"[self.lab.axes[dim]] + ('+' if mov > 0 else '-') for dim, mov in moves if dim >= 2))
+
+        # now, find out what changed since the last frame
+        scene = (key, self.labversion, self.won, self.gridrect.topleft, self.overview, hints)
+        sprite = (pos, tuple(color), remote)
+        if scene != self.lastscene:
+            # new board (or victory, or hints): everything must be redrawn
+            self.paint(boards, drawgoal, pos, color, selection, remote, hints)
+            pygame.display.flip()
+        else:
+            rects = []
+            if sprite != self.lastsprite:
+                rects.append(self.spriterect(self.lastsprite[0]))
+                rects.append(self.spriterect(pos))
+                if remote != self.lastsprite[2]:
+                    rects += [self.spriterect(where) for where, othercolor in self.lastsprite[2] + remote]
+            if selection != self.lastselection:
+                rects.append(self.selectrect)
+            for rect in rects:
+                self.screen.set_clip(rect)
+                self.paint(boards, drawgoal, pos, color, selection, remote, hints)
+            self.screen.set_clip(None)
+            if rects:
+                pygame.display.update(rects)
+        self.lastscene, self.lastsprite, self.lastselection = scene, sprite, selection
+
+    def paint(self, boards, drawgoal, pos, color, selection, remote=(), hints=((), ())):
+        """paint the full scene on the screen, given the boards (with where to blit them), the player's on-screen
+        position and color, the selected color, the on-screen positions and colors of the other players, and the
+        hints (see draw). Painting is restricted to the clipping area of the screen, if any."""
+        self.screen.fill((0,0,0))
+        if self.scrolling:
+            # (the blocks only hold the inner half of the border: see renderblock)
+            pygame.draw.rect(self.screen, (255,255,255), self.gridrect, 4)
+        for board, rect in boards:
+            self.screen.blit(board, rect)
 
         # draw player and goal
         # draw the goal at good position (before, so it appears under the player)
-        x,y = self.lab.goalpos[0:2]
-        atgoalpos = self.lab.fulluppermost(x, y, player.pos)
-        # basically, we can draw the goal iff no block is over it, iff fullpos < cpos for dimensions higher than 2,
-        # and if the position is the same as the player (that's a lot of conditions, yeah!)
-        drawgoal = True
-        for dim in range(2, self.lab.ndim):
-            if atgoalpos[dim] >= self.lab.goalpos[dim] or self.lab.goalpos[dim] != player.pos[dim]:
-                drawgoal = False
-                break
         if drawgoal:
+            x,y = self.lab.goalpos[0:2]
             rect = self.gettilepos(x, y).move(TILE/2, TILE/2)
-            self.screen.blit(GOALIMAGE,GOALIMAGE.get_rect(centerx=rect.left, centery=rect.top))
-
-        # draw player
-        pos = player.pos
-        if player.animation:
-            pos = player.animation.pos
-        pos = self.gettilepos(pos[0], pos[1]).center
-        color = self.colorman.getcolor(player.pos[2:], filter)
-        if player.animation:
-            # partial position feedback
-            if player.animation.dim < 2:
-                pos = list(pos) # modifiable type
-                pos[ player.animation.dim ] += int( player.animation.mov * TILE * player.animation.completion() )
-            # partial color feedback
-            else:
-                color = list(self.colorman.getcolor(player.animation.pos[2:], filter))
-                addcomp = self.colorman.incomplete(player.animation.dim, player.animation.completion())
-                color[player.animation.dim-2] += addcomp * player.animation.mov # -2 since we need to work in color dimensions
-                color[player.animation.dim-2] = min(255, max(0, color[player.animation.dim-2])) # truncature
+            goal = self.statics['goal']
+            self.screen.blit(goal,goal.get_rect(centerx=rect.left, centery=rect.top))
+
+        # highlight the hints (under the players)
+        for rect in hints[0]:
+            pygame.draw.rect(self.screen, (255,255,0), rect, 2)
+        top = self.selectrect.bottom + 2
+        for label in hints[1]:
+            text = self.assets.text(label, ROTASIZE, (255,255,0), alpha=self.textalpha)
+            top = self.screen.blit(text, text.get_rect(right=self.selectrect.right, top=top)).bottom
+
+        # draw the other players (under the player, smaller and with a grey outline)
+        for where, othercolor in remote:
+            pygame.draw.circle(self.screen, othercolor, where, TILE/2-4)
+            pygame.draw.circle(self.screen, (128,128,128), where, TILE/2-4, 2)
+
         # draw the player at correct position, and with good color (other position information, sorta)
         pygame.draw.circle(self.screen, color, pos, TILE/2)
         pygame.draw.circle(self.screen, (255,255,255), pos, TILE/2, 2)
 
-        # finally, draw selection information in top right corner and rotation information bottom right corner
+        # finally, draw selection and rotation information
+        self.paintinfo(selection)
+
+        # super-finally, if you won, make it known
+        if self.won:
+            text = self.statics['banner']
+            self.screen.blit(text, text.get_rect(center=(SCRW/2, SCRH/2)))
+
+    def paintinfo(self, selection):
+        'draw selection information in top right corner and rotation information bottom right corner'
 	# selection
-        rect = SELECTIMAGE.get_rect(top=0,right=SCRW)
-        s = pygame.Surface(size=(TILE, TILE))
-        s.fill(self.selectioncolor[selection])
-        self.screen.blit(s, rect)
-        self.screen.blit(SELECTIMAGE, rect)
+        self.screen.blit(self.statics['swatches'][selection], self.selectrect)
+        self.screen.blit(self.statics['select'], self.selectrect)
 	# rotation
-	text = "XYRGB" [:self.lab.ndim] # select only interesting letters
 	beginning = self.rotation    # variable that detects the offset of marking frame 
 	current = self.lab.ndim # special marker to detect begininning of marking frame
 	roffset = RIGHTMARGIN # offset to the right for the current letter
-	for letter in text[::-1]: # reverse text
-		rlet = ROTAFONT.render(letter,1,(255,255,255))
+	for rlet in self.statics['letters'][::-1]: # reverse text
 		self.screen.blit(rlet, rlet.get_rect(right=SCRW-roffset,bottom=SCRH-BOTTOMMARGIN))
 		roffset += (RIGHTMARGIN+rlet.get_rect().width)
 		current -= 1
@@ -140,12 +273,234 @@ class GUI:
 		pygame.draw.rect(self.screen, (255,255,255), 
 				rect.move( (1-self.lab.ndim)*(rlet.get_rect().width+RIGHTMARGIN)-2,0), 2)
 
-        # super-finally, if you won, make it known
+    def drawoverview(self, player, selection, filter, key, others=()):
+        """draw the whole XY plane, zoomed out to fit on the screen (see layout), with the player and the goal.
+        The screen is redrawn when anything changes (the player is drawn on its tile, without animation)."""
+        okey = ('overview',) + key
+        board = self.layers.get(okey)
+        if board is None:
+            board = self.renderoverview(player.pos, filter)
+            self.layers.put(okey, board, assets.cost(board))
+        scene = (key, self.labversion, self.won, None, self.overview)
+        remote = tuple((tuple(other.pos[:2]), self.colorman.getcolor(other.pos[2:], filter))
+                       for other in others if other.pos[2:] == player.pos[2:])
+        sprite = (tuple(player.pos[:2]), self.colorman.getcolor(player.pos[2:], filter), remote)
+        if (scene, sprite, selection) == (self.lastscene, self.lastsprite, self.lastselection):
+            return
+        t = self.overviewtile
+        self.screen.fill((0,0,0))
+        pygame.draw.rect(self.screen, (255,255,255), self.overviewrect.inflate(2, 2), 1)
+        self.screen.blit(board, self.overviewrect)
+        if self.drawgoal:
+            x,y = self.lab.goalpos[0:2]
+            goal = pygame.Rect(self.overviewrect.left+(x-1)*t, self.overviewrect.top+(y-1)*t, t, t)
+            pygame.draw.rect(self.screen, (255,255,0), goal.inflate(2, 2), 1)
+        radius = max(2, t/2)
+        sprites = [(where, color, (128,128,128)) for where, color in remote] + [sprite[:2] + ((255,255,255),)]
+        for (x, y), color, outline in sprites: # (the other players first, under the player)
+            center = (self.overviewrect.left+(x-1)*t+t/2, self.overviewrect.top+(y-1)*t+t/2)
+            pygame.draw.circle(self.screen, color, center, radius)
+            pygame.draw.circle(self.screen, outline, center, radius, 1)
+        self.paintinfo(selection)
         if self.won:
-            text = VICTFONT.render("SUCCESS!", 1, (255,255,0))
+            text = self.statics['banner']
             self.screen.blit(text, text.get_rect(center=(SCRW/2, SCRH/2)))
-        # flip display
         pygame.display.flip()
+        self.lastscene, self.lastsprite, self.lastselection = scene, sprite, selection
+
+    def handle(self, events):
+        'check the events for the hotkeys of the display (overview, hints)'
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == OVERVIEWKEY:
+                self.overview = not self.overview
+                self.invalidate()
+            elif event.type == pygame.KEYDOWN and event.key == HINTKEY:
+                self.togglehints()
+
+    def togglehints(self):
+        """show (or hide) the moves that get closer to the goal. The distance field of the labyrinth is computed
+        (or read from the cache, see distfield) the first time: not for a chunked labyrinth, which has no hints."""
+        import distfield
+        if not distfield.supports(self.lab):
+            return
+        if self.distances is None:
+            self.distances = distfield.load(self.lab)
+        self.showhints = not self.showhints
+
+    def reloaded(self):
+        """the blocks (or the goal) of the labyrinth changed (see labwatch): its distance field is computed again,
+        if shown (the boards are rendered again anyway, since its version changed)"""
+        import distfield
+        if self.distances is not None:
+            self.distances = distfield.load(self.lab) if self.showhints else None
+
+    def overlay(self, lines):
+        """draw the given lines of text (diagnostics, see frameprofiler) in the top left corner of the screen,
+        over the scene just drawn. When there are no more lines (None), the scene is drawn again."""
+        if not lines:
+            if self.overlayrect:
+                self.invalidate()
+                self.overlayrect = self.overlaylines = None
+            return
+        if lines is not self.overlaylines:
+            # render the lines (only when they change)
+            font = self.assets.font(OVERLAYSIZE)
+            rendered = [font.render(line, 1, (255,255,255)) for line in lines]
+            height = font.get_linesize()
+            surface = pygame.Surface((max(text.get_width() for text in rendered)+4, len(rendered)*height+4))
+            for i, text in enumerate(rendered):
+                surface.blit(text, (2, 2+i*height))
+            self.overlaysurface = surface.convert()
+            self.overlaylines = lines
+        rect = self.screen.blit(self.overlaysurface, (0, 0))
+        # (the scene is only partially redrawn between frames: also clear what the last overlay covered)
+        if self.overlayrect and not rect.contains(self.overlayrect):
+            self.invalidate()
+        self.overlayrect = rect
+        pygame.display.update(rect)
+
+    def spritepos(self, player, lag=0.0):
+        """returns the on-screen center of player (partway to the next tile, while it moves on the XY plane),
+        lag steps after its current animation frame (see draw), as a tuple"""
+        animation = player.animation
+        pos = animation.pos if animation else player.pos
+        # (the center of gettilepos, without building its Rect)
+        x = self.gridrect.left + (pos[0]-1)*TILE + TILE/2
+        y = self.gridrect.top + (pos[1]-1)*TILE + TILE/2
+        if animation and animation.dim < 2:
+            shift = int( animation.mov * TILE * animation.completion(lag) )
+            if animation.dim == 0:
+                x += shift
+            else:
+                y += shift
+        return (x, y)
+
+    def samefloor(self, pos, floor):
+        'determines if the color coordinates of the position pos are floor (a tuple), without copying them'
+        for i in self.colordims:
+            if pos[i] != floor[i-2]:
+                return False
+        return True
+
+    def spriterect(self, pos):
+        'returns the area covered by the player drawn with given on-screen center'
+        return pygame.Rect(0, 0, TILE+2, TILE+2).move(pos[0]-TILE/2-1, pos[1]-TILE/2-1)
+
+    def invalidate(self):
+        'force the next call to draw to redraw the full screen'
+        self.lastscene = None
+
+    def renderlayer(self, pos, filter):
+        """render the board (grid and tiles) as seen from the color coordinates of pos, with given filter.
+        Returns the board (to blit at boardrect)."""
+        board = self.statics['grid'].copy()
+        self.filltiles(board, self.gridrect.move(-self.boardrect.left, -self.boardrect.top).topleft,
+                       self.tilecolors(pos, filter, 1, 1, self.xdim, self.ydim), self.xdim)
+        return board
+
+    def renderblock(self, pos, filter, bx, by):
+        """render the block (bx, by) of the board (BLOCKW x BLOCKH tiles, see visibleblocks) as seen from the color
+        coordinates of pos, with given filter. The block is drawn as the same part of the board drawn by
+        renderlayer: only the outer half of the border is missing (see paint)."""
+        area = pygame.Rect(bx*BLOCKW*TILE, by*BLOCKH*TILE,
+                           min(BLOCKW, self.xdim-bx*BLOCKW)*TILE, min(BLOCKH, self.ydim-by*BLOCKH)*TILE)
+        block = pygame.Surface(area.size).convert()
+        self.drawgrid(block, self.gridrect.move(-self.gridrect.left-area.left, -self.gridrect.top-area.top), area)
+        width, height = area.width/TILE, area.height/TILE
+        self.filltiles(block, (0, 0), self.tilecolors(pos, filter, bx*BLOCKW+1, by*BLOCKH+1, width, height), width)
+        return block
+
+    def renderoverview(self, pos, filter):
+        'render the whole XY plane as seen from the color coordinates of pos, with given filter (see drawoverview)'
+        # one pixel per tile, scaled at once (the tiles of the overview are small, and many)
+        packed = self.colorman.packed
+        pixels = b''.join([packed[color] for color in self.tilecolors(pos, filter, 1, 1, self.xdim, self.ydim)])
+        board = pygame.image.fromstring(pixels, (self.xdim, self.ydim), 'RGB').convert()
+        if self.overviewtile != 1:
+            board = pygame.transform.scale(board, self.overviewrect.size)
+        return board
+
+    def tilecolors(self, pos, filter, x0, y0, width, height):
+        """returns the colors of the tiles (x0, y0) to (x0+width-1, y0+height-1) as seen from the color coordinates
+        of pos, with given filter, row by row. They are looked up in the palette of the filter (see
+        ColorMan.palette): only the uppermost tiles are searched for every tile."""
+        palette = self.colorman.palette(filter)
+        uppermost = self.lab.fulluppermost
+        colors = []
+        tilepos = [0] * self.lab.ndim # (written by fulluppermost for every tile)
+        for y in range(y0, y0+height):
+            for x in range(x0, x0+width):
+                colorpos = tuple(uppermost(x, y, pos, tilepos)[2:])
+                color = palette.get(colorpos)
+                if color is None:
+                    color = palette[colorpos] = self.colorman.getcolor(colorpos, filter)
+                colors.append(color)
+        return colors
+
+    def filltiles(self, surface, topleft, colors, width):
+        """fill the tiles of given colors (see tilecolors, width tiles per row) on surface, the first one at topleft.
+        Empty (black) tiles are left as they are (showing the grid)."""
+        left, top = topleft
+        for i, color in enumerate(colors):
+            if color != (0,0,0):
+                surface.fill(color, (left+(i%width)*TILE, top+(i/width)*TILE, TILE, TILE))
+
+    def drawgrid(self, surface, gridrect, area=None):
+        """draw the empty grid (border and lines) on surface, where the grid covers gridrect. Only the lines
+        crossing area (in the coordinates of the grid, default: all of it) are drawn."""
+        if area is None:
+            area = pygame.Rect(0, 0, gridrect.width, gridrect.height)
+        pygame.draw.rect(surface, (255,255,255), gridrect, 4)
+        left = max(TILE/2, (area.left-2)/(TILE/2)*(TILE/2))
+        for x in range(gridrect.left+left,gridrect.left+min(gridrect.width,area.right+3),TILE/2):
+            pygame.draw.line(surface, (255,255,255), (x,gridrect.bottom), (x, gridrect.top), 2)
+        top = max(TILE/2, (area.top-2)/(TILE/2)*(TILE/2))
+        for y in range(gridrect.top+top,gridrect.top+min(gridrect.height,area.bottom+3),TILE/2):
+            pygame.draw.line(surface, (255,255,255), (gridrect.left,y), (gridrect.right,y))
+
+    def visibleblocks(self, pos, filter, key):
+        """returns the blocks of the board on (or within MARGIN tiles of) the screen, rendered as seen from the
+        color coordinates of pos, with given filter (key identifies them, see draw), with where to blit them.
+        Only these blocks are rendered: the cost of a frame depends on the size of the screen, not of the labyrinth."""
+        view = pygame.Rect(0, 0, SCRW, SCRH).inflate(2*MARGIN*TILE, 2*MARGIN*TILE)
+        x0 = max(1, (view.left-self.gridrect.left)/TILE+1)
+        x1 = min(self.xdim, (view.right-1-self.gridrect.left)/TILE+1)
+        y0 = max(1, (view.top-self.gridrect.top)/TILE+1)
+        y1 = min(self.ydim, (view.bottom-1-self.gridrect.top)/TILE+1)
+        boards = []
+        for by in range((y0-1)/BLOCKH, (y1-1)/BLOCKH+1):
+            for bx in range((x0-1)/BLOCKW, (x1-1)/BLOCKW+1):
+                block = self.layers.get(key + (bx, by))
+                if block is None:
+                    block = self.renderblock(pos, filter, bx, by)
+                    self.layers.put(key + (bx, by), block, assets.cost(block))
+                boards.append((block, self.gettilepos(bx*BLOCKW+1, by*BLOCKH+1)))
+        return boards
+
+    def follow(self, pos):
+        """move the camera (the grid, on the screen) so that the player, drawn at the on-screen position pos,
+        is at the center of the screen, without showing more than EDGE pixels past the border of the grid.
+        Only along the axes where the grid is larger than the screen. Returns the new on-screen position."""
+        left, top = self.gridrect.topleft
+        if self.gridrect.width > SCRW:
+            left = max(SCRW-EDGE-self.gridrect.width, min(EDGE, left + SCRW/2-pos[0]))
+        if self.gridrect.height > SCRH:
+            top = max(SCRH-EDGE-self.gridrect.height, min(EDGE, top + SCRH/2-pos[1]))
+        dx, dy = left-self.gridrect.left, top-self.gridrect.top
+        self.gridrect.topleft = (left, top)
+        self.boardrect = self.gridrect.inflate(8, 8)
+        return (pos[0]+dx, pos[1]+dy)
+
+    def goalvisible(self, pos):
+        'returns whether the goal is visible, from the color coordinates of pos'
+        # basically, we can draw the goal iff no block is over it, iff fullpos < cpos for dimensions higher than 2,
+        # and if the position is the same as the player (that's a lot of conditions, yeah!)
+        x,y = self.lab.goalpos[0:2]
+        atgoalpos = self.lab.fulluppermost(x, y, pos)
+        for dim in range(2, self.lab.ndim):
+            if atgoalpos[dim] >= self.lab.goalpos[dim] or self.lab.goalpos[dim] != pos[dim]:
+                return False
+        return True
 
     def gettilepos(self, x, y):
         'returns a Rect for the (x,y) position'
@@ -163,11 +518,10 @@ class GUI:
 	self.colorman.rotate(forward)
 	self.rotation = (self.rotation+1) % self.lab.ndim
 	# change x and y limits (note that the maze has already located)
-	self.xdim = self.lab.size[0]
-	self.ydim = self.lab.size[1]
-        # compute square dimensions for the grid
-        w, h = self.xdim*TILE, self.ydim*TILE
-        self.gridrect = pygame.Rect(SCRW/2-w/2, SCRH/2-h/2, w, h)
+        self.layout()
+        self.layers.clear()
+        self.key = None
+        self.buildstatics()
 
 class ColorMan:
     'Manages conversion between position in the color dimensions to actual on-screen color'
@@ -177,6 +531,8 @@ class ColorMan:
             raise NotImplemented('Sorry! No more than 5 dimensions are currently supported!')
     # compute the color step for every color (EDIT: every dimension, due to rotation!)
         self.colorstep = [255/clim for clim in fulllims]
+        self.palettes = {} # filter -> {color position: color} (see palette)
+        self.packed = PackedColors()
 
     def getcolor(self, colorpos, filter=(1,1,1)):
         'returns the color for the given color position (pos[2:]), using given filter'
@@ -185,6 +541,11 @@ class ColorMan:
             color[i] = self.colorstep[2+i] * colorpos[i] * filter[i]
         return tuple(color)
 
+    def palette(self, filter=(1,1,1)):
+        """returns the palette of given filter: a dictionary of the colors (see getcolor) by color position, filled
+        as they are needed"""
+        return self.palettes.setdefault(tuple(filter), {})
+
     def incomplete(self, dim, fraction):
         'returns the increment in color due to a given motion in direction dim, of current fraction'
         return int(fraction*self.colorstep[dim])
@@ -193,3 +554,11 @@ class ColorMan:
     def rotate(self, forward=True):
 	"rotate the various vectors inside the color manager"
 	self.colorstep = geo.rotate1(self.colorstep, forward)
+	self.palettes.clear()
+
+
+class PackedColors(dict):
+    'colors (RGB tuples) packed as RGB bytes, as needed by pygame.image.fromstring (packed once: see __missing__)'
+    def __missing__(self, color):
+        packed = self[color] = struct.pack('BBB', *color)
+        return packed
@@ -2,24 +2,36 @@
 
 import GUI
 import Labyrinth
+import assets
+import frameprofiler
 import geometry as geo
 
 import pygame
 import pygame.time
 import sys
+from timeit import default_timer as now
 
-FPS = 60 # nice and smooth babe
+FPS = 60 # logic steps per second (and frames drawn per second, at most, by default): nice and smooth babe
+MAXFRAMESKIP = 5 # most logic steps played before a frame is drawn (beyond that, the game slows down)
+IDLETIMEOUT = assets.IDLETIMEOUT # longest wait for an event when nothing moves, in ms (see Game.start)
 
-class Animation:
+class Animation(object):
     """very simple animation class.
     Animations are used to determine if the player is free to move or not,
     and if not to compute the progress (0<=p<1) of the current motion, for graphical purposes."""
+    __slots__ = ('i', 'n', 'dim', 'mov', 'pos')
+
     def __init__(self, initialpos, motion):
-	"create an animation with given initial position and motion"
+	"create an animation with given initial position (kept, not copied) and motion"
+        self.reset(initialpos, motion)
+
+    def reset(self, initialpos, motion):
+        'start this animation again, with given initial position and motion (see Player.animate). Returns self.'
         self.i = 0     # current frame
         self.n = FPS/3 # maximum number of frames
         self.dim, self.mov = motion
         self.pos = initialpos
+        return self
 
     def iterate(self):
 	"""computes state after one iteration, and returns the animation to use afterwards.
@@ -29,20 +41,27 @@ class Animation:
             return None
         return self
 
-    def completion(self):
-        'returns completion (between 0 and 1)'
-        return float(self.i)/self.n
+    def completion(self, lag=0.0):
+        """returns completion (between 0 and 1), lag (0<=lag<1) frames after the current one
+        (for drawing between the logic steps, see Game.start)"""
+        return (self.i+lag)/self.n
 
 
-class Player:
+class Player(object):
     """Player class: handles position, motion and animation. 
     This is mostly a placeholder to keep these three together.
     Not that this class does not have a move procedure, and relies on modification
-    of its internal arguments to update its position."""
+    of its internal arguments to update its position.
+    Nothing is allocated while playing: the animation is always the same object (reset at every move), and so are
+    the lists of the current and previous positions (see Game.step)."""
+    __slots__ = ('pos', 'motion', 'animation', 'previous', 'moving')
+
     def __init__(self, position):
         self.pos = position   # sort of a public variable
 	self.motion = None    # current state of motion of the Player (direction and amplitude of motion)
 	self.animation = None # animation state (determines if OK to move)
+        self.previous = list(position)    # (list reused for the next position, see Game.step)
+        self.moving = Animation(None, (0, 0)) # (animation reused for every move, see animate)
 
     # self-explanatory:
     def get_motion(self):
@@ -61,7 +80,8 @@ class Player:
             return None
         # if no animation, not currently moving
         if self.motion:
-            self.animation = Animation(list(self.pos), self.motion)
+            # (the animation starts from the current position: this list is not modified while it runs)
+            self.animation = self.moving.reset(self.pos, self.motion)
             return self.motion
         # else
         return None
@@ -163,10 +183,28 @@ class CustomMotionManager(MotionManager):
 
 class Game:
     """Main Maze playing class. Manages animation and display of the maze.
-    The settings control the keyset that is used."""
-    def __init__(self, lab, settings={}):
+    The settings control the keyset that is used.
+    Without display, the game runs headless: nothing is drawn, and the game logic is only run by calling step
+    (see the replay module, which also uses the "RecordTrace" setting to record the inputs of a live game).
+    When displayed, the time spent in every stage of the frames is measured (see frameprofiler).
+    The logic runs at a fixed rate, FPS steps per second of real time, whatever the rate at which the frames are
+    drawn: when drawing is slow, several steps are played before the next frame is drawn (at most the
+    "MaxFrameSkip" setting, beyond which the game slows down), and the frames drawn are counted in drawn.
+    Frames are drawn at most at the "MaxFPS" setting (default: FPS, 0 for no cap), the animations being drawn
+    between the steps.
+    When nothing moves, the game does not draw frames, but waits for events (for at most the "IdleTimeout"
+    setting, in ms: 0 never waits): the time spent waiting is kept in idle, in seconds.
+    With the "Server" setting (host:port), the game joins a networked game (see netplay): the logic of the game runs
+    on the server, and the other players are drawn too.
+    With the "Hints" setting, the moves that get closer to the goal are shown from the start (see GUI.togglehints).
+    With the "Watch" setting, the changes made to the (text) file of the labyrinth while playing are applied to it
+    (see labwatch): the player keeps its position (a change blocking it is refused). The file is checked every
+    "WatchPeriod" seconds."""
+    def __init__(self, lab, settings={}, display=True):
         self.lab = lab
-        self.gui = GUI.GUI(lab) # will display the maze
+        self.gui = GUI.GUI(lab) if display else None # will display the maze
+        if display and settings.get("Hints"):
+            self.gui.togglehints()
         # create player at initial pos (1,1,1,1,1,...)
         self.player = Player( [1] * lab.ndim )
 	if settings.get("UseAzerty"):
@@ -175,39 +213,190 @@ class Game:
             self.motman = MotionManager(self.player, lab.ndim)
         self.toanimate = True
         self.running = False
+        self.quit = False # if True, the player asked to exit the whole game
+        self.frame = 0    # number of frames (logic steps) played
+        self.drawn = 0    # number of frames drawn (see start)
+        self.maxfps = settings.get("MaxFPS", FPS)
+        self.maxframeskip = max(1, settings.get("MaxFrameSkip", MAXFRAMESKIP))
+        self.idletimeout = settings.get("IdleTimeout", IDLETIMEOUT)
+        self.idle = 0.0   # time spent waiting for events (see wait)
+        self.profiler = None # frame timers (see frameprofiler), only when displayed
+        if display and settings.get("FrameTimes", frameprofiler.FRAMES):
+            self.profiler = frameprofiler.FrameProfiler(settings)
+        self.client = None
+        if settings.get("Server"):
+            import netplay
+            self.client = netplay.Client(lab, netplay.parseaddress(settings["Server"]), self.player,
+                                         bool(settings.get("UseAzerty")))
+        self.watcher = None
+        self.watchperiod = None
+        if display and settings.get("Watch"):
+            import labwatch
+            if labwatch.supports(lab):
+                self.watcher = labwatch.Watcher(lab, player=self.player)
+                self.watchperiod = settings.get("WatchPeriod", labwatch.PERIOD)
+        self.recorder = None
+        if settings.get("RecordTrace"):
+            import replay
+            self.recorder = replay.Recorder(self, settings, settings["RecordTrace"])
 
     def start(self):
         'start this game'
         self.running = True
         clock = pygame.time.Clock()
-        while self.running:
-            # before all, check if the player has won:
-            if not self.player.animation and tuple(self.player.pos) == self.lab.goalpos:
-                self.victory()
-            self.events()
-	    # check if rotation is needed
-	    if self.motman.torotate:
-		self.rotate(True)
-		self.motman.torotate = False
-	    # manage motion and collision
-            motion = self.player.animate()
-            if motion:
-                dim, mov = motion
-                pos = list(self.player.pos)
-                pos[dim] += mov
-                if self.lab.isfree(pos):
-                    self.player.pos = pos
+        profiler = self.profiler
+        idle = False
+        period = 1.0/FPS
+        pending = []  # events not played yet (they are played by the next step)
+        lag = period  # real time not played yet, in seconds (the first frame plays a step)
+        last = now()
+        watched = last # (last check of the file of the labyrinth, see watch)
+        try:
+            while self.running:
+                if profiler:
+                    profiler.begin()
+                if idle:
+                    events = self.wait()
+                    if profiler:
+                        profiler.mark('idle')
+                    # (nothing moved while waiting: play a single step)
+                    lag, last = period, now()
                 else:
-                    self.player.animation = None
-	    # draw all
-            self.gui.draw(self.player,
-			  selection=self.motman.cdim,
-			  usefilter=self.motman.filtering)
-            clock.tick(FPS)
-
-    def events(self):
+                    events = pygame.event.get()
+                if profiler:
+                    profiler.handle(events)
+                self.gui.handle(events)
+                pending += events
+                if self.watcher and now() - watched >= self.watchperiod:
+                    self.watch()
+                    watched = now()
+                # play the steps due by now (a late frame plays several, up to maxframeskip: the rest is dropped)
+                current = now()
+                lag += current - last
+                last = current
+                steps = min(int(lag/period), self.maxframeskip)
+                lag = min(lag - steps*period, period*0.999)
+                for i in range(steps):
+                    if self.client:
+                        self.netstep(pending)
+                    else:
+                        self.step(pending)
+                    pending = []
+                    if not self.running:
+                        break
+	        # draw all (the animations go on between the steps)
+                self.gui.draw(self.player,
+			      selection=self.motman.cdim,
+			      usefilter=self.motman.filtering,
+			      others=self.client.others() if self.client else (),
+			      lag=lag/period)
+                self.drawn += 1
+                if profiler:
+                    profiler.mark('draw')
+                    self.gui.overlay(profiler.overlay() if profiler.showing else None)
+                    profiler.mark('overlay')
+                # the frames are only paced by the clock while something moves
+                idle = self.idletimeout and not pending and self.isidle()
+                if not idle and self.maxfps:
+                    clock.tick(self.maxfps)
+                if profiler:
+                    profiler.mark('wait')
+                    profiler.end()
+        finally:
+            if self.client:
+                self.client.close()
+            if self.recorder:
+                self.recorder.save()
+            if profiler:
+                profiler.close()
+        if self.quit:
+            sys.exit()
+
+    def wait(self):
+        """wait for the next events (or IDLETIMEOUT, if no event happens), and returns them.
+        Frames are not drawn meanwhile: see isidle."""
+        began = now()
+        events = assets.wait(self.idletimeout)
+        self.idle += now() - began
+        return events
+
+    def watch(self):
+        'apply the changes of the file of the labyrinth, if any (see labwatch)'
+        reloaded = self.watcher.poll()
+        if reloaded:
+            self.gui.reloaded()
+            sys.stderr.write('%s: reloaded in %.1f ms\n' % (self.watcher.filename, 1e3*self.watcher.elapsed))
+        elif reloaded is False:
+            sys.stderr.write('%s: %s\n' % (self.watcher.filename, self.watcher.error))
+
+    def isidle(self):
+        'returns True if the next frames would all be the same as the last one, until an event happens'
+        if self.client:
+            return False # (the other players may move at any time)
+        if self.player.animation or self.player.motion or self.motman.torotate:
+            return False
+        # (victory is entered at the next frame)
+        return not (self.toanimate and self.lab.isgoal(self.player.pos))
+
+    def step(self, events):
+        """play one frame of the game (without drawing it), given the events (KEYDOWN, KEYUP, QUIT) of the frame.
+        This is all the logic of the game: it only depends on the events, so that games can be replayed."""
+        if self.recorder:
+            self.recorder.record(events)
+        # before all, check if the player has won:
+        profiler = self.profiler
+        if not self.player.animation and self.lab.isgoal(self.player.pos):
+            self.victory()
+        self.events(events)
+        if profiler:
+            profiler.mark('events')
+	# check if rotation is needed
+	if self.motman.torotate:
+	    self.rotate(True)
+	    self.motman.torotate = False
+        if profiler:
+            profiler.mark('rotate')
+	# manage motion and collision
+        motion = self.player.animate()
+        if profiler:
+            profiler.mark('animate')
+        if motion:
+            dim, mov = motion
+            # the next position is written in the list of the previous one (the animation started from the
+            # current one): the lists of the positions are swapped, never copied
+            player = self.player
+            pos = player.previous
+            pos[:] = player.pos
+            pos[dim] += mov
+            if self.lab.isfree(pos):
+                player.previous, player.pos = player.pos, pos
+                self.lab.focus(pos)
+            else:
+                player.animation = None
+        if profiler:
+            profiler.mark('collision')
+        self.frame += 1
+
+    def netstep(self, events):
+        """play one frame of a networked game (see netplay): the server runs the logic of the game, and the player
+        follows it. Only exiting, the color selection and the filter are handled here (the server does the same)."""
+        profiler = self.profiler
+        self.events(events)
+        self.motman.torotate = False # (no rotation in networked games)
+        if profiler:
+            profiler.mark('events')
+        self.client.step(events)
+        if self.toanimate and self.client.id in self.client.won:
+            self.victory()
+        if self.client.connection.closed: # (the server stopped)
+            self.running = False
+        if profiler:
+            profiler.mark('animate')
+        self.frame += 1
+
+    def events(self, events):
         'manage the events to create motion'
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.stop()
             elif event.type == pygame.KEYDOWN:
@@ -224,13 +413,15 @@ class Game:
                 self.motman.keyup(event.key)
 
     def stop(self):
-        'exit the game'
-        sys.exit()
+        'exit the game (once the current frame is over: see start. Headless, the caller checks quit)'
+        self.running = False
+        self.quit = True
 
     def victory(self):
 	'enter victory mode (when key is pressed, terminate the maze)'
         self.toanimate = False
-        self.gui.victory()
+        if self.gui:
+            self.gui.victory()
 
 
     # experimental for now
@@ -255,7 +446,8 @@ class Game:
 	if anim:
 	    anim.dim, anim.mov = update1((anim.dim, anim.mov))
 	# also, rotate the GUI (needed for color management)
-	self.gui.rotate()
+	if self.gui:
+	    self.gui.rotate()
 
 
 
@@ -265,6 +457,19 @@ class Game:
 def load(filename, settings={}):
     """Load and start a labyrinth: the format of the labyrinth file is described in the Labyrinth module.
     The settings argument conditions the keyset used (default is GCW-Zero)."""
-    lab = Labyrinth.Labyrinth.fromfile(filename)
+    show(prefetch(filename), settings)
+
+def prefetch(filename):
+    'read the labyrinth file filename, and return the Labyrinth for show (this can be done in the background)'
+    return Labyrinth.Labyrinth.fromfile(filename)
+
+def show(lab, settings={}):
+    'start a game in the labyrinth read by prefetch (see load)'
     game = Game(lab, settings)
     game.start()
+
+def footprint(lab):
+    'returns the (approximate) memory used by the labyrinth returned by prefetch, in bytes'
+    if isinstance(lab, Labyrinth.ChunkedLabyrinth):
+        return lab.grid.mapped.maxcost # (its chunks are mapped as needed, up to this budget)
+    return lab.grid.nbytes
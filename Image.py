@@ -2,13 +2,15 @@
 # The supported image formats are those that pygame uses.
 
 import Text
+import assets
+
 import pygame
 
 class Image(Text.Text):
     """Class that creates an image and waits for keypress.
     This uses the same techniques as described by Text, and thus inherits it for that purpose."""
-    def __init__(self, image):
-        Text.Text.__init__(self, '') # init with empty text (screen will be overwritten anyway)
+    def __init__(self, image, settings={}):
+        Text.Text.__init__(self, '', settings) # init with empty text (screen will be overwritten anyway)
         self.screen.fill((0,0,0))
         self.screen.blit(image, image.get_rect(left=0, top=0)) # this is default, I think (so kinda useless)
         pygame.display.flip()
@@ -16,7 +18,24 @@ class Image(Text.Text):
 def load(filename, settings=None):
     """Load the image described at filename, and display it fullscreen while waiting for keypress.
     The image formats accepted are those for the pygame.image.load function (see documentation).
-    The settings argument will be ignored."""
-    image = pygame.image.load(filename)
-    imageo = Image(image)
+    The settings argument will be ignored.
+    Images are kept (in the display format) by the shared asset manager, so that revisiting them costs nothing."""
+    show(prefetch(filename), settings)
+
+def prefetch(filename):
+    """decode the image file filename, and return it for show (this can be done in the background, but the
+    image can only be converted to the display format when shown)"""
+    return filename, pygame.image.load(filename)
+
+def show(data, settings=None):
+    'display the image decoded by prefetch (see load)'
+    filename, loaded = data
+    assets.setup()
+    pygame.display.set_mode((Text.SCRW, Text.SCRH)) # needed to convert the image
+    image = assets.manager().image(filename, loaded=loaded)
+    imageo = Image(image, settings or {})
     imageo.start()
+
+def footprint(data):
+    'returns the memory used by the data returned by prefetch, in bytes'
+    return assets.cost(data[1])
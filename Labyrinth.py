@@ -13,50 +13,142 @@
 #  the goal (there must be 1! goal position per file). Empty places can be filled with any character
 # /!\ the number of lines cannot exceed the defined size in the Y dimension. Cases over the size in X dimension will be ignored.
 # For examples, check the files in the labs folder, or the simplelab.txt file.
+# Labyrinths can also be stored in a compact binary format (see the labfile module), or for the largest ones,
+# in a chunked file whose blocks are only read when needed (see the chunkstore module): fromfile reads them all.
 
 
+import bitgrid
+import chunkstore
 import geometry as geo
+import labfile
+import runindex
+
+import os
 
 class Labyrinth:
     "Labyrinth class: describes a labyrinth in n dimensions"
     def __init__(self, size, blocks, goalpos):
         """Create a labyrinth of len(size) dimensions, with given blocks (as a list).
         The blocks list must be a list of tuples the same length as size, and such that
-         1 <= blocks[i][j] <= size[j]  for all valid i, and 0 <= j < length(size)"""
+         1 <= blocks[i][j] <= size[j]  for all valid i, and 0 <= j < length(size)
+        The blocks can also be given directly as a bitgrid.BitGrid of the same size."""
         self.size = size
         self.ndim = len(self.size)
-        self.blocks = {}
-        for block in blocks:
-            self.blocks[ tuple(block) ] = True
+        self.dims = tuple(range(self.ndim)) # (iterated over by the queries, rather than new ranges)
+        self.tilepos = [0] * self.ndim      # (position written by uppermost1d)
+        if isinstance(blocks, bitgrid.BitGrid):
+            if blocks.size != tuple(size):
+                raise Exception('Wrong grid size! (grid is '+str(blocks.size)+')')
+            self.grid = blocks
+        else:
+            self.grid = bitgrid.BitGrid(size)
+            # check integrity
+            for block in blocks:
+                if len(block) != len(size):
+                    raise Exception('Wrong block size! (at block '+str(block)+')')
+                if not self.iswithin(block):
+                    raise Exception('Block not within labyrinth! (at block '+str(block)+')')
+                self.grid.set(self.grid.index(block))
+        # the dimensions of the maze are a view on the axes of the grid: dimension i is the axis axes[i]
+        # (rotating the maze only changes this view, see permute)
+        self.axes = tuple(range(self.ndim))
+        self.strides = self.grid.strides
         self.goalpos = goalpos
-        # check integrity
-        for block in blocks:
-            if len(block) != len(size):
-                raise Exception('Wrong block size! (at block '+str(block)+')')
-            if not self.iswithin(block):
-                raise Exception('Block not within labyrinth! (at block '+str(block)+')')
         if not self.iswithin(goalpos):
             raise Exception('Goal is not within labyrinth!')
         if not self.isfree(goalpos):
             raise Exception('Block at goal position!')
+        self.buildruns()
+        self.version = 0 # incremented whenever the blocks or the orientation change (for caches to notice)
+        self.filename = None # file the labyrinth was read from, if any (see fromfile)
+
+    def buildruns(self):
+        """index the runs of blocks along every axis of the grid (must be called again if the blocks change).
+        All axes are indexed, since any of them can become a color dimension by rotation (the lines
+        themselves are only indexed when first needed, see runindex)."""
+        self.runs = [runindex.RunIndex(self.grid, axis) for axis in range(self.ndim)]
+
+    def index(self, pos):
+        'returns the linear index in the grid of the position pos (no bounds check!)'
+        idx = 0
+        strides = self.strides
+        for i in self.dims:
+            idx += (pos[i]-1)*strides[i]
+        return idx
 
     def isfree(self, pos):
         'determines if the n-dim position pos is free'
-        return (not self.blocks.get(tuple(pos), False)) and self.iswithin(pos)
+        idx = 0
+        size, strides = self.size, self.strides
+        for i in self.dims:
+            coord = pos[i]
+            if coord < 1 or coord > size[i]:
+                return False
+            idx += (coord-1)*strides[i]
+        return not (self.grid.bits[idx >> 3] >> (idx & 7)) & 1
 
     def iswithin(self, pos):
         'determines if the position pos is within the labyrinth (not outside borders)'
-        for i in range(self.ndim):
+        for i in self.dims:
             if pos[i]<1 or pos[i]>self.size[i]:
                 return False
         return True
 
+    def isgoal(self, pos):
+        'determines if the position pos (a list or a tuple) is the goal'
+        goalpos = self.goalpos
+        for i in self.dims:
+            if pos[i] != goalpos[i]:
+                return False
+        return True
+
+    def isfree_many(self, positions):
+        'batch version of isfree: returns a list of booleans, one per position'
+        size, strides, bits = self.size, self.strides, self.grid.bits
+        axes = range(self.ndim)
+        result = []
+        for pos in positions:
+            idx = 0
+            for i in axes:
+                coord = pos[i]
+                if coord < 1 or coord > size[i]:
+                    idx = -1
+                    break
+                idx += (coord-1)*strides[i]
+            result.append(idx >= 0 and not (bits[idx >> 3] >> (idx & 7)) & 1)
+        return result
+
+    def iswithin_many(self, positions):
+        'batch version of iswithin: returns a list of booleans, one per position'
+        size = self.size
+        axes = range(self.ndim)
+        result = []
+        for pos in positions:
+            within = True
+            for i in axes:
+                if pos[i] < 1 or pos[i] > size[i]:
+                    within = False
+                    break
+            result.append(within)
+        return result
+
     def uppermost1d(self, x, y, pos, dimension):
         """returns the value in given dimension (>= 2) of the uppermost tile to display at (x,y),
          given the player is at n-pos pos.
          Please note that 0 is a valid return value for this! (it is the color of the ground: black)"""
         # get real tile position
-        tilepos = [x, y] + list(pos[2:])
+        tilepos = self.tilepos
+        tilepos[0], tilepos[1] = x, y
+        for i in self.dims[2:]:
+            tilepos[i] = pos[i]
+        if self.iswithin(tilepos):
+            # general case: the index knows the runs of blocks in the pile
+            runs = self.runs[self.axes[dimension]]
+            return runs.uppermost(runs.line(self.index(tilepos)), tilepos[dimension])
+        return self.scanuppermost(tilepos, dimension)
+
+    def scanuppermost(self, tilepos, dimension):
+        'uppermost1d, by walking the pile at the (full) position tilepos cell by cell (tilepos is modified)'
         if self.isfree(tilepos):
             # in this case, find upmost lower tile that is free
             for upmost in range(tilepos[dimension]-1, 0, -1):
@@ -72,29 +164,61 @@ class Labyrinth:
                     return upmost-1
             return self.size[dimension]
 
-    def fulluppermost(self, x, y, pos):
-        'returns the full position of the uppermost tile at given position'
-        uppermost = list(self.size)
-        uppermost[0:2] = [x,y]
-        for dim in range(2,self.ndim):
+    def fulluppermost(self, x, y, pos, out=None):
+        'returns the full position of the uppermost tile at given position (written in the list out, if given)'
+        uppermost = out if out is not None else [0] * self.ndim
+        uppermost[0], uppermost[1] = x, y
+        for dim in self.dims[2:]:
             uppermost[dim] = self.uppermost1d(x, y, pos, dim)
         return uppermost
 
 
+    def focus(self, pos):
+        'the player is now at pos (this lets the labyrinth prepare the blocks around: see ChunkedLabyrinth)'
+        pass
+
+    def update(self, changes, goal=None):
+        """change some blocks of this maze (see labwatch): changes are (linear index in the grid, blocked or not)
+        pairs, and goal the new goal position (in the order of the grid), if it moves. The runs of blocks through
+        the changed cells are forgotten (see runindex): only their lines are indexed again."""
+        for idx, value in changes:
+            self.grid.set(idx, value)
+            for runs in self.runs:
+                runs.forget(idx)
+        if goal is not None:
+            self.goalpos = geo.permute(tuple(goal), self.axes)
+        self.version += 1
+
+    def permute(self, perm):
+        """reorder the dimensions of this maze: the new dimension i is the current dimension perm[i].
+        Nothing is copied: the blocks and their indexes are simply read through the new order of axes."""
+        self.axes = geo.permute(self.axes, perm)
+        self.size = geo.permute(self.size, perm)
+        self.strides = geo.permute(self.strides, perm)
+        self.goalpos = geo.permute(self.goalpos, perm)
+        self.version += 1
+
     # as of now, experimental
     def rotate(self,forward=True):
 	"rotate this maze. If forward, the XY dimensions move forward in RGB. Else, backward."
-	# modify blocks and size
-	rotate1 = lambda block: geo.rotate1(block, forward)
-	newblocks = {}
-	for (block, value) in self.blocks.items():
-		newblocks[ rotate1(block) ] = value
-	self.blocks = newblocks
-	self.size = rotate1(self.size)
-	self.goalpos = rotate1(self.goalpos)
+	self.permute(geo.rotation(self.ndim, forward))
 
     @staticmethod
     def fromfile(filename):
+        'read the labyrinth file filename (in any format), and remember where it was read from (see labwatch)'
+        lab = Labyrinth._readfile(filename)
+        lab.filename = filename
+        return lab
+
+    @staticmethod
+    def _readfile(filename):
+        with open(filename, 'rb') as ff:
+            magic = ff.read(4)
+        if magic == labfile.MAGIC:
+            grid, goalpos, digest = labfile.load(filename)
+            return Labyrinth(list(grid.size), grid, goalpos)
+        if magic == chunkstore.MAGIC:
+            return ChunkedLabyrinth(chunkstore.ChunkedGrid(filename))
         with open(filename, 'r') as ff:
             # read header
             header = ff.readline().split(' ')
@@ -105,39 +229,132 @@ class Labyrinth:
                 raise Exception('Not enough dimensions! (1 given)')
             # now, read by squares
             blocks = []
-            done = False
             goalpos = None
-            # iteration specific variables
-            cpos = None
-            y = 1
-            for line in ff.readlines(): # ignore first line
-                line = line.strip(' \n').lower()
-                if line.startswith('#') or not line:
-                    continue
-                if line == 'end':
-                    break
-                if line.startswith('floor '):
-                    # new floor definition
-                    cpos = [int(d) for d in line[6:].split(' ')]
-                    y = 1 # reset line in floor
-                elif cpos:
-                    # we are now defining one line (given y) of the floor
-                    if y > sizes[1]:
-                        raise Exception('Invalid vertical position: '+str(y)+' (did you include too many lines?)')
-                    for x in range(len(line)):
-                        if line[x] in ['x', 'b']:
-                            blocks.append(tuple( [x+1, y] + cpos ))
-                        elif line[x] in ['g', '*']:
-                            if goalpos:
-                                raise Exception('Goalpos already defined! (previous: '+str(goalpos)+')')
-                            goalpos = tuple([x+1,y] + cpos)
-                    y += 1 # next line
-                else:
-                    raise Exception('Invalid line: "'+line+'"')
+            for cpos, lines in readfloors(ff.readlines()): # ignore first line
+                floorblocks, floorgoal = parsefloor(sizes, cpos, lines)
+                blocks += floorblocks
+                if floorgoal:
+                    if goalpos:
+                        raise Exception('Goalpos already defined! (previous: '+str(goalpos)+')')
+                    goalpos = floorgoal
+            if goalpos is None:
+                raise Exception('No goal position! (there must be one * or G)')
             # now, we've got the data: create a Labyrinth
             return Labyrinth(sizes, blocks, goalpos)
 
 
+def readfloors(lines):
+    """split the lines of a labyrinth file (after the header) by floor: returns a list of (position of the floor in
+    the color dimensions, lines of the floor), in the order of the file. The lines are stripped and lowercase,
+    without comments and empty lines (see parsefloor)."""
+    floors = []
+    floor = None # lines of the current floor
+    for line in lines:
+        line = line.strip(' \n').lower()
+        if line.startswith('#') or not line:
+            continue
+        if line == 'end':
+            break
+        if line.startswith('floor '):
+            # new floor definition
+            floor = []
+            floors.append(([int(d) for d in line[6:].split(' ')], floor))
+        elif floor is not None:
+            floor.append(line)
+        else:
+            raise Exception('Invalid line: "'+line+'"')
+    return floors
+
+def parsefloor(sizes, cpos, lines):
+    """returns the blocks (as a list of positions) and the goal (None if not there) of the floor of a labyrinth of
+    given sizes, at position cpos in the color dimensions, given its lines (see readfloors)"""
+    blocks = []
+    goalpos = None
+    for y, line in enumerate(lines, 1):
+        # we are now defining one line (given y) of the floor
+        if y > sizes[1]:
+            raise Exception('Invalid vertical position: '+str(y)+' (did you include too many lines?)')
+        for x in range(len(line)):
+            if line[x] in ['x', 'b']:
+                blocks.append(tuple( [x+1, y] + cpos ))
+            elif line[x] in ['g', '*']:
+                if goalpos:
+                    raise Exception('Goalpos already defined! (previous: '+str(goalpos)+')')
+                goalpos = tuple([x+1,y] + cpos)
+    return blocks, goalpos
+
+
+
+class ChunkedLabyrinth(Labyrinth):
+    """Labyrinth whose blocks stay in a chunked file (see chunkstore): only the chunks around the player are in
+    memory. The blocks are read-only, and the tools working on the whole grid (such as the solver) need a Labyrinth."""
+    def __init__(self, grid, goalpos=None):
+        'create the labyrinth of the chunkstore.ChunkedGrid grid (with its goal, unless another one is given)'
+        self.grid = grid
+        self.size = list(grid.size)
+        self.ndim = len(self.size)
+        self.dims = tuple(range(self.ndim))
+        self.axes = tuple(range(self.ndim))
+        self.strides = grid.strides
+        self.goalpos = tuple(goalpos or grid.goal)
+        if not self.iswithin(self.goalpos):
+            raise Exception('Goal is not within labyrinth!')
+        if not self.isfree(self.goalpos):
+            raise Exception('Block at goal position!')
+        self.runs = None
+        self.version = 0
+        self.filename = None
+
+    def buildruns(self):
+        pass # (piles are walked in the chunks)
+
+    def isfree(self, pos):
+        'determines if the n-dim position pos is free'
+        coords = [0] * self.ndim
+        size, axes = self.size, self.axes
+        for i in range(self.ndim):
+            coord = pos[i]
+            if coord < 1 or coord > size[i]:
+                return False
+            coords[axes[i]] = coord-1
+        return not self.grid.getat(coords)
+
+    def isfree_many(self, positions):
+        'batch version of isfree: returns a list of booleans, one per position'
+        return [self.isfree(pos) for pos in positions]
+
+    def uppermost1d(self, x, y, pos, dimension):
+        """returns the value in given dimension (>= 2) of the uppermost tile to display at (x,y),
+         given the player is at n-pos pos (see Labyrinth.uppermost1d)."""
+        tilepos = [x, y] + list(pos[2:])
+        if not self.iswithin(tilepos):
+            return self.scanuppermost(tilepos, dimension)
+        coords = [0] * self.ndim
+        for i in range(self.ndim):
+            coords[self.axes[i]] = tilepos[i]-1
+        axis = self.axes[dimension]
+        if self.grid.getat(coords):
+            return self.grid.run(coords, axis, +1) + 1 # top of the run of blocks
+        return self.grid.run(coords, axis, -1) # (the block under the run of free cells, 0 if none)
+
+    def focus(self, pos):
+        'the player is now at pos: map the chunks of its XY floor, and of the floors around'
+        ranges = [None] * self.ndim
+        for i in range(self.ndim):
+            if i < 2:
+                ranges[self.axes[i]] = range(self.size[i])
+            else:
+                ranges[self.axes[i]] = range(max(0, pos[i]-2), min(self.size[i], pos[i]+1))
+        self.grid.focus(ranges)
+
+
+# Default: simple 3D lab (3x3x3), only read when first asked for (importing this module does nothing)
+DEFAULTFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'labs', 'simplelab.txt')
+_default = None
 
-# Default: simple 3D lab (3x3x3)
-Default = Labyrinth.fromfile('simplelab.txt')#Labyrinth((3,3,3,2), [(2,1,1,1), (2,2,1,1), (2,2,2,1), (2,3,3,1), (1,1,1,2), (2,3,1,1)],  (3,3,1,1))
+def default():
+    'returns the default labyrinth (read from DEFAULTFILE the first time)'
+    global _default
+    if _default is None:
+        _default = Labyrinth.fromfile(DEFAULTFILE)
+    return _default
@@ -4,12 +4,12 @@
 # Also, the number of displayable lines is limited (and is around 10). There is not explicit
 # check for these format conditions, so it is expected of the user to check if the text looks good.
 
+import assets
+
 import sys
 import pygame
-pygame.init()
-
+from timeit import default_timer as now
 
-FPS = 60
 
 SCRW = 320
 SCRH = 240
@@ -17,12 +17,16 @@ SCRH = 240
 SPACING = 6 # between lines
 PARSPACING = 16 # paragraph spacing
 
-FONT = pygame.font.Font('orbitron.ttf', 16)
+FONTSIZE = 16 # (the font is loaded by the shared asset manager: see assets)
 
 class Text:
     """Manages full screen display of a doubly centered text."""
-    def __init__(self, text):
-	"display the text as full screen until input"
+    def __init__(self, text, settings={}):
+	"""display the text as full screen until input. Waiting for it, the screen sleeps for at most the "IdleTimeout"
+	setting at once (in ms, 0 for no limit, see assets.wait), and the time spent waiting is kept in idle."""
+        assets.setup()
+        self.idletimeout = settings.get("IdleTimeout", assets.IDLETIMEOUT)
+        self.idle = 0.0 # time spent waiting for events (see start), in seconds
         self.texts = text.split('\n')
         self.screen = pygame.display.set_mode((SCRW, SCRH))
         # render these texts
@@ -33,7 +37,7 @@ class Text:
             if not txt.strip(' \r\n\t'):
                 offset += PARSPACING
                 continue
-            rtxt = FONT.render(txt, 1, (255,255,255))
+            rtxt = assets.manager().text(txt, FONTSIZE, (255,255,255))
             self.rtexts.append((rtxt,offset))
             incr = (SPACING + rtxt.get_rect().height)
             offset += incr
@@ -45,12 +49,15 @@ class Text:
         pygame.display.flip()
 
     def start(self):
-        "display the text and wait for events to happen"
+        """display the text and wait for events to happen.
+        Nothing changes on the screen meanwhile: this sleeps until the next events (no frame is drawn)."""
         running = True
-        clock = pygame.time.Clock()
         while running:
             # events management
-            for event in pygame.event.get():
+            began = now()
+            events = assets.wait(self.idletimeout)
+            self.idle += now() - began
+            for event in events:
                 if event.type == pygame.QUIT:
                     self.stop()
                 if event.type == pygame.KEYDOWN:
@@ -60,8 +67,6 @@ class Text:
                         running = False
             # GUI management
             # actually, the GUI is good looking already :-p
-            # FPS management
-            clock.tick(FPS)
 
     def stop(self):
 	"called internally: stop the game (pressed on START)"
@@ -73,6 +78,18 @@ def load(filename, settings={}):
     The lines in the text should be neither too long (>28c) or too numerous (>10), as this will 
     make text overflow from the screen.
     The settings argument is, as of now, ignored."""
+    show(prefetch(filename), settings)
+
+def prefetch(filename):
+    'read the text file filename, and return its content for show (this can be done in the background)'
     with open(filename, 'r') as ff:
-        text = Text(ff.read())
-        text.start()
+        return ff.read()
+
+def show(data, settings={}):
+    'display the text read by prefetch (see load)'
+    text = Text(data, settings)
+    text.start()
+
+def footprint(data):
+    'returns the memory used by the data returned by prefetch, in bytes'
+    return len(data)
@@ -0,0 +1,108 @@
+# Shared manager for the assets of the game (images, fonts and rendered texts), used by the Text, Image and GUI
+# modules, so that each asset is loaded (and converted to the pixel format of the display) only once.
+# Images and rendered texts are kept in a cache.LRUCache whose cost is their size in memory: when the total
+# exceeds the budget, the least recently used ones are dropped (and loaded again if needed). Fonts are few and
+# small, and are simply kept by size.
+# The budget can be set with the "AssetBudget" setting (in bytes, see DimLab).
+# Pygame itself is initialized here too, by the first screen shown (see setup), and the screens wait for events
+# here when nothing moves on them (see wait).
+
+import cache
+
+import pygame
+
+
+FONTFILE = 'orbitron.ttf'
+BUDGET = 4 << 20 # bytes of images and texts kept in memory, by default
+IDLETIMEOUT = 500 # longest wait for an event when nothing moves, in ms (see wait)
+IDLEEVENT = pygame.USEREVENT # (posted by the timer that bounds these waits)
+
+
+class AssetManager:
+    "Cache of images (in the display format), fonts and rendered texts"
+    def __init__(self, budget=BUDGET):
+        self.surfaces = cache.LRUCache(maxcost=budget)
+        self.fonts = {} # (filename, size) -> font
+
+    def setbudget(self, budget):
+        'change the memory budget (in bytes) for the images and texts, evicting some of them if needed'
+        self.surfaces.maxcost = budget
+        self.surfaces.shrink()
+
+    def image(self, filename, alpha=False, convert=True, loaded=None):
+        """returns the image in file filename, converted to the display format (keeping per-pixel alpha if alpha).
+        If not convert, the image is kept as loaded (with its own palette and colorkey: converting a colorkeyed
+        image makes transparent all the pixels of the colorkey color, not only those of its palette entry).
+        As long as there is no display, images cannot be converted: they are then returned as loaded, uncached.
+        If the image was already loaded from filename (e.g. in the background), it can be given as loaded."""
+        key = ('image', filename, alpha, convert)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = loaded if loaded is not None else pygame.image.load(filename)
+            if convert:
+                if pygame.display.get_surface() is None:
+                    return surface
+                surface = surface.convert_alpha() if alpha else surface.convert()
+            self.surfaces.put(key, surface, cost(surface))
+        return surface
+
+    def font(self, size, filename=FONTFILE):
+        'returns the font of given file and size'
+        font = self.fonts.get((filename, size))
+        if font is None:
+            font = self.fonts[(filename, size)] = pygame.font.Font(filename, size)
+        return font
+
+    def text(self, text, size, color, alpha=False, filename=FONTFILE):
+        """returns text rendered (antialiased) with the font of given file and size, in given color.
+        If alpha, the surface is converted to the display format with per-pixel alpha (this needs a display)."""
+        key = ('text', text, size, tuple(color), alpha, filename)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font(size, filename).render(text, 1, color)
+            if alpha:
+                surface = surface.convert_alpha()
+            self.surfaces.put(key, surface, cost(surface))
+        return surface
+
+    def clear(self):
+        'forget all the images and texts (needed if the pixel format of the display changes)'
+        self.surfaces.clear()
+
+    def stats(self):
+        'returns the hit/miss statistics of the images and texts, as a dictionary (see cache.LRUCache.stats)'
+        stats = self.surfaces.stats()
+        stats['budget'] = self.surfaces.maxcost
+        stats['fonts'] = len(self.fonts)
+        return stats
+
+
+def setup():
+    'initialize pygame, if not done yet (importing the modules of the game does nothing)'
+    if pygame.display.get_init() and pygame.font.get_init():
+        return
+    pygame.init()
+    pygame.mouse.set_visible(False)
+
+def wait(timeout=IDLETIMEOUT):
+    """wait for the next events (or timeout ms, if no event happens: 0 for no limit), and returns them (if any).
+    Nothing is drawn meanwhile: the process sleeps."""
+    pygame.time.set_timer(IDLEEVENT, timeout)
+    events = [pygame.event.wait()]
+    pygame.time.set_timer(IDLEEVENT, 0)
+    events += pygame.event.get()
+    return [event for event in events if event.type != IDLEEVENT]
+
+def cost(surface):
+    'returns the (approximate) memory used by the pixels of surface, in bytes'
+    return surface.get_pitch() * surface.get_height()
+
+
+_manager = None
+
+def manager():
+    'returns the asset manager shared by the whole game'
+    global _manager
+    if _manager is None:
+        _manager = AssetManager()
+    return _manager
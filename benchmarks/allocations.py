@@ -0,0 +1,144 @@
+# Allocation benchmark of the frames of a game: a random walk is played (Game.step) and drawn (GUI.draw, on the
+# dummy SDL video driver) once to fill the caches, then again to be measured. The game runs on python 2, without
+# tracemalloc: the counts of the collector tell about the objects it tracks (lists, tuples, instances...), not
+# about bytes (strings and numbers are not tracked). With collections disabled, the count of its youngest
+# generation goes up with every such object allocated, and down with every one freed. It is sampled at every call
+# and return of a function (see sys.setprofile), which shows the short-lived objects of a frame too: the most alive
+# at once (transient), and at least how many were allocated. The collections of the collector, which pause the game, are counted too.
+# The results are checked against a budget (per frame): the exit status is 1 if it is exceeded.
+#
+# Usage: python benchmarks/allocations.py [-f 3000] [--retained 0.01] [--transient 32] [--allocated 10]
+#  [--collections 1] [labfile]
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def walk(nframes, ndim, seed=0):
+    'returns the events of a random walk of nframes frames, as a list of lists of replay.Event'
+    import pygame
+    import replay
+    keys = [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN]
+    if ndim > 2:
+        keys += [pygame.K_TAB, pygame.K_BACKSPACE, pygame.K_LCTRL, pygame.K_SPACE]
+    rng = random.Random(seed)
+    frames = []
+    for frame in range(nframes):
+        events = []
+        if frame % 15 == 0:
+            events.append(replay.Event(rng.choice([pygame.KEYDOWN, pygame.KEYDOWN, pygame.KEYUP]), rng.choice(keys)))
+        frames.append(events)
+    return frames
+
+def measure(labfile, nframes, seed=0):
+    """play (and draw) the random walk in labfile, then play it again, measured. Returns the measures, per frame:
+    'time' (in seconds), 'retained' (objects tracked by the collector), 'transient' (largest number of objects
+    allocated at once by a frame), 'allocated' (objects allocated) and 'collections' (of the youngest generation of
+    the collector)"""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.chdir(ROOT) # (for the images and fonts of the GUI)
+    import Game
+    import Labyrinth
+    lab = Labyrinth.Labyrinth.fromfile(labfile)
+    game = Game.Game(lab, {"FrameTimes": 0})
+    frames = walk(nframes, lab.ndim, seed)
+    def frame(events):
+        game.step(events)
+        game.gui.draw(game.player, selection=game.motman.cdim, usefilter=game.motman.filtering)
+    def play():
+        for events in frames:
+            frame(events)
+    play() # (warm-up: the boards and caches of the walk)
+    # time, without tracing
+    began = time.time()
+    play()
+    elapsed = time.time() - began
+    # allocations (the same frames again)
+    measures = {'time': elapsed/nframes}
+    gc.collect()
+    before = len(gc.get_objects())
+    collections = 0
+    last = gc.get_count()
+    for events in frames:
+        frame(events)
+        # (a collection of the youngest generation changes the counts of the older ones)
+        count = gc.get_count()
+        if count[1:] != last[1:]:
+            collections += 1
+        last = count
+    gc.collect()
+    measures['retained'] = float(len(gc.get_objects()) - before)/nframes
+    measures['transient'], allocated = counted(frame, frames)
+    measures['allocated'] = float(allocated)/nframes
+    measures['collections'] = float(collections)/nframes
+    return measures
+
+def counted(frame, frames):
+    """play frame(events) for the events of every frame, counting the objects tracked by the collector (see the top
+    of this module). Returns the most objects allocated at once by a frame, and the objects allocated by all."""
+    state = [0, 0, 0] # count of the youngest generation, its peak in the frame, objects allocated
+    def sample(stackframe, event, arg):
+        count = gc.get_count()[0]
+        if count > state[0]:
+            state[2] += count - state[0]
+            if count > state[1]:
+                state[1] = count
+        state[0] = count
+    transient = allocated = 0
+    gc.collect()
+    gc.disable()
+    try:
+        for events in frames:
+            start = gc.get_count()[0]
+            state[:] = [start, start, 0]
+            sys.setprofile(sample)
+            frame(events)
+            sys.setprofile(None)
+            transient = max(transient, state[1] - start)
+            allocated += state[2]
+    finally:
+        sys.setprofile(None)
+        gc.enable()
+    return transient, allocated
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure (and check) the allocations of the frames of a game.')
+    parser.add_argument('labfile', nargs='?', default=os.path.join(ROOT, 'labs', '4D-twoxy.txt'),
+                        help='labyrinth file played')
+    parser.add_argument('-f', '--frames', type=int, default=3000, help='number of frames played')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the walk')
+    parser.add_argument('--retained', type=float, default=0.01,
+                        help='budget of objects kept alive, per frame (default: %(default)s)')
+    parser.add_argument('--transient', type=float, default=32,
+                        help='budget of objects allocated at once by a frame (default: %(default)s)')
+    parser.add_argument('--allocated', type=float, default=10,
+                        help='budget of objects allocated, per frame (default: %(default)s)')
+    parser.add_argument('--collections', type=float, default=1,
+                        help='budget of collections, per 1000 frames (default: %(default)s)')
+    args = parser.parse_args()
+    measures = measure(os.path.abspath(args.labfile), args.frames, args.seed)
+    sys.stdout.write('%d frames: %.1f us per frame\n' % (args.frames, 1e6*measures['time']))
+    over = []
+    for name, value, budget, shown in (
+            ('retained', measures['retained'], args.retained, '%.3f objects per frame' % measures['retained']),
+            ('transient', measures['transient'], args.transient, '%d objects at most' % measures['transient']),
+            ('allocated', measures['allocated'], args.allocated, '%.2f objects per frame' % measures['allocated']),
+            ('collections', 1000*measures['collections'], args.collections,
+             '%.2f per 1000 frames' % (1000*measures['collections']))):
+        sys.stdout.write('  %-12s %s (budget %g)\n' % (name, shown, budget))
+        if value > budget:
+            over.append(name)
+    if over:
+        sys.stdout.write('OVER BUDGET: %s\n' % ', '.join(over))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
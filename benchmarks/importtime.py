@@ -0,0 +1,59 @@
+# Benchmark of the time needed to import the modules of the game, each in a fresh interpreter (as when starting
+# the game or a tool). For every module, this also checks that importing it has no side effect: pygame must not
+# be initialized, and tools (solver, converter...) must not even import it.
+#
+# Usage (from anywhere): python benchmarks/importtime.py [-n repeats] [module ...]
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules to measure, and whether they may import pygame
+MODULES = [('bitgrid', False), ('geometry', False), ('labfile', False), ('Labyrinth', False),
+           ('solver', False), ('generator', False), ('DimLab', False),
+           ('Text', True), ('Image', True), ('GUI', True), ('Game', True)]
+
+# run in the fresh interpreter: prints the import time (in seconds), whether pygame was imported and initialized
+PROBE = """
+import sys, time
+began = time.time()
+import %s
+elapsed = time.time() - began
+pygame = sys.modules.get('pygame')
+sys.stdout.write('%%r %%d %%d\\n' %% (elapsed, pygame is not None, pygame is not None and pygame.get_init()))
+"""
+
+def measure(module, repeats):
+    'returns the best import time of module (in seconds), and whether pygame was imported and initialized'
+    best = None
+    for i in range(repeats):
+        env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+        output = subprocess.check_output([sys.executable, '-c', PROBE % module], cwd=ROOT, env=env)
+        elapsed, imported, initialized = output.split()[-3:]
+        elapsed = float(elapsed)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, imported == b'1', initialized == b'1'
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of the modules of the game.')
+    parser.add_argument('modules', nargs='*', help='modules to measure (default: all)')
+    parser.add_argument('-n', '--repeats', type=int, default=5, help='imports per module (the best is kept)')
+    args = parser.parse_args()
+    allowed = dict(MODULES)
+    modules = args.modules or [module for module, usespygame in MODULES]
+    failed = False
+    sys.stdout.write('%-12s %10s  %s\n' % ('module', 'import', 'pygame'))
+    for module in modules:
+        elapsed, imported, initialized = measure(module, args.repeats)
+        status = 'initialized' if initialized else ('imported' if imported else '-')
+        problem = initialized or (imported and not allowed.get(module, True))
+        failed = failed or problem
+        sys.stdout.write('%-12s %8.1fms  %s%s\n' % (module, 1000*elapsed, status, '  <- side effect!' if problem else ''))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
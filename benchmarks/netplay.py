@@ -0,0 +1,77 @@
+# Load benchmark of the server of networked games (see netplay), over localhost: a server is started in its own
+# process, and joined by many headless clients (bots), which walk randomly in the labyrinth. Every second, every bot
+# measures its round trip time to the server. At the end, the time spent by the server computing its ticks is given
+# with the latencies, for every number of bots.
+#
+# Usage: python benchmarks/netplay.py [-n 10 50] [-s 5] [labfile]
+
+import argparse
+import os
+import random
+import select
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run(labfile, nbots, seconds, seed=0):
+    'play with nbots bots for the given time, returns the output of the server and the latencies (in seconds)'
+    import Labyrinth
+    import netplay
+    import pygame
+    import replay
+    ticks = int(seconds*netplay.TICKRATE)
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'netplay.py'), labfile, '-p', '0', '-t', str(ticks)],
+                              stdout=subprocess.PIPE, env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1'))
+    port = int(server.stdout.readline().split()[-1])
+    lab = Labyrinth.Labyrinth.fromfile(labfile)
+    bots = [netplay.Client(lab, ('localhost', port)) for i in range(nbots)]
+    bysocket = dict((bot.connection.sock, bot) for bot in bots)
+    keys = [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_TAB, pygame.K_BACKSPACE]
+    rng = random.Random(seed)
+    latencies = []
+    frame, began = 0, time.time()
+    while time.time() - began < seconds - 0.5:
+        for bot in bots:
+            events = []
+            if rng.random() < 0.05:
+                events.append(replay.Event(rng.choice([pygame.KEYDOWN, pygame.KEYUP]), rng.choice(keys)))
+            bot.step(events)
+            if frame % netplay.TICKRATE == 0:
+                if bot.latency is not None:
+                    latencies.append(bot.latency)
+                bot.ping()
+        frame += 1
+        # until the next frame, read the answers of the server as soon as they come (for the round trip times)
+        timeout = began + float(frame)/netplay.TICKRATE - time.time()
+        while timeout > 0:
+            for sock in select.select(bysocket.keys(), [], [], timeout)[0]:
+                bysocket[sock].poll()
+            timeout = began + float(frame)/netplay.TICKRATE - time.time()
+    for bot in bots:
+        bot.close()
+    output = server.communicate()[0]
+    return output.strip().splitlines()[-1], sorted(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the server of networked games, with many bots.')
+    parser.add_argument('labfile', nargs='?', default=os.path.join(ROOT, 'labs', '4D-twoxy.txt'),
+                        help='labyrinth file played')
+    parser.add_argument('-n', '--bots', type=int, nargs='+', default=[10, 50], help='numbers of bots')
+    parser.add_argument('-s', '--seconds', type=float, default=5.0, help='duration of every run')
+    args = parser.parse_args()
+    for nbots in args.bots:
+        server, latencies = run(args.labfile, nbots, args.seconds)
+        line = '%4d bots: server %s' % (nbots, server)
+        if latencies:
+            line += '; round trip p50 %.2f ms, p99 %.2f ms' % (1e3*latencies[len(latencies)//2],
+                                                               1e3*latencies[min(len(latencies)-1,
+                                                                                 len(latencies)*99//100)])
+        sys.stdout.write(line + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
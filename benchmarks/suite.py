@@ -0,0 +1,208 @@
+# Benchmark suite of the labyrinth and its display, on synthetic labyrinths of any number of dimensions, size and
+# density (fraction of blocked cells). For every labyrinth, we time:
+#  - parse: Labyrinth.fromfile, on the text format and on the binary format (see labfile)
+#  - isfree, uppermost1d, fulluppermost: queries at random positions (some of them outside the labyrinth)
+#  - rotate: Labyrinth.rotate (a full turn)
+#  - getcolor: ColorMan.getcolor
+#  - draw: GUI.draw (on the dummy SDL video driver), for a random walk of the player (mostly on the XY plane),
+#     and drawnew, where every frame shows new color coordinates (so that the board must be rendered again)
+# Every labyrinth is measured in its own process, so that its peak memory (maximum resident set size) is known.
+# The results can be written as JSON, and compared with those of a previous run.
+#
+# Usage: python benchmarks/suite.py [-d 2 3 4 5] [-s 10] [-p 0.3] [-o results.json] [-c previous.json]
+# (see python benchmarks/suite.py -h)
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+try:
+    import resource # (unix only)
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = 20000 # number of calls timed for each query
+FRAMES = 300    # number of frames timed for each draw benchmark
+REPEATS = 3     # every timing is repeated, and the best is kept
+
+
+def synthetic(size, density, seed=0):
+    """returns the blocks (bitgrid.BitGrid) and goal of a labyrinth of given size, where every cell is blocked
+    with probability density (except the start and the goal, in opposite corners)"""
+    import bitgrid
+    rng = random.Random(seed)
+    grid = bitgrid.BitGrid(size)
+    for idx in range(grid.ncells):
+        if rng.random() < density:
+            grid.set(idx)
+    goal = tuple(size)
+    grid.set(0, False)
+    grid.set(grid.index(goal), False)
+    return grid, goal
+
+def best(function, calls):
+    'returns the best time (over REPEATS) of calling function(), calls times in a row, in seconds per call'
+    times = []
+    for repeat in range(REPEATS):
+        began = time.time()
+        for call in range(calls):
+            function()
+        times.append(time.time() - began)
+    return min(times) / calls
+
+def bestloop(function, arguments):
+    'returns the best time (over REPEATS) of calling function on every tuple of arguments, in seconds per call'
+    times = []
+    for repeat in range(REPEATS):
+        began = time.time()
+        for args in arguments:
+            function(*args)
+        times.append(time.time() - began)
+    return min(times) / len(arguments)
+
+def measure(config, workdir):
+    'run all the benchmarks on the labyrinth described by config, returns the timings (in seconds per call)'
+    import Labyrinth
+    import generator
+    import labfile
+    size, density = config['size'], config['density']
+    timings = {}
+    # parse
+    grid, goal = synthetic(size, density, config['seed'])
+    textfile, binfile = os.path.join(workdir, 'lab.txt'), os.path.join(workdir, 'lab'+labfile.EXTENSION)
+    with open(textfile, 'w') as ff:
+        generator.write(ff, grid, goal)
+    labfile.save(binfile, grid, goal)
+    timings['parse'] = best(lambda: Labyrinth.Labyrinth.fromfile(textfile), 1)
+    timings['parsebinary'] = best(lambda: Labyrinth.Labyrinth.fromfile(binfile), 1)
+    lab = Labyrinth.Labyrinth.fromfile(textfile)
+    # queries
+    rng = random.Random(config['seed'])
+    positions = [[rng.randint(0, dimsize+1) for dimsize in lab.size] for i in range(QUERIES)]
+    timings['isfree'] = bestloop(lab.isfree, [(pos,) for pos in positions])
+    inside = [[rng.randint(1, dimsize) for dimsize in lab.size] for i in range(QUERIES)]
+    if lab.ndim > 2:
+        timings['uppermost1d'] = bestloop(lab.uppermost1d, [(pos[0], pos[1], pos, rng.randint(2, lab.ndim-1))
+                                                            for pos in inside])
+    timings['fulluppermost'] = bestloop(lab.fulluppermost, [(pos[0], pos[1], pos) for pos in inside[:QUERIES//10]])
+    timings['rotate'] = best(lambda: [lab.rotate() for i in range(lab.ndim)], 100) / lab.ndim
+    # display (the GUI supports up to 3 color dimensions)
+    if lab.ndim <= 5:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        import GUI
+        import Game
+        import pygame
+        colorman = GUI.ColorMan(lab.size)
+        timings['getcolor'] = bestloop(colorman.getcolor, [(pos[2:],) for pos in inside])
+        gui = GUI.GUI(lab)
+        player = Game.Player([1] * lab.ndim)
+        walk = []
+        for frame in range(FRAMES):
+            pos = list(walk[-1] if walk else player.pos)
+            dim = 0 if frame % 10 else rng.randint(0, lab.ndim-1) # mostly on the XY plane
+            pos[dim] = rng.randint(1, lab.size[dim])
+            walk.append(pos)
+        def draw(pos, newlayer):
+            player.pos = pos
+            if newlayer:
+                gui.layers.clear()
+                gui.invalidate()
+            gui.draw(player)
+        timings['draw'] = bestloop(draw, [(pos, False) for pos in walk])
+        timings['drawnew'] = bestloop(draw, [(pos, True) for pos in walk[:FRAMES//10]])
+        pygame.quit()
+    return timings
+
+def peakmemory():
+    'returns the peak memory of this process (maximum resident set size) in kilobytes, or None if unknown'
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024 # (in bytes there)
+    return peak
+
+def worker(config):
+    'measure one configuration (in this process), and print the result as JSON'
+    os.chdir(ROOT) # (for the images and fonts of the GUI)
+    sys.path.insert(0, ROOT)
+    workdir = tempfile.mkdtemp(prefix='dimlab-bench-')
+    try:
+        timings = measure(config, workdir)
+    finally:
+        shutil.rmtree(workdir)
+    result = dict(config)
+    result['cells'] = 1
+    for dimsize in config['size']:
+        result['cells'] *= dimsize
+    result['timings'] = timings
+    result['peakmemory'] = peakmemory()
+    sys.stdout.write(json.dumps(result) + '\n')
+
+def configs(args):
+    'returns the configurations to measure, given the command line arguments'
+    result = []
+    for ndim, size, density in itertools.product(args.dims, args.sizes, args.densities):
+        # the lab files have at least 3 dimensions (2D labyrinths have a single floor)
+        result.append({'ndim': ndim, 'size': [size]*ndim + [1]*(3-ndim), 'density': density, 'seed': args.seed})
+    return result
+
+def key(result):
+    'returns the key identifying the configuration of a result (to compare runs)'
+    return (tuple(result['size']), result['density'], result['seed'])
+
+def report(results, previous=None):
+    'print the results as a table (with the ratios to the previous results, if any)'
+    previous = dict((key(result), result) for result in (previous or []))
+    for result in results:
+        sys.stdout.write('%s density %.2f (%d cells): peak memory %s kB\n' % (
+            'x'.join(str(dimsize) for dimsize in result['size']), result['density'], result['cells'],
+            result['peakmemory']))
+        old = previous.get(key(result), {}).get('timings', {})
+        for name in sorted(result['timings']):
+            value = result['timings'][name]
+            line = '    %-14s %12.2f us' % (name, 1e6*value)
+            if name in old:
+                line += '   x%.2f' % (value / old[name])
+            sys.stdout.write(line + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the labyrinth and its display on synthetic labyrinths.')
+    parser.add_argument('-d', '--dims', type=int, nargs='+', default=[2, 3, 4, 5], help='numbers of dimensions')
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[10], help='sizes along every dimension')
+    parser.add_argument('-p', '--densities', type=float, nargs='+', default=[0.3], help='fractions of blocks')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the labyrinths')
+    parser.add_argument('-o', '--output', help='JSON file to write the results to')
+    parser.add_argument('-c', '--compare', help='JSON file of previous results, to compare with')
+    parser.add_argument('--worker', help=argparse.SUPPRESS) # (internal: measure one configuration)
+    args = parser.parse_args()
+    if args.worker:
+        worker(json.loads(args.worker))
+        return 0
+    results = []
+    for config in configs(args):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--worker', json.dumps(config)],
+                                         env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1'))
+        results.append(json.loads(output.splitlines()[-1]))
+    previous = None
+    if args.compare:
+        with open(args.compare) as ff:
+            previous = json.load(ff)['results']
+    report(results, previous)
+    if args.output:
+        with open(args.output, 'w') as ff:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}, ff, indent=1)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# Small module defining a packed n-D grid of bits, used by the Labyrinth to store its blocks.
+# Cells are addressed with 1-based positions (as everywhere in this game), and stored one bit per cell
+# in a bytearray. The first dimension varies fastest, so that XY lines are contiguous (like in the lab files).
+
+import binascii
+
+
+class BitGrid:
+    "Packed n-D grid of bits, with precomputed strides"
+    def __init__(self, size, bits=None):
+        """Create an empty grid of given size (or wrap the given packed bits, if any).
+        The bits must hold at least ceil(prod(size)/8) bytes."""
+        self.size = tuple(size)
+        self.ndim = len(self.size)
+        strides = []
+        ncells = 1
+        for dimsize in self.size:
+            strides.append(ncells)
+            ncells *= dimsize
+        self.strides = tuple(strides)
+        self.ncells = ncells
+        self.nbytes = (ncells+7) // 8
+        if bits is None:
+            bits = bytearray(self.nbytes)
+        elif len(bits) < self.nbytes:
+            raise Exception('Not enough bits for a grid of size '+str(self.size)+'!')
+        self.bits = bits
+
+    def index(self, pos):
+        'returns the linear index of the (1-based) position pos. There is no bounds check!'
+        idx = 0
+        for i in range(self.ndim):
+            idx += (pos[i]-1)*self.strides[i]
+        return idx
+
+    def position(self, idx):
+        'returns the (1-based) position of the linear index idx, as a tuple'
+        pos = []
+        for dimsize in self.size:
+            idx, coord = divmod(idx, dimsize)
+            pos.append(coord+1)
+        return tuple(pos)
+
+    def get(self, idx):
+        'returns the bit (0 or 1) at linear index idx'
+        return (self.bits[idx >> 3] >> (idx & 7)) & 1
+
+    def set(self, idx, value=True):
+        'sets (or clears, if not value) the bit at linear index idx'
+        if value:
+            self.bits[idx >> 3] |= 1 << (idx & 7)
+        else:
+            self.bits[idx >> 3] &= ~(1 << (idx & 7)) & 0xff
+
+    def indices(self):
+        'iterates over the linear indices of all set bits, in increasing order'
+        bits = self.bits
+        for byte in range(self.nbytes):
+            value = bits[byte]
+            if not value:
+                continue
+            for bit in range(8):
+                if value >> bit & 1:
+                    yield byte*8 + bit
+
+    def count(self):
+        'returns the number of set bits'
+        return sum(bin(value).count('1') for value in self.bits[:self.nbytes])
+
+    def tointeger(self):
+        'returns all the bits of this grid as one (long) integer: bit i of the integer is the cell of index i'
+        return frombytes(self.bits[:self.nbytes]) & ((1 << self.ncells) - 1)
+
+
+# conversions between packed bits (little-endian bytes) and long integers, used for whole-grid operations
+
+def frombytes(data):
+    'returns the integer whose little-endian bytes are data'
+    data = bytearray(data)
+    data.reverse()
+    return int(binascii.hexlify(data) or '0', 16)
+
+def tobytes(value, nbytes):
+    'returns the nbytes little-endian bytes of the (non-negative) integer value, as a bytearray'
+    data = bytearray(binascii.unhexlify('%0*x' % (2*nbytes, value)))
+    data.reverse()
+    return data
@@ -0,0 +1,68 @@
+# Very small module defining a bounded cache, for data that is expensive to compute and often reused
+# (such as the rendered layers of the GUI, or the images and texts of the assets module).
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Dictionary-like cache holding at most maxsize entries, and entries costing at most maxcost in total
+    (if given, see put): the least recently used ones are evicted first"""
+    def __init__(self, maxsize=None, maxcost=None):
+        self.maxsize = maxsize
+        self.maxcost = maxcost
+        self.entries = OrderedDict() # key -> (value, cost), oldest first
+        self.cost = 0 # total cost of the entries
+        # statistics (see stats)
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        'returns the value cached for key (marking it as recently used), or default if none'
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries[key] = entry
+        return entry[0]
+
+    def put(self, key, value, cost=1):
+        """cache value for key, evicting the least recently used entries if needed.
+        Values costing more than maxcost on their own are not cached."""
+        self.discard(key)
+        if self.maxcost is not None and cost > self.maxcost:
+            return
+        self.entries[key] = (value, cost)
+        self.cost += cost
+        self.shrink()
+
+    def discard(self, key):
+        'forget the entry for key, if any'
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.cost -= entry[1]
+
+    def shrink(self):
+        'evict the least recently used entries until the cache is within its limits'
+        while self.entries and ((self.maxsize is not None and len(self.entries) > self.maxsize) or
+                                (self.maxcost is not None and self.cost > self.maxcost)):
+            key, (value, cost) = self.entries.popitem(last=False)
+            self.cost -= cost
+            self.evictions += 1
+
+    def clear(self):
+        'forget all entries'
+        self.entries.clear()
+        self.cost = 0
+
+    def stats(self):
+        'returns the statistics of this cache, as a dictionary'
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'cost': self.cost,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hitrate': float(self.hits)/lookups if lookups else 0.0}
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,241 @@
+# Out-of-core storage of the blocks of a labyrinth, for labyrinths too large to be held in memory.
+# The n-D grid is tiled into chunks (small n-D boxes of cells), each stored one bit per cell (as a bitgrid.BitGrid
+# of the size of the chunk) in a record of a chunked file. The records are aligned on the pages of the system, so
+# that every chunk can be memory-mapped on its own, when first needed: the chunks used least recently are unmapped
+# when their total size exceeds a budget (so the memory used depends on the budget, not on the labyrinth).
+#
+# FORMAT OF A CHUNKED FILE
+# header: the magic bytes "DLCH", the format version, the number of dimensions n, then (as unsigned 32 bits,
+#  little-endian) the n sizes, the n coordinates of the goal, the n sizes of the chunks, the size of a record
+#  (in bytes, a multiple of mmap.ALLOCATIONGRANULARITY) and the offset of the first record (idem).
+# body: the records of all the chunks (the first dimension varies fastest, as everywhere).
+#
+# Can also be used from the command line, to convert a labyrinth file: python chunkstore.py input output [-c size]
+
+import bitgrid
+import cache
+
+import ctypes
+import itertools
+import mmap
+import struct
+
+
+MAGIC = b'DLCH'
+VERSION = 1
+PAGE = mmap.ALLOCATIONGRANULARITY
+BUDGET = 4 << 20 # bytes of chunks kept in memory, by default
+
+_HEADER = struct.Struct('<4sBB')
+
+
+def chunkshape(size):
+    'returns the default size of the chunks for a grid of given size (about one page of bits per chunk)'
+    edge = 2
+    while (edge+1) ** len(size) <= 8*PAGE:
+        edge += 1
+    return [min(edge, dimsize) for dimsize in size]
+
+def ischunked(filename):
+    'determines if the file filename is a chunked labyrinth file'
+    with open(filename, 'rb') as ff:
+        return ff.read(len(MAGIC)) == MAGIC
+
+
+class ChunkedGrid:
+    """n-D grid of bits stored in a chunked file, memory-mapped chunk by chunk.
+    Cells are addressed by their (0-based) coordinates: see getat and setat (get and set take linear indices,
+    as for a bitgrid.BitGrid, but are slower)."""
+    def __init__(self, filename, writable=False, budget=BUDGET):
+        self.filename = filename
+        self.writable = writable
+        self.file = open(filename, 'r+b' if writable else 'rb')
+        magic, version, ndim = _HEADER.unpack(self.file.read(_HEADER.size))
+        if magic != MAGIC:
+            raise SyntaxError('Not a chunked labyrinth file!')
+        if version != VERSION:
+            raise Exception('Unsupported chunked file version: '+str(version))
+        values = struct.unpack('<%dI' % (3*ndim+2), self.file.read(4*(3*ndim+2)))
+        self.size = tuple(values[:ndim])
+        self.goal = tuple(values[ndim:2*ndim])
+        self.chunk = tuple(values[2*ndim:3*ndim])
+        self.recordsize, self.offset = values[3*ndim:]
+        self.ndim = ndim
+        # linear indices of the cells (as in a bitgrid.BitGrid of the same size, see index and position)
+        self.strides, self.ncells = _strides(self.size)
+        # chunks: their number along every axis, and the strides of the chunks and of the cells of one chunk
+        self.counts = tuple((dimsize + chunksize-1) // chunksize for dimsize, chunksize in zip(self.size, self.chunk))
+        self.chunkstrides, self.nchunks = _strides(self.counts)
+        self.cellstrides, self.chunkcells = _strides(self.chunk)
+        self.mapped = cache.LRUCache(maxcost=budget) # chunk index -> bits of the chunk (mapped from the file)
+
+    def locate(self, coords):
+        'returns the index of the chunk holding the cell of given (0-based) coordinates, and its index in the chunk'
+        chunk, cell = 0, 0
+        for coord, chunksize, chunkstride, cellstride in zip(coords, self.chunk, self.chunkstrides,
+                                                             self.cellstrides):
+            chunk += (coord // chunksize)*chunkstride
+            cell += (coord % chunksize)*cellstride
+        return chunk, cell
+
+    def load(self, chunk):
+        'returns the bits of the chunk of given index (mapping it if needed)'
+        bits = self.mapped.get(chunk)
+        if bits is None:
+            access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_COPY
+            mapped = mmap.mmap(self.file.fileno(), self.recordsize, access=access,
+                               offset=self.offset + chunk*self.recordsize)
+            # (the array keeps the mapping alive: the chunk is unmapped when nothing uses it anymore)
+            bits = (ctypes.c_ubyte * self.recordsize).from_buffer(mapped)
+            self.mapped.put(chunk, bits, self.recordsize)
+        return bits
+
+    def getat(self, coords):
+        'returns the bit (0 or 1) of the cell of given (0-based) coordinates. There is no bounds check!'
+        chunk, cell = self.locate(coords)
+        return (self.load(chunk)[cell >> 3] >> (cell & 7)) & 1
+
+    def setat(self, coords, value=True):
+        'sets (or clears, if not value) the bit of the cell of given (0-based) coordinates'
+        if not self.writable:
+            raise Exception('This chunked grid is read-only!')
+        chunk, cell = self.locate(coords)
+        bits = self.load(chunk)
+        if value:
+            bits[cell >> 3] |= 1 << (cell & 7)
+        else:
+            bits[cell >> 3] &= ~(1 << (cell & 7)) & 0xff
+
+    def run(self, coords, axis, step):
+        """returns the last coordinate along axis of the run of cells with the same bit as the cell at (0-based)
+        coords, going in the direction of step (+1 or -1)"""
+        chunk, cell = self.locate(coords)
+        bits = self.load(chunk)
+        value = (bits[cell >> 3] >> (cell & 7)) & 1
+        coord, length = coords[axis], self.size[axis]
+        chunksize, local = self.chunk[axis], coords[axis] % self.chunk[axis]
+        cellstep, chunkstep = step*self.cellstrides[axis], step*self.chunkstrides[axis]
+        while 0 <= coord+step < length:
+            local += step
+            if 0 <= local < chunksize:
+                cell += cellstep
+            else: # next chunk
+                local -= step*chunksize
+                cell -= cellstep*(chunksize-1)
+                chunk += chunkstep
+                bits = self.load(chunk)
+            if (bits[cell >> 3] >> (cell & 7)) & 1 != value:
+                break
+            coord += step
+        return coord
+
+    def index(self, pos):
+        'returns the linear index of the (1-based) position pos. There is no bounds check!'
+        idx = 0
+        for coord, stride in zip(pos, self.strides):
+            idx += (coord-1)*stride
+        return idx
+
+    def position(self, idx):
+        'returns the (1-based) position of the linear index idx, as a tuple'
+        pos = []
+        for dimsize in self.size:
+            idx, coord = divmod(idx, dimsize)
+            pos.append(coord+1)
+        return tuple(pos)
+
+    def get(self, idx):
+        'returns the bit (0 or 1) at linear index idx'
+        return self.getat([coord-1 for coord in self.position(idx)])
+
+    def set(self, idx, value=True):
+        'sets (or clears, if not value) the bit at linear index idx'
+        self.setat([coord-1 for coord in self.position(idx)], value)
+
+    def focus(self, ranges):
+        """map the chunks holding the cells within the given ranges of (0-based) coordinates (one range per axis),
+        as long as they fit in half the budget (so that mapping them does not evict each other)"""
+        chunkranges = [range(cells[0] // chunksize, cells[-1] // chunksize + 1)
+                       for cells, chunksize in zip(ranges, self.chunk)]
+        room = self.mapped.maxcost // 2
+        for chunkcoords in itertools.product(*chunkranges):
+            room -= self.recordsize
+            if room < 0:
+                break
+            self.load(sum(coord*stride for coord, stride in zip(chunkcoords, self.chunkstrides)))
+
+    def stats(self):
+        'returns the statistics of the mapped chunks (see cache.LRUCache.stats)'
+        return self.mapped.stats()
+
+    def close(self):
+        'unmap the chunks and close the file (nothing can be read afterwards)'
+        self.mapped.clear()
+        self.file.close()
+
+
+def create(filename, grid, goal, chunk=None):
+    """Write the blocks of grid (a bitgrid.BitGrid) and the goal position (in the order of the grid) to the
+    chunked file filename, with chunks of given size (default: see chunkshape)."""
+    if chunk is None:
+        chunk = chunkshape(grid.size)
+    ndim = grid.ndim
+    cellstrides, chunkcells = _strides(chunk)
+    cellbytes = (chunkcells+7) // 8
+    recordsize = (cellbytes + PAGE-1) // PAGE * PAGE
+    headersize = _HEADER.size + 4*(3*ndim+2)
+    offset = (headersize + PAGE-1) // PAGE * PAGE
+    counts = [(dimsize + chunksize-1) // chunksize for dimsize, chunksize in zip(grid.size, chunk)]
+    nchunks = _strides(counts)[1]
+    with open(filename, 'wb') as ff:
+        ff.write(_HEADER.pack(MAGIC, VERSION, ndim))
+        ff.write(struct.pack('<%dI' % (3*ndim+2), *(tuple(grid.size) + tuple(goal) + tuple(chunk) +
+                                                      (recordsize, offset))))
+        ff.truncate(offset + nchunks*recordsize) # (zeros: no blocks)
+    chunked = ChunkedGrid(filename, writable=True)
+    bits = grid.bits
+    for chunkidx, chunkcoords in enumerate(_product(counts)):
+        origin = [coord*chunksize for coord, chunksize in zip(chunkcoords, chunk)]
+        # copy the chunk line by line (along the first axis): a line is contiguous in both grids
+        length = min(chunk[0], grid.size[0] - origin[0])
+        mask = (1 << length) - 1
+        value = 0
+        for line in _product([min(chunksize, dimsize - start) for chunksize, dimsize, start
+                              in zip(chunk[1:], grid.size[1:], origin[1:])]):
+            start = origin[0]
+            cell = 0
+            for coord, begin, stride, cellstride in zip(line, origin[1:], grid.strides[1:], cellstrides[1:]):
+                start += (begin+coord)*stride
+                cell += coord*cellstride
+            data = bits[start >> 3:((start+length+7) >> 3)]
+            value |= ((bitgrid.frombytes(data) >> (start & 7)) & mask) << cell
+        if value:
+            data = bytes(bitgrid.tobytes(value, cellbytes))
+            ctypes.memmove(chunked.load(chunkidx), data, cellbytes)
+    chunked.close()
+
+def _strides(size):
+    'returns the strides of a grid of given size (the first dimension varies fastest), and its number of cells'
+    strides = []
+    ncells = 1
+    for dimsize in size:
+        strides.append(ncells)
+        ncells *= dimsize
+    return tuple(strides), ncells
+
+def _product(counts):
+    'iterates over all the coordinates (0-based) of a grid of given size, the first dimension varying fastest'
+    for coords in itertools.product(*[range(count) for count in counts[::-1]]):
+        yield coords[::-1]
+
+
+if __name__ == '__main__':
+    import argparse
+    import Labyrinth
+    parser = argparse.ArgumentParser(description='Convert a labyrinth file (text or binary) to a chunked file.')
+    parser.add_argument('input', help='labyrinth file to convert')
+    parser.add_argument('output', help='chunked file to write')
+    parser.add_argument('-c', '--chunk', type=int, nargs='+', help='size of the chunks (one per dimension)')
+    args = parser.parse_args()
+    lab = Labyrinth.Labyrinth.fromfile(args.input)
+    create(args.output, lab.grid, lab.grid.position(lab.index(lab.goalpos)), args.chunk)
@@ -0,0 +1,180 @@
+# Distance field of a labyrinth: the number of moves from every cell to the goal (moving one step along one
+# dimension at a time, as the player does), computed once by a breadth-first search from the goal (see solver).
+# The distances are stored compactly, as an array of 16 bits integers (32 bits for the largest labyrinths) in the
+# order of the grid, so that they stay valid whatever the orientation of the labyrinth.
+# They give the moves getting closer to the goal (the hints shown in game, see GUI), and some metrics of the
+# difficulty of the labyrinth (see DistanceField.stats).
+# Distance fields are cached on disk, by the hash of their labyrinth (see labfile.labhash): with a warm cache,
+# getting one only reads it (see load).
+#
+# FORMAT OF A CACHE FILE
+# header: the magic bytes "DDST", the format version, the type of the distances ('H' or 'I', see array), the hash
+#  of the labyrinth (20 bytes), then (as unsigned 32 bits, little-endian) the number of cells and the stats: moves
+#  from the start to the goal, number of cells from which the goal can be reached, number of dead ends, and the
+#  largest distance to the goal.
+# body: the distances (in the byte order of the machine: the cache is local), UNREACHABLE where blocked.
+#
+# Can also be used from the command line, to print the stats: python distfield.py [-d cachedir] labfile [...]
+
+import bitgrid
+import labfile
+import solver
+
+import binascii
+import os
+import struct
+from array import array
+
+
+MAGIC = b'DDST'
+VERSION = 1
+EXTENSION = '.dist'
+CACHEDIR = os.path.join(os.path.expanduser('~'), '.dimlab', 'distances')
+UNREACHABLE = {'H': 0xffff, 'I': 0xffffffff} # distance of the cells from which the goal cannot be reached, by type
+
+_HEADER = struct.Struct('<4sBc20sIIIII')
+
+
+class DistanceField:
+    "Distances to the goal from every cell of a labyrinth (in the order of its grid), and stats on the labyrinth"
+    def __init__(self, distances, length, reachable, deadends, farthest):
+        self.distances = distances # array (see UNREACHABLE)
+        self.unreachable = UNREACHABLE[distances.typecode]
+        self.length = length       # number of moves from the start (1,1,...,1) to the goal (None if impossible)
+        self.reachable = reachable # number of cells from which the goal can be reached
+        self.deadends = deadends   # number of free cells with a single free neighbor
+        self.farthest = farthest   # largest distance to the goal
+
+    def distance(self, lab, pos):
+        'returns the number of moves from the position pos of lab (in its current orientation) to the goal, or None'
+        if not lab.iswithin(pos):
+            return None
+        distance = self.distances[lab.index(pos)]
+        if distance == self.unreachable:
+            return None
+        return distance
+
+    def hints(self, lab, pos):
+        'returns the moves (dimension, +1 or -1) from the position pos of lab that get closer to the goal'
+        here = self.distance(lab, pos)
+        if not here:
+            return []
+        moves = []
+        pos = list(pos)
+        for dim in range(lab.ndim):
+            for mov in (-1, 1):
+                pos[dim] += mov
+                there = self.distance(lab, pos)
+                pos[dim] -= mov
+                if there is not None and there < here:
+                    moves.append((dim, mov))
+        return moves
+
+    def stats(self):
+        'returns the stats of the labyrinth, as a dictionary'
+        return {'length': self.length, 'reachable': self.reachable, 'deadends': self.deadends,
+                'farthest': self.farthest}
+
+    def save(self, filename, labhash):
+        'write this distance field, of the labyrinth of given hash (see labfile.labhash), to file filename'
+        with open(filename, 'wb') as ff:
+            ff.write(_HEADER.pack(MAGIC, VERSION, self.distances.typecode, labhash, len(self.distances),
+                                  self.unreachable if self.length is None else self.length,
+                                  self.reachable, self.deadends, self.farthest))
+            self.distances.tofile(ff)
+
+
+def supports(lab):
+    'determines if the distance field of lab can be computed (all its blocks must be in memory)'
+    return isinstance(lab.grid, bitgrid.BitGrid)
+
+def compute(lab):
+    'compute the DistanceField of lab (see supports)'
+    if not supports(lab):
+        raise Exception('Distance fields need all the blocks in memory (not a chunked labyrinth)!')
+    grid = lab.grid
+    typecode = 'H' if grid.ncells < UNREACHABLE['H'] else 'I'
+    distances = array(typecode, [UNREACHABLE[typecode]]) * grid.ncells
+    engine = solver.Engine(grid)
+    search = solver.Search(engine, lab.index(lab.goalpos))
+    distances[search.frontier[0]] = 0
+    farthest = 0
+    while True:
+        frontier = search.expand()
+        if not search.width:
+            break
+        farthest = search.level
+        for idx in search.indices(frontier):
+            distances[idx] = farthest
+    length = int(distances[0]) # (the start is the first cell of the grid, in any orientation)
+    if length == UNREACHABLE[typecode]:
+        length = None
+    # dead ends: count the free neighbors of every cell (once, or more), along every axis and direction
+    free = engine.free
+    once = twice = 0
+    for stride, notlast, notfirst in engine.moves:
+        for moved in ((free & notlast) << stride, (free & notfirst) >> stride):
+            twice |= once & moved
+            once |= moved
+    deadends = bin(once & ~twice & free).count('1')
+    return DistanceField(distances, length, search.count, deadends, farthest)
+
+def fromfile(filename, labhash=None):
+    'read the distance field in file filename (checking that it is the one of the labyrinth of hash labhash, if given)'
+    with open(filename, 'rb') as ff:
+        magic, version, typecode, filehash, ncells, length, reachable, deadends, farthest = \
+            _HEADER.unpack(ff.read(_HEADER.size))
+        if magic != MAGIC:
+            raise SyntaxError('Not a distance field file!')
+        if version != VERSION:
+            raise Exception('Unsupported distance field file version: '+str(version))
+        if labhash is not None and filehash != labhash:
+            raise Exception('Not the distance field of this labyrinth!')
+        distances = array(typecode)
+        distances.fromfile(ff, ncells)
+    if length == UNREACHABLE[typecode]:
+        length = None
+    return DistanceField(distances, length, reachable, deadends, farthest)
+
+def load(lab, directory=CACHEDIR):
+    """returns the DistanceField of lab (see supports): read from the cache in directory if it is there, or else
+    computed and written there (unless directory is None)"""
+    if directory is None or not supports(lab):
+        return compute(lab)
+    labhash = labfile.labhash(lab.grid, lab.grid.position(lab.index(lab.goalpos)))
+    filename = os.path.join(directory, binascii.hexlify(labhash) + EXTENSION)
+    if os.path.exists(filename):
+        try:
+            return fromfile(filename, labhash)
+        except (Exception, EOFError):
+            pass # (damaged file: compute the field again)
+    field = compute(lab)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # (written aside, then renamed: a file in the cache is always complete)
+        field.save(filename + '.tmp', labhash)
+        os.rename(filename + '.tmp', filename)
+    except (IOError, OSError):
+        pass # (no cache, then)
+    return field
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+    import Labyrinth
+    parser = argparse.ArgumentParser(description='Print the stats of labyrinths (from their distance fields).')
+    parser.add_argument('labfiles', nargs='+', help='labyrinth files')
+    parser.add_argument('-d', '--cache', default=CACHEDIR, help='cache directory (default: %(default)s)')
+    parser.add_argument('-n', '--nocache', action='store_true', help='always compute the distance fields')
+    args = parser.parse_args()
+    for filename in args.labfiles:
+        lab = Labyrinth.Labyrinth.fromfile(filename)
+        began = time.time()
+        field = load(lab, None if args.nocache else args.cache)
+        elapsed = time.time() - began
+        length = 'UNSOLVABLE' if field.length is None else '%d moves' % field.length
+        sys.stdout.write('%s: %s, %d reachable cells, %d dead ends, farthest cell at %d moves (%.3fs)\n' % (
+            filename, length, field.reachable, field.deadends, field.farthest, elapsed))
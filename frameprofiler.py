@@ -0,0 +1,149 @@
+# Instrumentation of the frames of a game: the time spent in every stage of a frame (see STAGES) is kept for the
+# last frames in a ring buffer, from which the frame rate and the percentiles of the frame time are computed.
+# The 'idle' stage is the time spent waiting for events when nothing moves (see Game.wait): such frames last long,
+# and are left out of the frame rate, percentiles and stage times (they are only counted in the share of the time
+# spent idle).
+# In game, OVERLAYKEY shows these statistics over the labyrinth, and PROFILEKEY starts (and stops) cProfile.
+# When the labyrinth is over, the frames can be exported (as CSV or JSON) in the directory given by the
+# "FrameLog" setting, and the cProfile statistics are written there too (or in the current directory).
+# The settings are:
+#  * "FrameTimes": number of frames kept (default: FRAMES, 0 to disable the instrumentation)
+#  * "FrameLog": directory where the frames (and cProfile statistics) are written when a labyrinth is over
+#  * "FrameLogFormat": 'csv' (default) or 'json'
+
+import cProfile
+import json
+import os
+import time
+from array import array
+from timeit import default_timer as clock
+
+import pygame
+
+
+STAGES = ('idle', 'events', 'rotate', 'animate', 'collision', 'draw', 'overlay', 'wait')
+FRAMES = 600 # frames kept by default (10 seconds at 60 FPS)
+OVERLAYKEY = pygame.K_F1
+PROFILEKEY = pygame.K_F2
+REFRESH = 15 # frames between updates of the overlay text
+
+
+class FrameProfiler:
+    "Per-stage frame timers, with a ring buffer of the last frames"
+    def __init__(self, settings={}):
+        self.capacity = settings.get("FrameTimes", FRAMES)
+        self.logdir = settings.get("FrameLog")
+        self.logformat = settings.get("FrameLogFormat", 'csv')
+        self.times = dict((stage, array('d', [0.0] * self.capacity)) for stage in STAGES) # seconds, by frame
+        self.totals = array('d', [0.0] * self.capacity)
+        self.count = 0     # number of frames measured (the last ones are at count-1 modulo capacity)
+        self.slot = 0      # slot of the current frame in the ring buffer
+        self.last = None   # time of the last mark
+        self.began = None  # beginning of the current frame
+        self.showing = False # if True, show the overlay (see overlay)
+        self.lines = []      # text of the overlay
+        self.profile = None  # cProfile.Profile, while profiling
+
+    def begin(self):
+        'start measuring a new frame'
+        self.slot = self.count % self.capacity
+        for stage in STAGES:
+            self.times[stage][self.slot] = 0.0
+        self.began = self.last = clock()
+
+    def mark(self, stage):
+        'the given stage of the frame is over (the time since the last mark is added to it)'
+        now = clock()
+        self.times[stage][self.slot] += now - self.last
+        self.last = now
+
+    def end(self):
+        'the current frame is over'
+        self.totals[self.slot] = self.last - self.began
+        self.count += 1
+
+    def handle(self, events):
+        'check the events for the hotkeys (show the overlay, profile)'
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                if event.key == OVERLAYKEY:
+                    self.showing = not self.showing
+                elif event.key == PROFILEKEY:
+                    self.toggleprofile()
+
+    def frames(self):
+        'returns the indices in the ring buffer of the frames measured, oldest first'
+        if self.count <= self.capacity:
+            return range(self.count)
+        start = self.count % self.capacity
+        return range(start, self.capacity) + range(start)
+
+    def stats(self):
+        """returns the statistics of the frames in the ring buffer, as a dictionary: frames per second, p50 and
+        p99 frame times, and the mean time of every stage, of the active frames (those that did not wait for events,
+        times in seconds), and the share of the time spent idle (of all the frames)"""
+        frames = self.frames()
+        if not frames:
+            return None
+        idle = self.times['idle']
+        active = [i for i in frames if not idle[i]]
+        totals = sorted(self.totals[i] for i in active)
+        elapsed = sum(totals)
+        stats = {'frames': len(frames), 'active': len(active), 'fps': len(totals)/elapsed if elapsed else 0.0,
+                 'p50': totals[len(totals)//2] if totals else 0.0,
+                 'p99': totals[min(len(totals)-1, len(totals)*99//100)] if totals else 0.0}
+        for stage in STAGES:
+            times = self.times[stage]
+            stats[stage] = sum(times[i] for i in active) / len(active) if active else 0.0
+        overall = sum(self.totals[i] for i in frames)
+        stats['idleshare'] = sum(idle[i] for i in frames)/overall if overall else 0.0
+        return stats
+
+    def overlay(self):
+        'returns the lines of text of the overlay (updated every REFRESH frames)'
+        if self.count % REFRESH == 0 or not self.lines:
+            stats = self.stats()
+            if stats is None:
+                return []
+            self.lines = ['%.0f FPS  p50 %.1f  p99 %.1f ms' % (stats['fps'], 1e3*stats['p50'], 1e3*stats['p99']),
+                          'idle %.0f%% of the time' % (100*stats['idleshare'])]
+            self.lines += ['%-9s %6.2f ms' % (stage, 1e3*stats[stage]) for stage in STAGES if stage != 'idle']
+            if self.profile:
+                self.lines.append('profiling...')
+        return self.lines
+
+    def toggleprofile(self):
+        'start cProfile, or stop it (and write its statistics, see close)'
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.profile.disable()
+            self.profile.dump_stats(self.filename('profile', 'prof'))
+            self.profile = None
+        self.lines = [] # (refresh the overlay)
+
+    def filename(self, kind, extension):
+        'returns the name of a file to write (in the log directory, if any)'
+        name = '%s-%s.%s' % (kind, time.strftime('%Y%m%d-%H%M%S'), extension)
+        return os.path.join(self.logdir or '.', name)
+
+    def export(self, filename):
+        'write the frames in the ring buffer to filename, as CSV or JSON (depending on its extension)'
+        frames = self.frames()
+        columns = ('total',) + STAGES
+        rows = [[self.totals[i]] + [self.times[stage][i] for stage in STAGES] for i in frames]
+        with open(filename, 'w') as ff:
+            if filename.endswith('.json'):
+                json.dump({'columns': columns, 'unit': 's', 'stats': self.stats(), 'frames': rows}, ff)
+            else:
+                ff.write(','.join(columns) + '\n')
+                for row in rows:
+                    ff.write(','.join('%.6f' % value for value in row) + '\n')
+
+    def close(self):
+        'the labyrinth is over: stop profiling, and export the frames (if there is a log directory)'
+        if self.profile is not None:
+            self.toggleprofile()
+        if self.logdir and self.count:
+            self.export(self.filename('frames', self.logformat))
@@ -0,0 +1,169 @@
+# Procedural generation of n-D labyrinths, written in the format read by Labyrinth.fromfile.
+# The labyrinth is a grid of rooms (cells whose coordinates are all odd) separated by walls (cells with exactly
+# one even coordinate): the rooms are connected by carving a spanning tree of walls, either with a randomized
+# depth-first search ('dfs', long winding corridors) or with a randomized Kruskal algorithm ('kruskal', many
+# short dead ends). Since every room is connected, the goal (placed in the room opposite the start) can always
+# be reached. The density is the fraction of the remaining walls that are kept: below 1, loops appear.
+# The blocks are kept in a bitgrid.BitGrid, and the file is written line by line, so the memory needed is
+# a few bits per cell, whatever the size of the labyrinth.
+#
+# Can also be used from the command line: python generator.py [options] size size size... output
+# (see python generator.py -h)
+
+import bitgrid
+
+import argparse
+import itertools
+import random
+from array import array
+
+
+ALGORITHMS = ('dfs', 'kruskal')
+
+
+def generate(size, seed=None, density=1.0, algorithm='dfs'):
+    """Generate a labyrinth of given size (a list of at least 3 dimensions). Returns the blocks, as a
+    bitgrid.BitGrid, and the goal position. The same seed always gives the same labyrinth."""
+    if len(size) < 3:
+        raise Exception('Labyrinth files need at least 3 dimensions! (use a size of 1 for unused ones)')
+    if algorithm not in ALGORITHMS:
+        raise Exception('Unknown algorithm: '+str(algorithm)+' (should be one of '+', '.join(ALGORITHMS)+')')
+    rng = random.Random(seed)
+    grid = bitgrid.BitGrid(size)
+    grid.bits[:] = b'\xff' * grid.nbytes # everything is blocked, until carved
+    for idx in range(grid.ncells, 8*grid.nbytes):
+        grid.set(idx, False) # (except the padding)
+    if algorithm == 'dfs':
+        _carvedfs(grid, rng)
+    else:
+        _carvekruskal(grid, rng)
+    # open some more walls (creating loops), depending on density
+    if density < 1:
+        for wall in _walls(grid):
+            if grid.get(wall) and rng.random() >= density:
+                grid.set(wall, False)
+    # the goal is in the room opposite the start
+    goal = tuple(dimsize - (1 - dimsize % 2) for dimsize in grid.size)
+    return grid, goal
+
+def _moves(grid):
+    'returns, for every axis along which rooms follow each other, its stride and its size'
+    return [(stride, dimsize) for stride, dimsize in zip(grid.strides, grid.size) if dimsize > 2]
+
+def _carvedfs(grid, rng):
+    'carve a spanning tree of the rooms of grid with a randomized depth-first search'
+    moves = _moves(grid)
+    grid.set(0, False)
+    stack = array('l', [0])
+    while stack:
+        idx = stack[-1]
+        # find the neighbor rooms not carved yet
+        candidates = []
+        for stride, dimsize in moves:
+            coord = (idx // stride) % dimsize
+            if coord+2 < dimsize and grid.get(idx + 2*stride):
+                candidates.append(stride)
+            if coord >= 2 and grid.get(idx - 2*stride):
+                candidates.append(-stride)
+        if not candidates:
+            stack.pop()
+            continue
+        step = rng.choice(candidates)
+        grid.set(idx + step, False)
+        grid.set(idx + 2*step, False)
+        stack.append(idx + 2*step)
+
+def _carvekruskal(grid, rng):
+    'carve a spanning tree of the rooms of grid with a randomized Kruskal algorithm'
+    # union-find forest over the rooms, numbered in their own (twice smaller) grid
+    roomstrides, nrooms = [], 1
+    for dimsize in grid.size:
+        roomstrides.append(nrooms)
+        nrooms *= (dimsize+1) // 2
+    parents = array('l', xrange(nrooms))
+    def root(room):
+        while parents[room] != room:
+            parents[room] = parents[parents[room]] # path halving
+            room = parents[room]
+        return room
+    axes = zip(grid.strides, grid.size, roomstrides)
+    roomaxes = [(stride, dimsize, roomstride) for stride, dimsize, roomstride in axes if dimsize > 2]
+    def roomof(idx):
+        room = 0
+        for stride, dimsize, roomstride in axes:
+            room += ((idx // stride) % dimsize // 2)*roomstride
+        return room
+    for room in _rooms(grid):
+        grid.set(room, False)
+    walls = array('l', _walls(grid))
+    rng.shuffle(walls)
+    for wall in walls:
+        # the rooms on both sides of the wall (along the single axis where the wall coordinate is even)
+        for stride, dimsize, roomstride in roomaxes:
+            if (wall // stride) % dimsize % 2:
+                break
+        first = roomof(wall - stride)
+        first, second = root(first), root(first + roomstride)
+        if first != second:
+            parents[first] = second
+            grid.set(wall, False)
+
+def _rooms(grid):
+    'iterates over the linear indices of all the rooms of grid'
+    ranges = [range(0, dimsize, 2) for dimsize in grid.size]
+    for coords in itertools.product(*ranges[::-1]):
+        idx = 0
+        for coord, stride in zip(coords, grid.strides[::-1]):
+            idx += coord*stride
+        yield idx
+
+def _walls(grid):
+    'iterates over the linear indices of all the walls separating two rooms of grid'
+    moves = _moves(grid)
+    for room in _rooms(grid):
+        for stride, dimsize in moves:
+            if (room // stride) % dimsize + 2 < dimsize:
+                yield room + stride
+
+
+def write(out, grid, goal):
+    """Write the labyrinth with given blocks (bitgrid.BitGrid) and goal to the open file out,
+    in the format read by Labyrinth.fromfile. This writes one line at a time."""
+    size = grid.size
+    out.write('LAB '+' '.join(str(dimsize) for dimsize in size)+'\n')
+    goalidx = grid.index(goal)
+    bits = grid.bits
+    for cpos in itertools.product(*[range(1, dimsize+1) for dimsize in size[:1:-1]]):
+        cpos = cpos[::-1]
+        out.write('floor '+' '.join(str(coord) for coord in cpos)+'\n')
+        idx = grid.index((1, 1) + cpos)
+        for y in range(size[1]):
+            line = []
+            for x in range(idx, idx+size[0]):
+                if (bits[x >> 3] >> (x & 7)) & 1:
+                    line.append('X')
+                elif x == goalidx:
+                    line.append('*')
+                else:
+                    line.append('O')
+            out.write(''.join(line)+'\n')
+            idx += size[0]
+
+def generatefile(filename, size, seed=None, density=1.0, algorithm='dfs'):
+    'Generate a labyrinth (see generate) and write it to the file filename. Returns the goal position.'
+    grid, goal = generate(size, seed, density, algorithm)
+    with open(filename, 'w') as ff:
+        write(ff, grid, goal)
+    return goal
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a random n-D labyrinth file.')
+    parser.add_argument('size', type=int, nargs='+', help='size of the labyrinth in every dimension (at least 3)')
+    parser.add_argument('output', help='labyrinth file to write')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='random seed')
+    parser.add_argument('-d', '--density', type=float, default=1.0,
+                        help='fraction of the walls kept once every room is connected (default: 1, no loops)')
+    parser.add_argument('-a', '--algorithm', choices=ALGORITHMS, default='dfs', help='carving algorithm')
+    args = parser.parse_args()
+    generatefile(args.output, args.size, args.seed, args.density, args.algorithm)
@@ -1,5 +1,7 @@
 # Very very very small module to define code that is reused too often
 
+from operator import itemgetter
+
 
 def rotate1(block, forward=True):
     "Rotate one block: make first element last (forward), and vice-versa"
@@ -7,3 +9,36 @@ def rotate1(block, forward=True):
 	return block[1:] + block[0:1]
     else:
 	return block[-1:] + block[0:-1]
+
+
+# Permutations of the dimensions: a permutation perm is a sequence such that the dimension i of a permuted
+# block is the dimension perm[i] of the original block (rotate1 is one of them, see rotation).
+
+def permute(block, perm):
+    "Permute the dimensions of one block (the result has the same type as block)"
+    permuted = [block[i] for i in perm]
+    if isinstance(block, tuple):
+        return tuple(permuted)
+    return permuted
+
+def permute_many(blocks, perm):
+    "Permute the dimensions of many blocks at once (N x ndim coordinates): returns a list of tuples"
+    if len(perm) == 1:
+        return [(block[perm[0]],) for block in blocks]
+    getter = itemgetter(*perm)
+    return [getter(block) for block in blocks]
+
+def rotation(ndim, forward=True):
+    "Returns the permutation applied by rotate1 to blocks of ndim dimensions"
+    return rotate1(tuple(range(ndim)), forward)
+
+def compose(first, second):
+    "Returns the permutation equivalent to applying first, then second"
+    return tuple(first[i] for i in second)
+
+def inverse(perm):
+    "Returns the permutation undoing perm"
+    inv = [0] * len(perm)
+    for i, p in enumerate(perm):
+        inv[p] = i
+    return tuple(inv)
@@ -0,0 +1,131 @@
+# Binary labyrinth files: a compact alternative to the text format described in the Labyrinth module.
+# A binary file is made of:
+#  - a header: the magic bytes "DLAB", the format version, the number of dimensions n, the compression used
+#     (see COMPRESSIONS), then n sizes and the n coordinates of the goal (unsigned 32 bits, little-endian), and
+#     the SHA-1 hash of the (uncompressed) payload, which identifies the content of the labyrinth.
+#  - the payload: the blocks, one bit per cell, exactly as stored by bitgrid.BitGrid (first dimension fastest).
+# Uncompressed files are memory-mapped: the grid reads its bits directly from the file (copy-on-write, so the
+# file is never modified), and only the pages actually used are read from the disk.
+#
+# Can also be used from the command line, to convert files: python labfile.py [-c gzip|lzma|none] input [output]
+# (text files are converted to binary, binary files back to text)
+
+import bitgrid
+
+import ctypes
+import hashlib
+import mmap
+import struct
+import zlib
+try:
+    import lzma # not in the standard library of python 2
+except ImportError:
+    lzma = None
+
+
+MAGIC = b'DLAB'
+VERSION = 1
+COMPRESSIONS = {'none': 0, 'gzip': 1, 'lzma': 2}
+EXTENSION = '.lab'
+
+_HEADER = struct.Struct('<4sBBB')
+_HASHSIZE = 20
+
+
+def isbinary(filename):
+    'determines if the file filename is a binary labyrinth file'
+    with open(filename, 'rb') as ff:
+        return ff.read(len(MAGIC)) == MAGIC
+
+def load(filename, verify=False):
+    """Read the binary labyrinth file filename. Returns its blocks (as a bitgrid.BitGrid), its goal position
+    and its hash. If verify, the hash is checked against the content (this reads the whole file)."""
+    with open(filename, 'rb') as ff:
+        magic, version, ndim, compression = _HEADER.unpack(ff.read(_HEADER.size))
+        if magic != MAGIC:
+            raise SyntaxError('Not a binary labyrinth file!')
+        if version != VERSION:
+            raise Exception('Unsupported labyrinth file version: '+str(version))
+        coords = struct.unpack('<%dI' % (2*ndim), ff.read(8*ndim))
+        size, goal = coords[:ndim], coords[ndim:]
+        digest = ff.read(_HASHSIZE)
+        offset = ff.tell()
+        grid = bitgrid.BitGrid(size)
+        if compression == COMPRESSIONS['none']:
+            if grid.nbytes:
+                ff.seek(0, 2)
+                if ff.tell() < offset + grid.nbytes:
+                    raise Exception('Truncated labyrinth file!')
+                mapped = mmap.mmap(ff.fileno(), 0, access=mmap.ACCESS_COPY)
+                grid.bits = (ctypes.c_ubyte * grid.nbytes).from_buffer(mapped, offset)
+        else:
+            grid.bits = bytearray(_decompress(ff.read(), compression))
+            if len(grid.bits) != grid.nbytes:
+                raise Exception('Wrong payload size! ('+str(len(grid.bits))+' bytes for '+str(size)+')')
+    if verify and hashlib.sha1(grid.bits).digest() != digest:
+        raise Exception('Corrupted labyrinth file! (hash mismatch)')
+    return grid, goal, digest
+
+def save(filename, grid, goal, compression='none'):
+    """Write the blocks (bitgrid.BitGrid) and goal position (in the order of the grid) to the binary file
+    filename, with given compression (see COMPRESSIONS). Returns the hash of the content."""
+    if compression not in COMPRESSIONS:
+        raise Exception('Unknown compression: '+str(compression)+' (should be one of '+', '.join(COMPRESSIONS)+')')
+    payload = bytes(bytearray(grid.bits[:grid.nbytes]))
+    digest = hashlib.sha1(payload).digest()
+    with open(filename, 'wb') as ff:
+        ff.write(_HEADER.pack(MAGIC, VERSION, grid.ndim, COMPRESSIONS[compression]))
+        ff.write(struct.pack('<%dI' % (2*grid.ndim), *(tuple(grid.size) + tuple(goal))))
+        ff.write(digest)
+        ff.write(_compress(payload, COMPRESSIONS[compression]))
+    return digest
+
+def savelab(filename, lab, compression='none'):
+    'Write the Labyrinth lab to the binary file filename (in its original orientation). Returns its hash.'
+    return save(filename, lab.grid, lab.grid.position(lab.index(lab.goalpos)), compression)
+
+def labhash(grid, goal):
+    """returns the SHA-1 hash identifying a labyrinth: its blocks (a bitgrid.BitGrid), its size and its goal (in
+    the order of the grid), whatever the file it was read from"""
+    digest = hashlib.sha1(bytearray(grid.bits[:grid.nbytes]))
+    digest.update(repr((tuple(grid.size), tuple(goal))))
+    return digest.digest()
+
+def _compress(data, compression):
+    if compression == COMPRESSIONS['gzip']:
+        packer = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip container
+        return packer.compress(data) + packer.flush()
+    if compression == COMPRESSIONS['lzma']:
+        if lzma is None:
+            raise Exception('lzma compression is not available with this version of python!')
+        return lzma.compress(data)
+    return data
+
+def _decompress(data, compression):
+    if compression == COMPRESSIONS['gzip']:
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    if compression == COMPRESSIONS['lzma']:
+        if lzma is None:
+            raise Exception('lzma compression is not available with this version of python!')
+        return lzma.decompress(data)
+    raise Exception('Unknown compression: '+str(compression))
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import Labyrinth
+    import generator
+    parser = argparse.ArgumentParser(description='Convert labyrinth files between the text and binary formats.')
+    parser.add_argument('input', help='labyrinth file to convert (text or binary)')
+    parser.add_argument('output', nargs='?', help='converted file (default: input with the other extension)')
+    parser.add_argument('-c', '--compression', choices=sorted(COMPRESSIONS), default='none',
+                        help='compression of the binary file (default: none, so that it can be memory-mapped)')
+    args = parser.parse_args()
+    if isbinary(args.input):
+        grid, goal, digest = load(args.input, verify=True)
+        with open(args.output or os.path.splitext(args.input)[0] + '.txt', 'w') as ff:
+            generator.write(ff, grid, goal)
+    else:
+        savelab(args.output or os.path.splitext(args.input)[0] + EXTENSION,
+                Labyrinth.Labyrinth.fromfile(args.input), args.compression)
@@ -0,0 +1,133 @@
+# Hot reload of labyrinth files: while a labyrinth is played, its (text) file is watched, and the changes made to it
+# are applied to the labyrinth in game, without restarting (see Game, "Watch" setting).
+# Only the floors whose lines changed are parsed again (see Labyrinth.readfloors and parsefloor), and only the cells
+# that changed are written in the labyrinth, with its goal if it moved (see Labyrinth.update): whatever the size of
+# the file, a reload costs reading it, and parsing the floors being edited.
+# The blocks are stored in the order of the file, so that the player keeps its position and the labyrinth its
+# rotation. A file being edited may be invalid for a while: its errors are kept (see Watcher.error), and the
+# labyrinth is left as it is until the file is valid again. The size of the labyrinth cannot change, and neither
+# can a block be put where the player is (the reload fails, see Watcher.player).
+
+import Labyrinth
+import bitgrid
+
+import os
+import time
+
+
+PERIOD = 0.5 # seconds between two checks of the file, by default (see Game.start)
+
+
+def supports(lab):
+    'determines if lab can be watched: it must have been read from a text file (see Labyrinth.fromfile)'
+    if lab.filename is None or not isinstance(lab.grid, bitgrid.BitGrid):
+        return False
+    with open(lab.filename, 'rb') as ff:
+        return ff.read(3).lower() == b'lab'
+
+
+class Watcher:
+    "Applies the changes of the text file of a labyrinth to the labyrinth (see poll)"
+    def __init__(self, lab, filename=None, player=None):
+        '''watch the file filename (default: the file lab was read from) for changes, and apply them to lab.
+        The cell of player (if any, see Game.Player) is never blocked by a reload.'''
+        self.lab = lab
+        self.filename = filename or lab.filename
+        self.player = player
+        self.stat = self.filestat()
+        self.header, self.floors = self.read()
+        self.error = None   # why the last reload failed (None if it did not)
+        self.reloads = 0    # number of reloads
+        self.elapsed = None # time taken by the last reload, in seconds
+
+    def filestat(self):
+        'returns what tells that the file changed: its time of modification and size (None if it is missing)'
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None # (being saved, maybe)
+        return stat.st_mtime, stat.st_size
+
+    def read(self):
+        """read the file: returns its header line, and its floors, as a dictionary (position in the color
+        dimensions, as a tuple -> list of the lines of every part of the file describing it, see readfloors)"""
+        with open(self.filename, 'r') as ff:
+            header = ff.readline()
+            body = ff.readlines()
+        floors = {}
+        for cpos, lines in Labyrinth.readfloors(body):
+            floors.setdefault(tuple(cpos), []).append(lines)
+        return header, floors
+
+    def poll(self):
+        """reload the file if it changed since the last call. Returns True if the labyrinth changed, False if the
+        file could not be reloaded (see error), None if the file did not change."""
+        stat = self.filestat()
+        if stat is None or stat == self.stat:
+            return None
+        self.stat = stat
+        try:
+            changed = self.reload()
+        except (Exception, IOError) as e:
+            self.error = str(e)
+            return False
+        self.error = None
+        return True if changed else None
+
+    def reload(self):
+        'read the file again, and apply the floors that changed to the labyrinth. Returns True if anything changed.'
+        began = time.time()
+        header, floors = self.read()
+        if header.split() != self.header.split():
+            raise Exception('The size of the labyrinth changed! (restart to see it)')
+        changed = [cpos for cpos in set(floors) | set(self.floors) if floors.get(cpos) != self.floors.get(cpos)]
+        if not changed:
+            self.floors = floors
+            return False
+        lab, grid = self.lab, self.lab.grid
+        sizes = list(grid.size)
+        # the goal (in the order of the file) stays where it is, unless its floor changed
+        goal = grid.position(lab.index(lab.goalpos))
+        newgoal = None if goal[2:] in changed else goal
+        moved = newgoal is None
+        changes = []
+        for cpos in changed:
+            if len(cpos) != len(sizes)-2 or not all(1 <= coord <= dimsize for coord, dimsize
+                                                      in zip(cpos, sizes[2:])):
+                raise Exception('Floor not within labyrinth! (at floor '+str(cpos)+')')
+            blocked = set()
+            for lines in floors.get(cpos, ()):
+                blocks, floorgoal = Labyrinth.parsefloor(sizes, list(cpos), lines)
+                for block in blocks:
+                    if block[0] > sizes[0]:
+                        raise Exception('Block not within labyrinth! (at block '+str(block)+')')
+                    blocked.add(grid.index(block))
+                if floorgoal:
+                    if newgoal:
+                        raise Exception('Goalpos already defined! (previous: '+str(newgoal)+')')
+                    newgoal = floorgoal
+            # compare the cells of the floor with the labyrinth
+            first = grid.index((1, 1) + cpos)
+            for y in range(sizes[1]):
+                idx = first + y*grid.strides[1]
+                for x in range(sizes[0]):
+                    value = idx in blocked
+                    if grid.get(idx) != value:
+                        changes.append((idx, value))
+                    idx += grid.strides[0]
+        if newgoal is None:
+            raise Exception('No goal position! (there must be one * or G)')
+        goalidx = grid.index(newgoal)
+        blocks = dict(changes)
+        if blocks.get(goalidx, grid.get(goalidx)):
+            raise Exception('Block at goal position!')
+        if self.player is not None and blocks.get(lab.index(self.player.pos)):
+            raise Exception('Block at player position! (at '+str(tuple(self.player.pos))+', move away first)')
+        moved = moved and tuple(newgoal) != tuple(goal)
+        self.floors = floors
+        if not changes and not moved:
+            return False # (only the way the floors are written changed)
+        lab.update(changes, newgoal if moved else None)
+        self.reloads += 1
+        self.elapsed = time.time() - began
+        return True
@@ -0,0 +1,509 @@
+# Networked games: an authoritative server hosts a labyrinth and the players of several clients, and runs the logic
+# of their games (see Game.step): the clients only send the inputs of their player, and show the players as the
+# server sees them. Every tick, the server sends to every client the changes of the players since the last state it
+# sent to that client (so that players standing still cost nothing). Between these states, the clients interpolate
+# the motions of the players with their Animation, started where the server started it (see Client.animate).
+# The server runs in a single thread, waiting on all the connections at once (with select): a process can host
+# dozens of clients. Networked games have no rotation (the labyrinth, in its original orientation, is shared).
+#
+# PROTOCOL (over TCP)
+# Every message is made of its length (as a varint, see replay.putvarint), its type (one byte) and its content,
+# made of varints unless noted:
+#  * HELLO (client): the protocol version, the flags (1 if the AZERTY keyset is used) and the SHA-1 hash of the
+#    labyrinth of the client (20 bytes, see replay.labhash). The server answers with WELCOME (the id of the player
+#    of the client), or with REFUSED (the reason, as text) and closes the connection.
+#  * INPUT (client): the events of a frame of the client: their number, then the type (see replay.EVENTS) and key
+#    of every event
+#  * PING (client): any bytes, sent back at once by the server in a PONG (to measure the latency)
+#  * STATE (server): the tick, the number of players that changed, then for every one of them: its id, the fields
+#    that changed (one byte, see POSITION...) and their new values, in this order: position (ndim coordinates),
+#    motion (see encodemotion), animation (its motion, 0 if none, then its initial position and current frame).
+#    WON and LEFT have no value.
+#
+# Can also be used from the command line, to start a server: python netplay.py labfile [-p port]
+# or to join one: python netplay.py labfile -j host:port
+
+import Game
+import replay
+
+import errno
+import select
+import socket
+import struct
+from timeit import default_timer as now
+
+
+VERSION = 1
+PORT = 7450
+TICKRATE = Game.FPS # ticks per second (the logic runs at the fixed rate of a local game, see Game.start)
+RECVSIZE = 1 << 16
+MAXMESSAGE = 1 << 16 # longest message accepted, in bytes (and most data read at once: see Connection.receive)
+MAXBACKLOG = 1 << 18 # most data queued for a peer, in bytes (beyond that, it is too slow: disconnected)
+AZERTY = 1 # flag
+
+# message types
+HELLO, WELCOME, REFUSED, INPUT, PING, PONG, STATE = range(7)
+# fields of a player in a STATE message
+POSITION, MOTION, ANIMATION, WON, LEFT = 1, 2, 4, 8, 16
+
+
+class Connection:
+    "Messages over a non-blocking socket (buffered both ways)"
+    def __init__(self, sock):
+        self.sock = sock
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.closed = False
+
+    def send(self, type, content=b''):
+        'queue a message (see flush). A peer that lets more than MAXBACKLOG bytes queue up is disconnected.'
+        if len(self.outbuf) > MAXBACKLOG:
+            self.closed = True
+            return
+        replay.putvarint(self.outbuf, len(content)+1)
+        self.outbuf.append(type)
+        self.outbuf += content
+
+    def flush(self):
+        'send as much of the queued messages as possible, without waiting'
+        while self.outbuf and not self.closed:
+            try:
+                sent = self.sock.send(self.outbuf)
+            except socket.error as error:
+                if error.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    self.closed = True
+                return
+            del self.outbuf[:sent]
+
+    def receive(self):
+        """returns the messages received, as (type, content) pairs, without waiting. A peer sending a message longer
+        than MAXMESSAGE is disconnected."""
+        try:
+            while len(self.inbuf) < MAXMESSAGE: # (the rest is read by the next call: the buffer stays bounded)
+                data = self.sock.recv(RECVSIZE)
+                if not data:
+                    self.closed = True
+                    break
+                self.inbuf += data
+        except socket.error as error:
+            if error.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.closed = True
+        messages = []
+        offset = 0
+        while offset < len(self.inbuf):
+            try:
+                length, start = replay.getvarint(self.inbuf, offset)
+            except IndexError: # (incomplete length)
+                break
+            if not length or length > MAXMESSAGE: # (a message has at least its type: not a client of ours)
+                self.closed = True
+                break
+            if start + length > len(self.inbuf):
+                break
+            messages.append((self.inbuf[start], self.inbuf[start+1:start+length]))
+            offset = start + length
+        del self.inbuf[:offset]
+        if len(self.inbuf) >= MAXMESSAGE: # (what is left is a part of a message: not even its length)
+            self.closed = True
+        return messages
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+
+
+def encodemotion(motion):
+    'returns the code of a motion (dimension, +1 or -1): 0 for no motion'
+    if not motion:
+        return 0
+    dim, mov = motion
+    return 2*dim + (mov > 0) + 1
+
+def decodemotion(code):
+    'returns the motion of given code (see encodemotion)'
+    if not code:
+        return None
+    dim, up = divmod(code-1, 2)
+    return (dim, 1 if up else -1)
+
+def snapshot(game):
+    """returns the state of the player of game sent to the clients (its position, motion, animation and victory),
+    and the current frame of its animation (sent with the animation, but not a change in itself)"""
+    player = game.player
+    animation = player.animation
+    if animation:
+        animation, frame = (encodemotion((animation.dim, animation.mov)), tuple(animation.pos)), animation.i
+    else:
+        frame = 0
+    return (tuple(player.pos), encodemotion(player.motion), animation, not game.toanimate), frame
+
+def encodeplayer(id, state, frame, known):
+    'returns the fields of the player id whose state (see snapshot) differ from known (None if unknown), encoded'
+    data = bytearray()
+    pos, motion, animation, won = state
+    fields = 0
+    if known is None or pos != known[0]:
+        fields |= POSITION
+    if known is None or motion != known[1]:
+        fields |= MOTION
+    if known is None or animation != known[2]:
+        fields |= ANIMATION
+    if won and (known is None or not known[3]):
+        fields |= WON
+    replay.putvarint(data, id)
+    data.append(fields)
+    if fields & POSITION:
+        for coord in pos:
+            replay.putvarint(data, coord)
+    if fields & MOTION:
+        replay.putvarint(data, motion)
+    if fields & ANIMATION:
+        if animation is None:
+            replay.putvarint(data, 0)
+        else:
+            code, start = animation
+            replay.putvarint(data, code)
+            for coord in start:
+                replay.putvarint(data, coord)
+            replay.putvarint(data, frame)
+    return data
+
+def parseaddress(text):
+    'returns the address (host, port) given as host:port (or host, for the default PORT)'
+    host, _, port = text.rpartition(':')
+    if not host:
+        return (port, PORT)
+    return (host, int(port))
+
+
+class Session:
+    "A client connected to the server, and the game of its player"
+    def __init__(self, connection, id):
+        self.connection = connection
+        self.id = id
+        self.game = None # headless Game, once the client said HELLO
+        self.events = [] # events received since the last tick
+        self.known = {}  # id -> state of the players, as last sent to this client (see snapshot)
+
+
+class Server:
+    """Authoritative server: hosts the labyrinth lab (which must be in its original orientation) and the players of
+    the clients connected on the given address, and runs their games, tickrate times per second (see serve)"""
+    def __init__(self, lab, address=('', PORT), tickrate=TICKRATE):
+        self.lab = lab
+        self.labhash = replay.labhash(lab)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen(socket.SOMAXCONN)
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()
+        self.period = 1.0/tickrate
+        self.sessions = {} # socket -> Session
+        self.nextid = 1
+        self.tick = 0
+        self.busy = self.worst = 0.0 # total and longest time spent computing the ticks (see stats)
+
+    def serve(self, ticks=None):
+        'run the server (for the given number of ticks, default: forever)'
+        deadline = now()
+        while ticks is None or self.tick < ticks:
+            deadline += self.period
+            timeout = deadline - now()
+            while timeout > 0:
+                writing = [sock for sock, session in self.sessions.items() if session.connection.outbuf]
+                readable, writable, _ = select.select([self.listener] + self.sessions.keys(), writing, [], timeout)
+                for sock in readable:
+                    if sock is self.listener:
+                        self.accept()
+                    elif sock in self.sessions:
+                        self.receive(self.sessions[sock])
+                for sock in writable:
+                    if sock in self.sessions:
+                        self.sessions[sock].connection.flush()
+                timeout = deadline - now()
+            self.step()
+            if now() - deadline > self.period:
+                deadline = now() # (too late: do not try to catch up)
+
+    def accept(self):
+        'accept a new client'
+        try:
+            sock, address = self.listener.accept()
+        except socket.error:
+            return
+        self.sessions[sock] = Session(Connection(sock), self.nextid)
+        self.nextid += 1
+
+    def receive(self, session):
+        'handle the messages received from the client of session (a malformed message disconnects it)'
+        connection = session.connection
+        for type, content in connection.receive():
+            try:
+                self.handle(session, type, content)
+            except (IndexError, ValueError):
+                connection.closed = True # (only this client is dropped: the others play on)
+                break
+        if connection.closed:
+            self.drop(session)
+
+    def handle(self, session, type, content):
+        'handle one message received from the client of session (raises IndexError or ValueError if malformed)'
+        if type == HELLO:
+            if session.game is None:
+                self.hello(session, content)
+        elif session.game is None:
+            return # (nothing is accepted before HELLO)
+        elif type == INPUT:
+            count, offset = replay.getvarint(content, 0)
+            if 2*count > len(content) - offset:
+                raise ValueError('Truncated INPUT message!')
+            events = []
+            for i in range(count):
+                code, offset = replay.getvarint(content, offset)
+                key, offset = replay.getvarint(content, offset)
+                if code < len(replay.EVENTS):
+                    events.append(replay.Event(replay.EVENTS[code], key))
+            session.events += events
+        elif type == PING:
+            session.connection.send(PONG, content)
+            session.connection.flush()
+
+    def hello(self, session, content):
+        'a client said HELLO: create the game of its player, or refuse it'
+        version, offset = replay.getvarint(content, 0)
+        flags, offset = replay.getvarint(content, offset)
+        if len(content) < offset + 20:
+            raise ValueError('Truncated HELLO message!')
+        reason = None
+        if version != VERSION:
+            reason = 'Unsupported protocol version: '+str(version)
+        elif bytes(content[offset:offset+20]) != self.labhash:
+            reason = 'Not the labyrinth of the server!'
+        if reason:
+            session.connection.send(REFUSED, reason)
+            session.connection.flush()
+            self.drop(session)
+            return
+        session.game = Game.Game(self.lab, {"UseAzerty": True} if flags & AZERTY else {}, display=False)
+        session.game.motman.rotatebutton = None # (no rotation in networked games)
+        session.game.running = True
+        data = bytearray()
+        replay.putvarint(data, session.id)
+        session.connection.send(WELCOME, data)
+
+    def drop(self, session):
+        'disconnect the client of session (the other clients are told at the next tick)'
+        if self.sessions.pop(session.connection.sock, None):
+            session.connection.close()
+
+    def step(self):
+        'play one tick: run the games with the events received, and send the changes of the players to the clients'
+        began = now()
+        self.tick += 1
+        states = {}
+        for session in self.sessions.values():
+            game = session.game
+            if game is None:
+                continue
+            game.step(session.events)
+            session.events = []
+            if not game.running: # (the player left, or finished the labyrinth)
+                self.drop(session)
+                continue
+            states[session.id] = snapshot(game)
+        # (the clients mostly know the same states of a player: every change is only encoded once)
+        encoded = {}
+        for session in self.sessions.values():
+            if session.game is None:
+                continue
+            data = bytearray()
+            count = 0
+            known = session.known
+            for id, (state, frame) in states.iteritems():
+                old = known.get(id)
+                if old != state:
+                    fields = encoded.get((id, old))
+                    if fields is None:
+                        fields = encoded[(id, old)] = encodeplayer(id, state, frame, old)
+                    data += fields
+                    known[id] = state
+                    count += 1
+            for id in [id for id in known if id not in states]:
+                replay.putvarint(data, id)
+                data.append(LEFT)
+                del known[id]
+                count += 1
+            if count:
+                header = bytearray()
+                replay.putvarint(header, self.tick)
+                replay.putvarint(header, count)
+                session.connection.send(STATE, header + data)
+            session.connection.flush()
+            if session.connection.closed:
+                self.drop(session)
+        elapsed = now() - began
+        self.busy += elapsed
+        self.worst = max(self.worst, elapsed)
+
+    def stats(self):
+        'returns the statistics of the server: ticks played, clients connected, mean and longest tick (in seconds)'
+        return {'ticks': self.tick, 'clients': len(self.sessions),
+                'mean': self.busy/self.tick if self.tick else 0.0, 'worst': self.worst}
+
+    def close(self):
+        'disconnect all the clients, and stop listening'
+        for session in self.sessions.values():
+            self.drop(session)
+        self.listener.close()
+
+
+class Client:
+    """Client of a server, at address, hosting the labyrinth lab: sends the inputs of the local player, and follows
+    the players as the server sees them, in players (id -> Game.Player). The local player (player, if given) is
+    players[id]. The players that finished the labyrinth are in won."""
+    def __init__(self, lab, address, player=None, azerty=False, timeout=5.0):
+        self.ndim = lab.ndim
+        self.player = player or Game.Player([1] * lab.ndim)
+        self.players = {}
+        self.won = set()
+        self.id = None
+        self.tick = 0       # tick of the last state received
+        self.latency = None # last round trip time measured, in seconds (see ping)
+        self.refused = None # reason given by the server, if it refused the connection
+        self.connection = Connection(socket.create_connection(address, timeout))
+        data = bytearray()
+        replay.putvarint(data, VERSION)
+        replay.putvarint(data, AZERTY if azerty else 0)
+        data += replay.labhash(lab)
+        self.connection.send(HELLO, data)
+        # wait for the answer of the server
+        deadline = now() + timeout
+        while self.id is None:
+            self.poll()
+            if self.refused:
+                raise Exception('The server refused the connection: '+self.refused)
+            if self.connection.closed or now() > deadline:
+                raise Exception('No answer from the server!')
+            select.select([self.connection.sock], [], [], max(0, deadline - now()))
+
+    def send(self, events):
+        'send the events (of a frame) of the local player'
+        events = [event for event in events if event.type in replay.EVENTS]
+        if not events:
+            return
+        data = bytearray()
+        replay.putvarint(data, len(events))
+        for event in events:
+            replay.putvarint(data, replay.EVENTS.index(event.type))
+            replay.putvarint(data, getattr(event, 'key', 0))
+        self.connection.send(INPUT, data)
+        self.connection.flush()
+
+    def ping(self):
+        'measure the round trip time to the server (see latency)'
+        self.connection.send(PING, struct.pack('<d', now()))
+        self.connection.flush()
+
+    def poll(self):
+        'apply the messages received from the server (without waiting)'
+        self.connection.flush()
+        for type, content in self.connection.receive():
+            if type == STATE:
+                self.apply(content)
+            elif type == WELCOME:
+                self.id = replay.getvarint(content, 0)[0]
+                self.players[self.id] = self.player
+            elif type == REFUSED:
+                self.refused = str(content)
+            elif type == PONG:
+                self.latency = now() - struct.unpack('<d', bytes(content))[0]
+
+    def apply(self, content):
+        'apply a STATE message'
+        self.tick, offset = replay.getvarint(content, 0)
+        count, offset = replay.getvarint(content, offset)
+        for i in range(count):
+            id, offset = replay.getvarint(content, offset)
+            fields = content[offset]
+            offset += 1
+            if fields & LEFT:
+                self.players.pop(id, None)
+                self.won.discard(id)
+                continue
+            player = self.players.get(id)
+            if player is None:
+                player = self.players[id] = Game.Player([1] * self.ndim)
+            if fields & POSITION:
+                pos = []
+                for dim in range(self.ndim):
+                    coord, offset = replay.getvarint(content, offset)
+                    pos.append(coord)
+                player.pos = pos
+            if fields & MOTION:
+                code, offset = replay.getvarint(content, offset)
+                player.motion = decodemotion(code)
+            if fields & ANIMATION:
+                code, offset = replay.getvarint(content, offset)
+                player.animation = None
+                if code:
+                    start = []
+                    for dim in range(self.ndim):
+                        coord, offset = replay.getvarint(content, offset)
+                        start.append(coord)
+                    player.animation = Game.Animation(start, decodemotion(code))
+                    player.animation.i, offset = replay.getvarint(content, offset)
+            if fields & WON:
+                self.won.add(id)
+
+    def animate(self):
+        'play one frame of the animations of the players (until the server sends their next state)'
+        for player in self.players.values():
+            if player.animation:
+                player.animation = player.animation.iterate()
+
+    def step(self, events):
+        'play one frame: send the events of the local player, apply the states received and animate the players'
+        self.send(events)
+        self.poll()
+        self.animate()
+
+    def others(self):
+        'returns the players other than the local one'
+        return [player for id, player in self.players.items() if id != self.id]
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import Labyrinth
+    parser = argparse.ArgumentParser(description='Host a networked game in a labyrinth, or join one.')
+    parser.add_argument('labfile', help='labyrinth file played')
+    parser.add_argument('-p', '--port', type=int, default=PORT, help='port to listen on (0: any free port)')
+    parser.add_argument('-t', '--ticks', type=int, help='number of ticks to play (default: forever)')
+    parser.add_argument('-j', '--join', help='address (host:port) of the server to join, instead of hosting')
+    parser.add_argument('-k', '--azerty', action='store_true', help='use the AZERTY keyset (to join)')
+    args = parser.parse_args()
+    lab = Labyrinth.Labyrinth.fromfile(args.labfile)
+    if args.join:
+        settings = {"Server": args.join}
+        if args.azerty:
+            settings["UseAzerty"] = True
+        Game.show(lab, settings)
+        sys.exit(0)
+    server = Server(lab, ('', args.port))
+    sys.stdout.write('listening on port %d\n' % server.address[1])
+    sys.stdout.flush()
+    try:
+        server.serve(args.ticks)
+    except KeyboardInterrupt:
+        pass
+    server.close()
+    stats = server.stats()
+    sys.stdout.write('%d ticks, mean %.3f ms, worst %.3f ms\n' % (stats['ticks'], 1e3*stats['mean'],
+                                                                 1e3*stats['worst']))
@@ -0,0 +1,88 @@
+# Background loading of the upcoming steps of a sequence (such as the screens of a scenario, see DimLab).
+# While step i is being used, a worker thread loads the steps i+1 ... i+depth, as long as the data it holds stays
+# within a memory budget: when step i+1 is needed, it is usually ready. Steps that are not (not reached yet by
+# the worker, or skipped for the budget) are simply loaded when asked for.
+
+import threading
+
+
+class Prefetcher:
+    "Loads the steps of a sequence ahead of their use, in a background thread"
+    def __init__(self, steps, load, cost, depth=2, budget=None):
+        """prefetch the given steps (a list), with load(step) returning the data of a step and cost(data) its
+        memory footprint (in bytes). At most depth steps are loaded ahead, and the data held costs at most budget
+        (if given: at least the next step is always loaded)."""
+        self.steps = steps
+        self.load = load
+        self.cost = cost
+        self.depth = depth
+        self.budget = budget
+        self.current = 0  # index of the next step to be used
+        self.next = 0     # index of the next step to be loaded by the worker
+        self.ready = {}   # index -> (data, cost, exception), for the steps loaded and not used yet
+        self.held = 0     # total cost of the ready data
+        self.loading = None # index of the step being loaded by the worker
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.worker = None
+        if depth > 0:
+            self.worker = threading.Thread(target=self.run, name='prefetch')
+            self.worker.daemon = True # never keep the game from exiting
+            self.worker.start()
+
+    def run(self):
+        'worker thread: load the steps ahead, within the limits'
+        while True:
+            with self.condition:
+                while not self.stopped and not self.canload():
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                index = self.loading = self.next
+                self.next += 1
+            data, cost, exception = None, 0, None
+            try:
+                data = self.load(self.steps[index])
+                cost = self.cost(data)
+            except Exception as error:
+                exception = error # raised when the step is used (see get)
+            with self.condition:
+                self.loading = None
+                if index >= self.current: # (else, already loaded in the foreground)
+                    self.ready[index] = (data, cost, exception)
+                    self.held += cost
+                self.condition.notify_all()
+
+    def canload(self):
+        'determines if the worker can load the next step (must hold the condition)'
+        if self.next < self.current:
+            self.next = self.current
+        if self.next >= len(self.steps) or self.next >= self.current + self.depth:
+            return False
+        return self.budget is None or not self.ready or self.held < self.budget
+
+    def get(self, index):
+        """returns the data of step index (the steps must be asked for in order), loading it if not prefetched.
+        The data is then forgotten (to make room for the steps after it)."""
+        with self.condition:
+            while self.loading == index:
+                self.condition.wait()
+            self.current = index + 1
+            entry = self.ready.pop(index, None)
+            for old in [old for old in self.ready if old < index]: # (skipped steps)
+                self.held -= self.ready.pop(old)[1]
+            if entry is not None:
+                self.held -= entry[1]
+            self.condition.notify_all()
+        if entry is None:
+            return self.load(self.steps[index])
+        data, cost, exception = entry
+        if exception is not None:
+            raise exception
+        return data
+
+    def stop(self):
+        'stop the worker thread (it finishes the step it is loading, if any)'
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
@@ -0,0 +1,205 @@
+# Recording and replay of the inputs of a game (see Game.step): since the logic of the game only depends on the
+# events of every frame, replaying the events recorded during a live game plays it again, frame for frame, and
+# as fast as possible (the game runs headless: nothing is drawn, and nothing waits for the clock).
+# This is used to benchmark and check the logic of the game, without a display.
+#
+# FORMAT OF A TRACE FILE
+# header: the magic bytes "DTRC", the format version, the flags (1 if the AZERTY keyset was used), then the SHA-1
+#  hash of the labyrinth played (see labhash), and the SHA-1 hash of the state of the game at the end (see state).
+# body: one record per event, made of varints (unsigned integers, 7 bits per byte, lowest first): the number of
+#  frames since the previous event, the type of the event (see EVENTS) and its key (0 if none).
+#  The last record has type END, and gives the number of frames from the last event to the end of the game.
+# Games are recorded by setting "RecordTrace" in the settings of the Game: the trace of every labyrinth played is
+# then written in that directory, as <hash>-<date>-<time>.trace (the start of the hash of the labyrinth, see labhash,
+# and when the game ended), with a counter if the name is already taken: traces are never overwritten.
+#
+# Can also be used from the command line: python replay.py labfile tracefile [-n repeats]
+
+import labfile
+
+import binascii
+import hashlib
+import os
+import struct
+import time
+
+import pygame # (only for the event types: nothing is initialized)
+
+
+MAGIC = b'DTRC'
+VERSION = 1
+AZERTY = 1 # flag
+EVENTS = [pygame.KEYDOWN, pygame.KEYUP, pygame.QUIT] # event types, by code in the traces
+END = len(EVENTS)
+
+_HEADER = struct.Struct('<4sBB20s20s')
+
+
+class Event:
+    "Minimal event (the only attributes used by Game.step)"
+    __slots__ = ('type', 'key')
+    def __init__(self, type, key=0):
+        self.type = type
+        self.key = key
+
+
+class Trace:
+    "Events of a game, by frame"
+    def __init__(self, labhash, azerty=False):
+        self.labhash = labhash   # hash of the labyrinth played (see labhash)
+        self.azerty = azerty     # True if the AZERTY keyset was used
+        self.events = []         # list of (frame, type, key), in order
+        self.nframes = 0         # number of frames played
+        self.statehash = None    # hash of the state of the game at the end (see state)
+
+    def settings(self):
+        'returns the settings of the game recorded'
+        return {"UseAzerty": True} if self.azerty else {}
+
+    def frames(self):
+        'iterates over the events of every frame, as lists of Event'
+        events = self.events
+        i = 0
+        for frame in range(self.nframes):
+            current = []
+            while i < len(events) and events[i][0] == frame:
+                current.append(Event(events[i][1], events[i][2]))
+                i += 1
+            yield current
+
+    def save(self, filename):
+        'write this trace to file filename'
+        data = bytearray(_HEADER.pack(MAGIC, VERSION, AZERTY if self.azerty else 0, self.labhash, self.statehash))
+        last = 0
+        for frame, type, key in self.events:
+            putvarint(data, frame-last)
+            putvarint(data, EVENTS.index(type))
+            putvarint(data, key)
+            last = frame
+        putvarint(data, self.nframes-last)
+        putvarint(data, END)
+        putvarint(data, 0)
+        with open(filename, 'wb') as ff:
+            ff.write(data)
+
+    @staticmethod
+    def fromfile(filename):
+        with open(filename, 'rb') as ff:
+            data = bytearray(ff.read())
+        magic, version, flags, labhash, statehash = _HEADER.unpack(bytes(data[:_HEADER.size]))
+        if magic != MAGIC:
+            raise SyntaxError('Not a trace file!')
+        if version != VERSION:
+            raise Exception('Unsupported trace file version: '+str(version))
+        trace = Trace(labhash, bool(flags & AZERTY))
+        trace.statehash = statehash
+        offset, frame = _HEADER.size, 0
+        while True:
+            delta, offset = getvarint(data, offset)
+            code, offset = getvarint(data, offset)
+            key, offset = getvarint(data, offset)
+            frame += delta
+            if code == END:
+                break
+            trace.events.append((frame, EVENTS[code], key))
+        trace.nframes = frame
+        return trace
+
+
+class Recorder:
+    "Records the events of a live game (see Game.step), and writes them as a trace when the game ends"
+    def __init__(self, game, settings, directory):
+        self.game = game
+        self.trace = Trace(labhash(game.lab), bool(settings.get("UseAzerty")))
+        self.directory = directory
+        self.filename = None # file of the trace, once written (see save)
+
+    def record(self, events):
+        'record the events of the next frame (called by Game.step)'
+        frame = self.game.frame
+        for event in events:
+            if event.type in EVENTS:
+                self.trace.events.append((frame, event.type, getattr(event, 'key', 0)))
+
+    def save(self):
+        'write the trace (called at the end of the game)'
+        self.trace.nframes = self.game.frame
+        self.trace.statehash = statehash(self.game)
+        stem = os.path.join(self.directory, '%s-%s' % (binascii.hexlify(self.trace.labhash)[:12],
+                                                       time.strftime('%Y%m%d-%H%M%S')))
+        self.filename = stem + '.trace'
+        count = 1
+        while os.path.exists(self.filename):
+            count += 1
+            self.filename = '%s-%d.trace' % (stem, count)
+        self.trace.save(self.filename)
+
+
+def labhash(lab):
+    'returns the SHA-1 hash identifying the labyrinth lab (its blocks, size and goal, in its original orientation)'
+    return labfile.labhash(lab.grid, lab.grid.position(lab.index(lab.goalpos)))
+
+def state(game):
+    'returns the state of the game logic, as a tuple (see statehash)'
+    player, motman = game.player, game.motman
+    animation = player.animation
+    if animation:
+        animation = (animation.i, animation.dim, animation.mov, tuple(animation.pos))
+    return (game.frame, tuple(player.pos), player.motion, animation, tuple(game.lab.axes),
+            motman.cdim, motman.filtering, motman.torotate, game.toanimate, game.running, game.quit)
+
+def statehash(game):
+    'returns the SHA-1 hash of the state of the game logic: replaying a trace must give the recorded hash'
+    return hashlib.sha1(repr(state(game))).digest()
+
+def replay(lab, trace, check=True):
+    """Replay the trace in lab (which must be in its original orientation), headless, as fast as possible.
+    If check, make sure that it is the labyrinth recorded, and that the replay ends in the recorded state.
+    Returns the game at the end of the replay."""
+    import Game
+    if check and labhash(lab) != trace.labhash:
+        raise Exception('The trace was not recorded on this labyrinth!')
+    game = Game.Game(lab, trace.settings(), display=False)
+    game.running = True
+    for events in trace.frames():
+        game.step(events)
+    if check and statehash(game) != trace.statehash:
+        raise Exception('The replay diverged from the recorded game! (final state: '+repr(state(game))+')')
+    return game
+
+def putvarint(data, value):
+    'append the unsigned integer value to data (a bytearray), as a varint'
+    while value >= 0x80:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+
+def getvarint(data, offset):
+    'returns the varint read in data (a bytearray) at offset, and the offset after it'
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+if __name__ == '__main__':
+    import argparse
+    import Labyrinth
+    parser = argparse.ArgumentParser(description='Replay (and check) a recorded game, headless.')
+    parser.add_argument('labfile', help='labyrinth file played')
+    parser.add_argument('tracefile', help='trace recorded (see the "RecordTrace" setting)')
+    parser.add_argument('-n', '--repeats', type=int, default=1, help='number of replays (for benchmarking)')
+    args = parser.parse_args()
+    trace = Trace.fromfile(args.tracefile)
+    elapsed = 0.0
+    for i in range(args.repeats):
+        lab = Labyrinth.Labyrinth.fromfile(args.labfile)
+        began = time.time()
+        game = replay(lab, trace)
+        elapsed += time.time() - began
+    print('%d frames, %d events replayed %d times: %.0f frames/s (final position %s)' % (
+        trace.nframes, len(trace.events), args.repeats, trace.nframes*args.repeats/elapsed, game.player.pos))
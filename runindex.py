@@ -0,0 +1,61 @@
+# Small module indexing the blocks of a bitgrid.BitGrid along one axis.
+# For every line of the grid parallel to that axis, we keep the sorted runs of consecutive blocked cells
+# (their first and last coordinates), so that the uppermost block of a pile is found with a bisection
+# instead of walking the pile cell by cell.
+
+from bisect import bisect_right
+
+
+class RunIndex:
+    "Runs of blocked cells along every line of one axis of a grid"
+    def __init__(self, grid, axis):
+        """index the given axis of the grid (lines are identified by the linear index of their first cell).
+        Lines are only scanned the first time they are needed, so that creating the index costs nothing."""
+        self.grid = grid
+        self.axis = axis
+        self.stride = grid.strides[axis]
+        self.length = grid.size[axis]
+        self.lines = {} # line -> (run starts, run ends), both sorted
+
+    def line(self, idx):
+        'returns the line containing the cell at linear index idx'
+        return idx - ((idx // self.stride) % self.length)*self.stride
+
+    def runs(self, line):
+        'returns the runs of blocks of the given line, as two sorted lists (first and last coordinates)'
+        runs = self.lines.get(line)
+        if runs is None:
+            runs = self.lines[line] = self.scan(line)
+        return runs
+
+    def forget(self, idx):
+        'the cell at linear index idx changed: its line will be scanned again when needed'
+        self.lines.pop(self.line(idx), None)
+
+    def scan(self, line):
+        'compute the runs of blocks of the given line (see runs)'
+        starts, ends = [], []
+        bits, stride = self.grid.bits, self.stride
+        idx = line
+        inrun = False
+        for coord in range(1, self.length+1):
+            if (bits[idx >> 3] >> (idx & 7)) & 1:
+                if inrun:
+                    ends[-1] = coord # extend the current run
+                else:
+                    starts.append(coord)
+                    ends.append(coord)
+                inrun = True
+            else:
+                inrun = False
+            idx += stride
+        return starts, ends
+
+    def uppermost(self, line, coord):
+        """returns the coordinate of the uppermost block to display for a pile seen from coord:
+        the top of the run containing coord if it is blocked, else the highest block below coord (0 if none)."""
+        starts, ends = self.runs(line)
+        i = bisect_right(starts, coord) - 1
+        if i < 0:
+            return 0
+        return ends[i]
@@ -0,0 +1,315 @@
+# Solver for n-D labyrinths: finds the shortest way from the start (1,1,...,1) to the goal, moving one step
+# along one dimension at a time (as the player does in the game).
+# The search is a breadth-first search, one level at a time. While the frontier is wide, it is a bitset stored
+# as one long integer (bit i is the cell of linear index i in the grid of the labyrinth), and so are the visited
+# cells: expanding the frontier is then a handful of shifts and masks per dimension, whatever its size.
+# These operations take a time proportional to the whole grid, though, which is wasted on the narrow frontiers
+# of corridors: below some width, the frontier becomes a plain list of cells, and the sets packed bytes where
+# cells are checked one by one.
+# To find the path back without storing every level, we only keep the level of each visited cell modulo 3:
+# since a step changes the level by exactly one, the previous cell on a shortest path is the neighbor whose
+# level is one less (modulo 3).
+#
+# Can also be used from the command line: python solver.py [-b] labfile [labfile ...]
+
+import bitgrid
+import geometry as geo
+
+import re
+import sys
+import time
+
+
+class Solution:
+    "Result of a search: shortest path (if any) and some statistics on the search"
+    def __init__(self, length, path, expanded, levels, elapsed):
+        self.length = length     # number of moves from start to goal (None if the goal cannot be reached)
+        self.path = path         # list of positions from start to goal (in the current orientation of the lab)
+        self.expanded = expanded # number of cells reached by the search
+        self.levels = levels     # number of frontier expansions
+        self.elapsed = elapsed   # time spent, in seconds
+
+    def solvable(self):
+        return self.length is not None
+
+    def __repr__(self):
+        return 'Solution(length=%s, expanded=%d, levels=%d, elapsed=%.3fs)' % (
+            self.length, self.expanded, self.levels, self.elapsed)
+
+
+class Search:
+    "Breadth-first search from one cell, one level at a time (see the module description)"
+    def __init__(self, engine, source):
+        self.engine = engine
+        self.level = 0
+        self.width = 1 # number of cells in the frontier
+        self.count = 1 # number of visited cells
+        # narrow frontier to begin with: sparse sets (see todense and tosparse)
+        nbytes = engine.grid.nbytes
+        self.dense = False
+        self.frontier = [source]
+        self.visited = _packed([source], nbytes)
+        self.mods = [_packed([source], nbytes), bytearray(nbytes), bytearray(nbytes)] # by level modulo 3
+        self.converted = None # visited cells in the other representation (see visitedas)
+
+    def expand(self):
+        """compute the next frontier, and return it (as a list of indices if sparse, an integer if dense).
+        The frontier is empty when the search is over."""
+        threshold = self.engine.threshold
+        if self.dense and self.width < threshold // 4:
+            self.tosparse()
+        elif not self.dense and self.width > threshold:
+            self.todense()
+        self.level += 1
+        self.converted = None
+        if self.dense:
+            frontier = self.engine.neighbors(self.frontier) & self.engine.free
+            frontier ^= frontier & self.visited
+            self.visited |= frontier
+            self.mods[self.level % 3] |= frontier
+            self.width = _popcount(frontier)
+        else:
+            blocked, steps = self.engine.grid.bits, self.engine.steps
+            visited, mod = self.visited, self.mods[self.level % 3]
+            frontier = []
+            for idx in self.frontier:
+                for nidx in steps(idx):
+                    byte, bit = nidx >> 3, 1 << (nidx & 7)
+                    if not (visited[byte] | blocked[byte]) & bit:
+                        visited[byte] |= bit
+                        mod[byte] |= bit
+                        frontier.append(nidx)
+            self.width = len(frontier)
+        self.count += self.width
+        self.frontier = frontier
+        return frontier
+
+    def indices(self, frontier):
+        'returns the indices of the cells of frontier (as returned by expand), as a list'
+        if isinstance(frontier, list):
+            return frontier
+        return _indices(frontier, self.engine.grid.nbytes)
+
+    def todense(self):
+        'switch to long integers for the frontier and the sets of cells'
+        self.frontier = bitgrid.frombytes(_packed(self.frontier, self.engine.grid.nbytes))
+        self.visited = bitgrid.frombytes(self.visited)
+        self.mods = [bitgrid.frombytes(mod) for mod in self.mods]
+        self.dense = True
+
+    def tosparse(self):
+        'switch to a list of cells for the frontier, and packed bytes for the sets of cells'
+        nbytes = self.engine.grid.nbytes
+        self.frontier = _indices(self.frontier, nbytes)
+        self.visited = bitgrid.tobytes(self.visited, nbytes)
+        self.mods = [bitgrid.tobytes(mod, nbytes) for mod in self.mods]
+        self.dense = False
+
+    def visitedas(self, dense):
+        'returns the visited cells, as an integer if dense or else as packed bytes (converted once per level)'
+        if dense == self.dense:
+            return self.visited
+        if self.converted is None:
+            if self.dense:
+                self.converted = bitgrid.tobytes(self.visited, self.engine.grid.nbytes)
+            else:
+                self.converted = bitgrid.frombytes(self.visited)
+        return self.converted
+
+    def reached(self, idx):
+        'determines if the cell idx was visited'
+        if self.dense:
+            return (self.visited >> idx) & 1
+        return (self.visited[idx >> 3] >> (idx & 7)) & 1
+
+    def meet(self, frontier):
+        'returns the indices of the cells of frontier (of another search) visited by this search'
+        if isinstance(frontier, list):
+            visited = self.visitedas(False)
+            return [idx for idx in frontier if (visited[idx >> 3] >> (idx & 7)) & 1]
+        return _indices(frontier & self.visitedas(True), self.engine.grid.nbytes)
+
+    def modbytes(self):
+        'returns the visited cells by level modulo 3, as packed bytes'
+        if self.dense:
+            return [bitgrid.tobytes(mod, self.engine.grid.nbytes) for mod in self.mods]
+        return self.mods
+
+    def walkback(self, idx, level, mods=None):
+        'returns the indices of a shortest path from idx (reached at given level) back to the source'
+        if mods is None:
+            mods = self.modbytes()
+        path = [idx]
+        while level > 0:
+            level -= 1
+            bits = mods[level % 3]
+            for nidx in self.engine.steps(idx):
+                if (bits[nidx >> 3] >> (nidx & 7)) & 1:
+                    idx = nidx
+                    break
+            else:
+                raise Exception('Broken search: no way back from index '+str(idx))
+            path.append(idx)
+        return path
+
+
+class Engine:
+    "Bitset representation of a grid: free cells, and masks to move along every dimension"
+    def __init__(self, grid):
+        self.grid = grid
+        ncells = grid.ncells
+        self.free = ((1 << ncells) - 1) ^ grid.tointeger()
+        # frontier width above which bitsets are worth it (their operations take a time proportional to
+        # the whole grid, while each cell of a sparse frontier costs about as much as a couple thousand bits)
+        self.threshold = max(256, ncells >> 11)
+        # for each axis, the stride and the cells that can move forward (not last) or backward (not first)
+        self.moves = []
+        for axis in range(grid.ndim):
+            stride, length = grid.strides[axis], grid.size[axis]
+            if length < 2:
+                continue # no possible motion
+            period = stride*length
+            notlast = _repeat((1 << (stride*(length-1))) - 1, period, ncells // period)
+            self.moves.append((stride, notlast, notlast << stride))
+
+    def neighbors(self, cells):
+        'returns all the neighbors of the given set of cells (not masked with the free cells)'
+        result = 0
+        for stride, notlast, notfirst in self.moves:
+            result |= (cells & notlast) << stride
+            result |= (cells & notfirst) >> stride
+        return result
+
+    def steps(self, idx):
+        'returns the indices of the neighbors of the cell of index idx'
+        result = []
+        grid = self.grid
+        for axis in range(grid.ndim):
+            stride, length = grid.strides[axis], grid.size[axis]
+            coord = (idx // stride) % length
+            if coord > 0:
+                result.append(idx - stride)
+            if coord < length-1:
+                result.append(idx + stride)
+        return result
+
+
+def _repeat(pattern, period, count):
+    'returns pattern repeated count times, every period bits'
+    result, offset = 0, 0
+    block, blockcount = pattern, 1
+    while count:
+        if count & 1:
+            result |= block << (offset*period)
+            offset += blockcount
+        block |= block << (blockcount*period)
+        blockcount *= 2
+        count >>= 1
+    return result
+
+def _packed(indices, nbytes):
+    'returns the set of the given cells as packed bytes'
+    data = bytearray(nbytes)
+    for idx in indices:
+        data[idx >> 3] |= 1 << (idx & 7)
+    return data
+
+_NONZERO = re.compile(b'[^\x00]')
+
+def _indices(cells, nbytes):
+    'returns the (sorted) indices of the set of cells given as an integer'
+    data = bitgrid.tobytes(cells, nbytes)
+    indices = []
+    for match in _NONZERO.finditer(data):
+        byte = match.start()
+        value = data[byte]
+        for bit in range(8):
+            if value >> bit & 1:
+                indices.append(8*byte + bit)
+    return indices
+
+def _popcount(cells):
+    return bin(cells).count('1')
+
+
+def supports(lab):
+    'determines if lab can be solved (all its blocks must be in memory)'
+    return isinstance(lab.grid, bitgrid.BitGrid)
+
+def solve(lab, start=None, goal=None, bidirectional=False):
+    """Find a shortest path in lab from start (default: (1,1,...,1), as in the game) to goal (default: the goal
+    of the lab). Positions are given, and returned, in the current orientation of the lab.
+    If bidirectional, the search runs from both ends at once, and stops where they meet.
+    Returns a Solution (see supports)."""
+    if not supports(lab):
+        raise Exception('The solver needs all the blocks in memory (not a chunked labyrinth)!')
+    began = time.time()
+    if start is None:
+        start = [1] * lab.ndim
+    if goal is None:
+        goal = lab.goalpos
+    if not lab.isfree(start) or not lab.isfree(goal):
+        raise Exception('Start and goal must be free positions within the labyrinth!')
+    engine = Engine(lab.grid)
+    source, target = lab.index(start), lab.index(goal)
+    forward = Search(engine, source)
+    if not bidirectional:
+        while not forward.reached(target):
+            if not forward.expand():
+                break
+        if forward.reached(target):
+            indices = forward.walkback(target, forward.level)[::-1]
+        else:
+            indices = None
+        return _solution(lab, indices, forward.count, forward.level, began)
+    backward = Search(engine, target)
+    this, other = forward, backward
+    meeting = [source] if source == target else []
+    while not meeting:
+        if not forward.width or not backward.width:
+            break # one of the searches is over: the goal cannot be reached
+        # expand the search with the narrowest frontier
+        if forward.width <= backward.width:
+            this, other = forward, backward
+        else:
+            this, other = backward, forward
+        meeting = other.meet(this.expand())
+    indices = None
+    if meeting:
+        # the meeting cells were reached last by this search, and at most two levels ago by the other one:
+        # use one that the other search reached first
+        mods = other.modbytes()
+        for level in range(max(0, other.level-2), other.level+1):
+            bits = mods[level % 3]
+            cells = [idx for idx in meeting if (bits[idx >> 3] >> (idx & 7)) & 1]
+            if cells:
+                idx = cells[0]
+                indices = this.walkback(idx, this.level)[::-1][:-1] + other.walkback(idx, level, mods)
+                if this is backward:
+                    indices.reverse()
+                break
+    return _solution(lab, indices, forward.count + backward.count, forward.level + backward.level, began)
+
+def _solution(lab, indices, expanded, levels, began):
+    'build the Solution for the path of given grid indices (or None if no path)'
+    if indices is None:
+        return Solution(None, None, expanded, levels, time.time()-began)
+    # back from grid (file) order to the current orientation of the lab
+    path = geo.permute_many([lab.grid.position(idx) for idx in indices], lab.axes)
+    return Solution(len(path)-1, path, expanded, levels, time.time()-began)
+
+
+if __name__ == '__main__':
+    import Labyrinth
+    args = sys.argv[1:]
+    bidirectional = '-b' in args
+    for filename in args:
+        if filename == '-b':
+            continue
+        solution = solve(Labyrinth.Labyrinth.fromfile(filename), bidirectional=bidirectional)
+        if solution.solvable():
+            sys.stdout.write('%s: %d moves (%d cells expanded, %.3fs)\n' % (
+                filename, solution.length, solution.expanded, solution.elapsed))
+        else:
+            sys.stdout.write('%s: UNSOLVABLE (%d cells expanded, %.3fs)\n' % (
+                filename, solution.expanded, solution.elapsed))
@@ -0,0 +1,40 @@
+# Helpers shared by the tests: small generated labyrinths, and a plain breadth-first search to check against.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import Labyrinth
+import generator
+
+
+def generated(size, seed, density=1.0, algorithm='dfs'):
+    'returns the Labyrinth generated with the given parameters (see generator.generate)'
+    grid, goal = generator.generate(size, seed, density, algorithm)
+    return Labyrinth.Labyrinth(size, grid, goal)
+
+def neighbors(lab, pos):
+    'iterates over the free positions of lab next to pos (one move away)'
+    for dim in range(lab.ndim):
+        for mov in (-1, 1):
+            other = list(pos)
+            other[dim] += mov
+            if lab.iswithin(other) and lab.isfree(other):
+                yield tuple(other)
+
+def distances(lab, source):
+    'returns the number of moves from source to every position of lab reachable from it, as a dictionary'
+    source = tuple(source)
+    found = {source: 0}
+    frontier = [source]
+    while frontier:
+        following = []
+        for pos in frontier:
+            for other in neighbors(lab, pos):
+                if other not in found:
+                    found[other] = found[pos] + 1
+                    following.append(other)
+        frontier = following
+    return found
@@ -0,0 +1,62 @@
+# Chunked labyrinths (see chunkstore) in a scenario: read ahead by the prefetcher (see DimLab.start), and refused
+# with a clear error by the tools that need all the blocks in memory (and not counted as valid by the validator).
+#
+# Usage: python -m unittest discover tests
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import DimLab
+import Labyrinth
+import chunkstore
+import distfield
+import prefetch
+import solver
+import validator
+
+
+class ChunkedScenarioTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.textfile = os.path.join(ROOT, 'labs', '3D.txt')
+        lab = Labyrinth.Labyrinth.fromfile(self.textfile)
+        self.chunkedfile = os.path.join(self.directory, '3D.dlch')
+        chunkstore.create(self.chunkedfile, lab.grid, lab.grid.position(lab.index(lab.goalpos)))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_prefetch(self):
+        steps = [(DimLab.L, self.textfile), (DimLab.L, self.chunkedfile)]
+        prefetcher = prefetch.Prefetcher(steps, DimLab.prefetchstep, DimLab.footprint, 2)
+        try:
+            self.assertIsInstance(prefetcher.get(0)[1], Labyrinth.Labyrinth)
+            etype, lab = prefetcher.get(1)
+        finally:
+            prefetcher.stop()
+        self.assertIsInstance(lab, Labyrinth.ChunkedLabyrinth)
+        self.assertEqual(DimLab.footprint((etype, lab)), chunkstore.BUDGET)
+
+    def test_solver(self):
+        lab = Labyrinth.Labyrinth.fromfile(self.chunkedfile)
+        self.assertFalse(solver.supports(lab))
+        self.assertRaisesRegexp(Exception, 'in memory', solver.solve, lab)
+        self.assertRaisesRegexp(Exception, 'in memory', distfield.compute, lab)
+        self.assertTrue(solver.supports(Labyrinth.Labyrinth.fromfile(self.textfile)))
+
+    def test_validator(self):
+        records = validator.validate([], [self.textfile, self.chunkedfile], jobs=1)
+        self.assertEqual([record['ok'] for record in records], [True, True])
+        self.assertFalse('unchecked' in records[0])
+        self.assertTrue('unchecked' in records[1]) # (not solved)
+        self.assertFalse('moves' in records[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
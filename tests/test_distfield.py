@@ -0,0 +1,64 @@
+# Distance fields (see distfield): the distances to the goal (and the stats) are those of a plain breadth-first
+# search, and a field cached on disk is only used for the labyrinth it was computed for.
+#
+# Usage: python -m unittest discover tests
+
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+from common import generated, neighbors, distances
+import distfield
+
+
+class DistanceFieldTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp() # (never ~/.dimlab)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache)
+
+    def check(self, lab, field):
+        'compare field with a breadth-first search from the goal of lab'
+        expected = distances(lab, lab.goalpos)
+        positions = list(itertools.product(*[range(1, dimsize+1) for dimsize in lab.size]))
+        for pos in positions:
+            self.assertEqual(field.distance(lab, pos), expected.get(pos), pos)
+        self.assertEqual(field.length, expected.get((1,) * lab.ndim))
+        self.assertEqual(field.reachable, len(expected))
+        self.assertEqual(field.farthest, max(expected.values()))
+        free = [pos for pos in positions if lab.isfree(pos)]
+        self.assertEqual(field.deadends, sum(1 for pos in free if len(list(neighbors(lab, pos))) == 1))
+
+    def test_compute(self):
+        for size, seed, density, algorithm in (([9, 9, 3], 1, 1.0, 'dfs'), ([7, 7, 5], 2, 0.7, 'kruskal'),
+                                               ([5, 5, 3, 3], 3, 0.8, 'dfs')):
+            lab = generated(size, seed, density, algorithm)
+            self.check(lab, distfield.compute(lab))
+            lab.rotate() # (the distances are in the order of the grid: valid in any orientation)
+            self.check(lab, distfield.compute(lab))
+
+    def test_cache(self):
+        lab = generated([7, 7, 5], 4, 0.8)
+        field = distfield.load(lab, self.cache)
+        self.check(lab, field)
+        self.assertEqual(len(os.listdir(self.cache)), 1)
+        self.assertEqual(list(distfield.load(lab, self.cache).distances), list(field.distances))
+        # the labyrinth changes (a passage next to the goal is blocked): its field is computed again
+        passage = list(neighbors(lab, lab.goalpos))[0]
+        lab.update([(lab.index(passage), True)])
+        changed = distfield.load(lab, self.cache)
+        self.assertNotEqual(list(changed.distances), list(field.distances))
+        self.check(lab, changed)
+        self.assertEqual(len(os.listdir(self.cache)), 2)
+        # a damaged cache file is computed again too
+        for filename in os.listdir(self.cache):
+            with open(os.path.join(self.cache, filename), 'r+b') as ff:
+                ff.truncate(10)
+        self.check(lab, distfield.load(lab, self.cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
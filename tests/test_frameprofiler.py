@@ -0,0 +1,58 @@
+# Frame statistics (see frameprofiler): the frames that waited for events are left out of the frame rate and the
+# percentiles, and only counted in the share of the time spent idle.
+#
+# Usage: python -m unittest discover tests
+
+import unittest
+
+import common
+import frameprofiler
+
+
+class FakeClock:
+    'a clock moved by hand (see frameprofiler.clock)'
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FrameProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = frameprofiler.clock = FakeClock()
+
+    def tearDown(self):
+        from timeit import default_timer
+        frameprofiler.clock = default_timer
+
+    def frame(self, profiler, idle, draw):
+        'measure a frame waiting idle seconds for events, then drawing for draw seconds'
+        profiler.begin()
+        self.clock.now += idle
+        profiler.mark('idle')
+        self.clock.now += draw
+        profiler.mark('draw')
+        profiler.end()
+
+    def test_idle(self):
+        profiler = frameprofiler.FrameProfiler({"FrameTimes": 100})
+        for frame in range(90):
+            self.frame(profiler, 0.5 if frame % 10 == 0 else 0.0, 0.02 if frame % 10 == 9 else 0.01)
+        stats = profiler.stats()
+        self.assertEqual((stats['frames'], stats['active']), (90, 81))
+        self.assertAlmostEqual(stats['fps'], 81/(72*0.01 + 9*0.02))
+        self.assertAlmostEqual(stats['p50'], 0.01)
+        self.assertAlmostEqual(stats['p99'], 0.02)
+        self.assertAlmostEqual(stats['draw'], (72*0.01 + 9*0.02)/81)
+        self.assertAlmostEqual(stats['idleshare'], 9*0.5/(9*0.5 + 72*0.01 + 9*0.02 + 9*0.01))
+        # only idle frames (in the ring buffer)
+        for frame in range(100):
+            self.frame(profiler, 0.5, 0.01)
+        stats = profiler.stats()
+        self.assertEqual((stats['frames'], stats['active'], stats['fps'], stats['p99']), (100, 0, 0.0, 0.0))
+        self.assertAlmostEqual(stats['idleshare'], 0.5/0.51)
+
+
+if __name__ == '__main__':
+    unittest.main()
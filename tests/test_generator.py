@@ -0,0 +1,69 @@
+# Generated labyrinths (see generator): perfect (every free cell reached by a single path) without loops, solvable
+# whatever the density, and the same for the same seed.
+#
+# Usage: python -m unittest discover tests
+
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from common import generated, neighbors, distances
+import Labyrinth
+import generator
+
+
+SIZES = ([9, 9, 1], [7, 5, 5], [5, 5, 3, 3], [7, 1, 5, 3, 3], [6, 4, 4])
+
+
+class GeneratorTest(unittest.TestCase):
+    def freecells(self, lab):
+        'returns the free positions of lab'
+        return [pos for pos in (lab.grid.position(idx) for idx in range(lab.grid.ncells)) if lab.isfree(pos)]
+
+    def test_perfect(self):
+        for algorithm in generator.ALGORITHMS:
+            for size in SIZES:
+                for seed in range(3):
+                    lab = generated(size, seed, algorithm=algorithm)
+                    start, goal = (1,) * lab.ndim, tuple(lab.goalpos)
+                    self.assertTrue(lab.isfree(start) and lab.isfree(goal))
+                    free = self.freecells(lab)
+                    reached = distances(lab, start)
+                    self.assertEqual(len(reached), len(free), (algorithm, size, seed)) # (connected)
+                    self.assertIn(goal, reached)
+                    # (a tree: one passage less than free cells)
+                    passages = sum(len(list(neighbors(lab, pos))) for pos in free) // 2
+                    self.assertEqual(passages, len(free) - 1, (algorithm, size, seed))
+
+    def test_density(self):
+        for algorithm in generator.ALGORITHMS:
+            for density in (0.0, 0.5, 0.9):
+                lab = generated([7, 7, 5], 4, density, algorithm)
+                self.assertIn(tuple(lab.goalpos), distances(lab, (1,) * lab.ndim))
+
+    def test_seed(self):
+        def text(seed, algorithm):
+            out = StringIO()
+            generator.write(out, *generator.generate([7, 5, 5, 3], seed, 0.8, algorithm))
+            return out.getvalue()
+        for algorithm in generator.ALGORITHMS:
+            self.assertEqual(text(5, algorithm), text(5, algorithm))
+            self.assertNotEqual(text(5, algorithm), text(6, algorithm))
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'generated.txt')
+            goal = generator.generatefile(filename, [5, 7, 3, 3], 7, 0.9, 'kruskal')
+            lab = Labyrinth.Labyrinth.fromfile(filename)
+            grid, goal2 = generator.generate([5, 7, 3, 3], 7, 0.9, 'kruskal')
+            self.assertEqual((tuple(lab.goalpos), tuple(goal)), (tuple(goal2), tuple(goal2)))
+            self.assertEqual(bytearray(lab.grid.bits), bytearray(grid.bits))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
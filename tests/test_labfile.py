@@ -0,0 +1,67 @@
+# Binary labyrinth files (see labfile): a labyrinth saved and read again is the one of its text file, and files
+# that are not binary labyrinths of this version are rejected.
+#
+# Usage: python -m unittest discover tests
+
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import common
+import Labyrinth
+import labfile
+
+
+class LabFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'lab' + labfile.EXTENSION)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        for textfile in sorted(glob.glob(os.path.join(common.ROOT, 'labs', '*.txt'))):
+            text = Labyrinth.Labyrinth.fromfile(textfile)
+            for compression in ('none', 'gzip'):
+                digest = labfile.savelab(self.filename, text, compression)
+                self.assertTrue(labfile.isbinary(self.filename))
+                binary = Labyrinth.Labyrinth.fromfile(self.filename)
+                self.assertEqual(binary.size, text.size, textfile)
+                self.assertEqual(tuple(binary.goalpos), tuple(text.goalpos), textfile)
+                nbytes = text.grid.nbytes
+                self.assertEqual(bytearray(binary.grid.bits[:nbytes]), bytearray(text.grid.bits[:nbytes]), textfile)
+                self.assertEqual(labfile.load(self.filename, verify=True)[2], digest)
+                del binary # (unmap the file before it is written again)
+
+    def corrupt(self, offset, data):
+        'save a labyrinth, then overwrite its file with data at offset'
+        labfile.savelab(self.filename, Labyrinth.Labyrinth.fromfile(os.path.join(common.ROOT, 'labs', '3D.txt')))
+        with open(self.filename, 'r+b') as ff:
+            ff.seek(offset)
+            ff.write(data)
+
+    def test_magic(self):
+        self.corrupt(0, b'DLAX')
+        self.assertFalse(labfile.isbinary(self.filename))
+        self.assertRaises(SyntaxError, labfile.load, self.filename)
+
+    def test_version(self):
+        self.corrupt(len(labfile.MAGIC), chr(labfile.VERSION + 1))
+        self.assertRaisesRegexp(Exception, 'version', labfile.load, self.filename)
+        self.assertRaisesRegexp(Exception, 'version', Labyrinth.Labyrinth.fromfile, self.filename)
+
+    def test_hash(self):
+        self.corrupt(0, labfile.MAGIC)
+        with open(self.filename, 'r+b') as ff: # (one bit of the payload flipped)
+            ff.seek(-1, 2)
+            byte = ff.read(1)
+            ff.seek(-1, 2)
+            ff.write(chr(ord(byte) ^ 1))
+        self.assertRaisesRegexp(Exception, 'Corrupted', labfile.load, self.filename, True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# Hot reload (see labwatch): the floors that changed in the file, applied to the labyrinth through
+# Labyrinth.update, give the labyrinth read again from the file (blocks, goal and runs), in any orientation; a
+# reload that would block the cell of the player is refused.
+#
+# Usage: python -m unittest discover tests
+
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import common
+import Game
+import Labyrinth
+import generator
+import labwatch
+
+
+class LabWatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'watched.txt')
+        self.mtime = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def edit(self, cells):
+        'write the cells (position in the order of the file -> character) in the file, and make it look newer'
+        with open(self.filename) as ff:
+            lines = ff.read().split('\n')
+        for pos, char in cells.items():
+            row = lines.index('floor ' + ' '.join(str(coord) for coord in pos[2:])) + pos[1]
+            lines[row] = lines[row][:pos[0]-1] + char + lines[row][pos[0]:]
+        with open(self.filename, 'w') as ff:
+            ff.write('\n'.join(lines))
+        self.mtime += 10 # (whatever the resolution of the times of the file system)
+        stat = os.stat(self.filename)
+        os.utime(self.filename, (stat.st_atime, stat.st_mtime + self.mtime))
+
+    def check(self, lab, rotations):
+        'compare lab with the labyrinth read again from its file (rotated as many times)'
+        fresh = Labyrinth.Labyrinth.fromfile(self.filename)
+        for rotation in range(rotations):
+            fresh.rotate()
+        self.assertEqual(tuple(lab.goalpos), tuple(fresh.goalpos))
+        for pos in itertools.product(*[range(1, dimsize+1) for dimsize in lab.size]):
+            self.assertEqual(lab.isfree(pos), fresh.isfree(pos), pos)
+            for dim in range(2, lab.ndim):
+                self.assertEqual(lab.uppermost1d(pos[0], pos[1], pos, dim), fresh.scanuppermost(list(pos), dim),
+                                 (pos, dim))
+
+    def test_reload(self):
+        rng = random.Random(1)
+        for size in ([7, 7, 3], [5, 5, 3, 3]):
+            generator.generatefile(self.filename, size, seed=2, density=0.8)
+            lab = Labyrinth.Labyrinth.fromfile(self.filename)
+            watcher = labwatch.Watcher(lab)
+            for rotations in range(lab.ndim):
+                self.check(lab, rotations) # (every line is indexed: the changed ones must be forgotten)
+                # flip cells of a floor (not the goal)
+                goal = lab.grid.position(lab.index(lab.goalpos))
+                floor = goal[2:] if rotations % 2 else tuple(1 for dimsize in size[2:])
+                cells = {}
+                for x, y in rng.sample(list(itertools.product(range(1, size[0]+1), range(1, size[1]+1))), 6):
+                    pos = (x, y) + floor
+                    if pos != goal:
+                        cells[pos] = 'o' if lab.grid.get(lab.grid.index(pos)) else 'x'
+                self.edit(cells)
+                self.assertTrue(watcher.poll(), watcher.error)
+                self.check(lab, rotations)
+                # move the goal to another floor
+                free = [pos for pos in itertools.product(*[range(1, dimsize+1) for dimsize in size])
+                        if pos[2:] != goal[2:] and not lab.grid.get(lab.grid.index(pos))]
+                self.edit({goal: 'o', rng.choice(free): '*'})
+                self.assertTrue(watcher.poll(), watcher.error)
+                self.check(lab, rotations)
+                lab.rotate()
+            self.assertEqual(watcher.reloads, 2*lab.ndim)
+
+    def test_player(self):
+        generator.generatefile(self.filename, [7, 7, 3], seed=3)
+        lab = Labyrinth.Labyrinth.fromfile(self.filename)
+        lab.rotate()
+        player = Game.Player([1] * lab.ndim)
+        watcher = labwatch.Watcher(lab, player=player)
+        # (the start is the first cell of the file, in any orientation)
+        self.edit({(1, 1, 1): 'x'})
+        self.assertFalse(watcher.poll())
+        self.assertTrue('player' in watcher.error, watcher.error)
+        self.assertTrue(lab.isfree(player.pos))
+        self.assertEqual(watcher.reloads, 0)
+        # once the player moved away, the same change is applied
+        player.pos = list(lab.goalpos)
+        self.edit({})
+        self.assertTrue(watcher.poll(), watcher.error)
+        self.assertFalse(lab.isfree([1] * lab.ndim))
+        self.check(lab, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
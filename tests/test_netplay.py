@@ -0,0 +1,110 @@
+# Networked games (see netplay): a client sending malformed messages is disconnected, without disturbing the
+# server or its other clients.
+#
+# Usage: python -m unittest discover tests
+
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import Labyrinth
+import netplay
+import replay
+
+
+def message(type, content):
+    'returns the bytes of a message (see netplay.Connection.send)'
+    data = bytearray()
+    replay.putvarint(data, len(content)+1)
+    data.append(type)
+    return bytes(data + content)
+
+def hello(lab):
+    'returns the content of a valid HELLO for lab'
+    content = bytearray()
+    replay.putvarint(content, netplay.VERSION)
+    replay.putvarint(content, 0)
+    return content + replay.labhash(lab)
+
+
+class MalformedTest(unittest.TestCase):
+    def setUp(self):
+        self.lab = Labyrinth.Labyrinth.fromfile(os.path.join(ROOT, 'labs', '3D.txt'))
+        self.server = netplay.Server(self.lab, ('localhost', 0))
+        self.failure = None
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+        self.client = netplay.Client(self.lab, ('localhost', self.server.address[1]))
+
+    def serve(self):
+        try:
+            self.server.serve(ticks=120)
+        except Exception as error:
+            self.failure = error
+
+    def tearDown(self):
+        self.thread.join()
+        self.client.close()
+        self.server.listener.close()
+
+    def check(self, *messages):
+        'send the given messages on a new connection: the server must close it, and go on serving the client'
+        sock = socket.create_connection(('localhost', self.server.address[1]))
+        sock.settimeout(2.0)
+        received = b''
+        try:
+            for data in messages:
+                sock.sendall(data)
+            while True:
+                data = sock.recv(netplay.RECVSIZE)
+                if not data:
+                    break # (closed by the server)
+                received += data
+        except socket.error as error:
+            self.assertNotIsInstance(error, socket.timeout) # (reset by the server: closed too)
+        sock.close()
+        self.client.ping()
+        time.sleep(0.1)
+        self.client.poll()
+        self.assertIsNone(self.failure)
+        self.assertTrue(self.thread.is_alive())
+        self.assertIsNotNone(self.client.latency)
+        return received
+
+    def test_hello(self):
+        content = bytearray()
+        replay.putvarint(content, netplay.VERSION) # (no flags, no hash)
+        self.check(message(netplay.HELLO, content))
+        self.check(message(netplay.HELLO, content + b'\x00' + replay.labhash(self.lab)[:5]))
+
+    def test_input(self):
+        content = bytearray()
+        replay.putvarint(content, 5) # (5 events, none given)
+        received = self.check(message(netplay.HELLO, hello(self.lab)), message(netplay.INPUT, content))
+        self.assertEqual(bytearray(received)[1], netplay.WELCOME)
+
+    def test_empty(self):
+        self.check(b'\x00')
+
+    def test_toolong(self):
+        length = bytearray()
+        replay.putvarint(length, netplay.MAXMESSAGE + 1)
+        self.check(bytes(length) + b'\x00' * 16)
+        self.check(b'\x80' * (netplay.MAXMESSAGE + 16)) # (a length that never ends)
+
+    def test_backlog(self):
+        # a client sending PINGs without ever reading the PONGs: its backlog grows until it is disconnected
+        ping = message(netplay.PING, b'\x00' * (netplay.MAXMESSAGE - 16))
+        self.check(message(netplay.HELLO, hello(self.lab)), *[ping] * (4 * netplay.MAXBACKLOG // len(ping) + 256))
+
+
+if __name__ == '__main__':
+    unittest.main()
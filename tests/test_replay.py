@@ -0,0 +1,70 @@
+# Traces (see replay): a recorded game saved and read again has the same events, and replaying them through
+# Game.step ends in the recorded state; traces of the same labyrinth do not overwrite each other.
+#
+# Usage: python -m unittest discover tests
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import common
+import Game
+import Labyrinth
+import replay
+
+import pygame
+
+
+KEYS = [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_TAB, pygame.K_BACKSPACE,
+        pygame.K_LCTRL, pygame.K_SPACE, pygame.K_LSHIFT, pygame.K_s, pygame.K_z, pygame.K_a, pygame.K_e]
+LABFILE = os.path.join(common.ROOT, 'labs', '4D-twoxy.txt')
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, seed, azerty=False, nframes=3000):
+        'play random events in a headless game recorded in the directory, and return the game'
+        rng = random.Random(seed)
+        settings = {"RecordTrace": self.directory, "UseAzerty": azerty}
+        game = Game.Game(Labyrinth.Labyrinth.fromfile(LABFILE), settings, display=False)
+        game.running = True
+        for frame in range(nframes):
+            events = []
+            if rng.random() < 0.1:
+                events.append(replay.Event(rng.choice([pygame.KEYDOWN, pygame.KEYUP]), rng.choice(KEYS)))
+            game.step(events)
+        game.recorder.save()
+        return game
+
+    def test_roundtrip(self):
+        for seed, azerty in ((1, False), (2, True)):
+            game = self.record(seed, azerty)
+            recorded = game.recorder.trace
+            trace = replay.Trace.fromfile(game.recorder.filename)
+            self.assertEqual(trace.events, recorded.events)
+            self.assertEqual((trace.nframes, trace.azerty), (game.frame, azerty))
+            self.assertEqual(trace.labhash, replay.labhash(Labyrinth.Labyrinth.fromfile(LABFILE)))
+            self.assertEqual(trace.statehash, replay.statehash(game))
+            replayed = replay.replay(Labyrinth.Labyrinth.fromfile(LABFILE), trace)
+            self.assertEqual(replay.state(replayed), replay.state(game))
+
+    def test_diverged(self):
+        trace = replay.Trace.fromfile(self.record(3).recorder.filename)
+        trace.events = trace.events[:len(trace.events)//2] # (the player stops halfway)
+        self.assertRaisesRegexp(Exception, 'diverged', replay.replay, Labyrinth.Labyrinth.fromfile(LABFILE), trace)
+
+    def test_filenames(self):
+        filenames = [self.record(seed, nframes=10).recorder.filename for seed in range(3)]
+        self.assertEqual(len(set(filenames)), 3)
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(os.path.basename(name) for name in filenames))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# Run indexes (see runindex): the uppermost tiles found with the runs of blocks are those found by walking the
+# piles (see Labyrinth.scanuppermost), in every orientation, and after blocks changed (see Labyrinth.update).
+#
+# Usage: python -m unittest discover tests
+
+import itertools
+import random
+import unittest
+
+import common # (for the path of the modules of the game)
+import Labyrinth
+import bitgrid
+
+
+def randomlab(size, rng, density=0.4):
+    'returns a Labyrinth of given size whose cells are blocked at random (but the goal)'
+    grid = bitgrid.BitGrid(size)
+    goal = tuple(size)
+    for idx in range(grid.ncells):
+        grid.set(idx, rng.random() < density)
+    grid.set(grid.index(goal), False)
+    return Labyrinth.Labyrinth(size, grid, goal)
+
+
+class RunIndexTest(unittest.TestCase):
+    def check(self, lab):
+        'compare uppermost1d with scanuppermost at every position of lab, in its current orientation'
+        for pos in itertools.product(*[range(1, dimsize+1) for dimsize in lab.size]):
+            for dim in range(2, lab.ndim):
+                x, y = pos[0], pos[1]
+                self.assertEqual(lab.uppermost1d(x, y, pos, dim), lab.scanuppermost(list(pos), dim),
+                                 (lab.axes, pos, dim))
+
+    def test_rotations(self):
+        rng = random.Random(1)
+        for size in ([4, 3, 5], [3, 4, 3, 5], [2, 3, 3, 2, 4]):
+            lab = randomlab(size, rng)
+            for rotation in range(lab.ndim):
+                self.check(lab)
+                lab.rotate()
+
+    def test_update(self):
+        rng = random.Random(2)
+        lab = randomlab([3, 4, 3, 5], rng)
+        goal = lab.grid.index(lab.goalpos)
+        for rotation in range(lab.ndim):
+            self.check(lab) # (every line is indexed: the changed ones must be forgotten)
+            changes = [(idx, rng.random() < 0.5) for idx in rng.sample(range(lab.grid.ncells), 12) if idx != goal]
+            lab.update(changes)
+            self.check(lab)
+            lab.rotate()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# Solver (see solver): shortest paths checked against a plain breadth-first search, with sparse and dense frontiers,
+# from one end or both.
+#
+# Usage: python -m unittest discover tests
+
+import unittest
+
+from common import generated, neighbors, distances
+import solver
+
+
+class SolverTest(unittest.TestCase):
+    LABS = [([9, 9, 3], 1, 1.0, 'dfs'), ([7, 7, 5], 2, 0.7, 'kruskal'), ([5, 5, 3, 3], 3, 0.8, 'dfs'),
+            ([7, 1, 5, 3, 3], 4, 0.9, 'kruskal'), ([11, 11, 1], 5, 0.5, 'dfs')]
+
+    def check(self, lab, solution):
+        'check that solution is a shortest path from the start to the goal of lab'
+        start, goal = (1,) * lab.ndim, tuple(lab.goalpos)
+        self.assertEqual(solution.length, distances(lab, start)[goal])
+        path = [tuple(pos) for pos in solution.path]
+        self.assertEqual(len(path), solution.length + 1)
+        self.assertEqual((path[0], path[-1]), (start, goal))
+        for pos, following in zip(path, path[1:]):
+            self.assertIn(following, list(neighbors(lab, pos)))
+
+    def test_lengths(self):
+        for size, seed, density, algorithm in self.LABS:
+            lab = generated(size, seed, density, algorithm)
+            self.check(lab, solver.solve(lab))
+            self.check(lab, solver.solve(lab, bidirectional=True))
+            lab.rotate()
+            self.check(lab, solver.solve(lab))
+
+    def test_dense(self):
+        # (frontiers always as bitsets: the engine switches to them from the first level)
+        engine = solver.Engine
+        class DenseEngine(engine):
+            def __init__(self, grid):
+                engine.__init__(self, grid)
+                self.threshold = 0
+        solver.Engine = DenseEngine
+        try:
+            for size, seed, density, algorithm in self.LABS:
+                lab = generated(size, seed, density, algorithm)
+                self.check(lab, solver.solve(lab))
+                self.check(lab, solver.solve(lab, bidirectional=True))
+        finally:
+            solver.Engine = engine
+
+    def test_unsolvable(self):
+        lab = generated([9, 9, 3], 6)
+        goal = lab.goalpos
+        lab.update([(lab.index(pos), True) for pos in neighbors(lab, goal)])
+        for bidirectional in (False, True):
+            solution = solver.solve(lab, bidirectional=bidirectional)
+            self.assertFalse(solution.solvable())
+            self.assertIsNone(solution.length)
+
+
+if __name__ == '__main__':
+    unittest.main()
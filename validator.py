@@ -0,0 +1,189 @@
+# Batch validation of the files of a game: every screen of the scenarios (see DimLab.read_scenario) is read as the
+# game reads it (see DimLab.prefetchstep), so that a broken file is found before a player reaches it. Labyrinths
+# are also checked for integrity (start and goal free, within the labyrinth) and solved from the start (see solver):
+# a labyrinth whose goal cannot be reached fails. Valid labyrinths can be compiled to binary files (see labfile).
+# Chunked labyrinths (see chunkstore) are too large to be solved: they are only checked for integrity, and reported
+# as unchecked (not as valid).
+# Files are checked in parallel, by a pool of processes (one per core by default).
+# A JSON manifest can be written, with one record per file: its type, the scenarios using it, whether it is valid
+# (or the error, or why it was not fully checked), and for labyrinths their size, goal, hash (see
+# labfile.labhash), number of moves to the goal, the binary file compiled and the time spent parsing, solving and
+# compiling them.
+# The compiled files keep the paths of the labyrinths, relative to the deepest directory holding them all (see
+# compiledfiles), so that labyrinths of the same name in different directories do not overwrite each other.
+#
+# Usage: python validator.py [-s scenario ...] [-j jobs] [-o outdir] [-c gzip|lzma|none] [-m manifest.json]
+#  [labfile or directory ...]
+# (by default: every scenario of the scenario directory, and every labyrinth of the labs directory)
+
+import DimLab
+import labfile
+import solver
+
+import binascii
+import multiprocessing
+import os
+import time
+
+
+SCENARIOS = 'scenario'
+
+
+def check(task):
+    """read one step of a scenario (etype, filename), and check it if it is a labyrinth. Valid labyrinths are
+    compiled to the file compiled, if given (with given compression). Returns the record of the step (see the top of
+    this module)."""
+    (etype, filename), compiled, compression = task
+    record = {'file': filename, 'type': etype, 'ok': False}
+    times = {}
+    try:
+        began = time.time()
+        data = DimLab.prefetchstep((etype, filename))[1]
+        times['parse'] = time.time() - began
+        if etype == DimLab.L:
+            checklab(data, record, times, compiled, compression)
+        record['ok'] = True
+    except (Exception, EOFError) as e:
+        record['error'] = '%s: %s' % (type(e).__name__, e)
+    record['times'] = times
+    return record
+
+def checklab(lab, record, times, compiled=None, compression='none'):
+    'check (and compile, see check) the labyrinth lab, filling its record and the time taken'
+    filename = record['file']
+    record['size'] = list(lab.size)
+    record['goal'] = list(lab.goalpos)
+    record['bytes'] = os.path.getsize(filename)
+    start = [1] * lab.ndim
+    if not lab.isfree(start):
+        raise Exception('Block at start position! (at '+str(tuple(start))+')')
+    if not solver.supports(lab):
+        # (a chunked labyrinth: too large to be solved, and already compiled)
+        record['unchecked'] = 'chunked labyrinth, not solved'
+        return
+    goal = lab.grid.position(lab.index(lab.goalpos))
+    record['hash'] = binascii.hexlify(labfile.labhash(lab.grid, goal))
+    began = time.time()
+    solution = solver.solve(lab)
+    times['solve'] = time.time() - began
+    if not solution.solvable():
+        raise Exception('Goal cannot be reached from the start!')
+    record['moves'] = solution.length
+    if compiled is not None:
+        began = time.time()
+        if not os.path.isdir(os.path.dirname(compiled)):
+            try:
+                os.makedirs(os.path.dirname(compiled))
+            except OSError:
+                pass # (made by another process meanwhile)
+        labfile.save(compiled, lab.grid, goal, compression)
+        times['compile'] = time.time() - began
+        record['compiled'] = compiled
+        record['compiledbytes'] = os.path.getsize(compiled)
+
+def steps(scenarios, labs=()):
+    """returns the steps of the given scenario files, and the given labyrinth files (or directories of them), each
+    once, as a list of ((etype, filename), names of the scenarios using it)"""
+    using = {}
+    order = []
+    def add(step, scenario=None):
+        if step not in using:
+            using[step] = []
+            order.append(step)
+        if scenario and scenario not in using[step]:
+            using[step].append(scenario)
+    for scenario in scenarios:
+        name = os.path.basename(scenario)
+        for etype, filename in DimLab.read_scenario(scenario):
+            add((etype, os.path.normpath(os.path.join(DimLab.FOLDERS[etype], filename))), name)
+    for path in labs:
+        if os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                if os.path.isfile(os.path.join(path, filename)):
+                    add((DimLab.L, os.path.normpath(os.path.join(path, filename))))
+        else:
+            add((DimLab.L, os.path.normpath(path)))
+    return [(step, using[step]) for step in order]
+
+def compiledfiles(filenames, outdir):
+    """returns the files where the given labyrinth files are compiled in outdir (as a dictionary): their paths
+    relative to the deepest directory holding them all, with the extension of labfile"""
+    directories = [os.path.dirname(os.path.abspath(filename)).split(os.sep) for filename in filenames]
+    root = os.sep.join(os.path.commonprefix(directories)) or os.sep
+    compiled = {}
+    for filename in filenames:
+        name = os.path.splitext(os.path.relpath(os.path.abspath(filename), root))[0]
+        compiled[filename] = os.path.join(outdir, name + labfile.EXTENSION)
+    # (only the extensions can still collide: a.txt and a.lab)
+    seen = {}
+    for filename in filenames:
+        if compiled[filename] in seen:
+            raise Exception('Labyrinths compiled to the same file: '+seen[compiled[filename]]+' and '+filename+'!')
+        seen[compiled[filename]] = filename
+    return compiled
+
+def validate(scenarios, labs=(), outdir=None, compression='none', jobs=None):
+    """check every step of the given scenarios and the given labyrinths (see steps), with jobs processes (default:
+    one per core), compiling the valid labyrinths to outdir (if given). Returns their records, in order."""
+    if compression not in labfile.COMPRESSIONS:
+        raise Exception('Unknown compression: '+str(compression)+' (should be one of '+
+                        ', '.join(labfile.COMPRESSIONS)+')')
+    todo = steps(scenarios, labs)
+    if outdir is not None and not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    compiled = {}
+    if outdir is not None:
+        compiled = compiledfiles([filename for (etype, filename), using in todo if etype == DimLab.L], outdir)
+    tasks = [(step, compiled.get(step[1]), compression) for step, using in todo]
+    jobs = jobs or multiprocessing.cpu_count()
+    if jobs == 1 or len(tasks) < 2:
+        records = map(check, tasks)
+    else:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            # (in batches: a small file takes less time to check than to send to a process)
+            records = pool.map(check, tasks, max(1, len(tasks) // (4*jobs)))
+        finally:
+            pool.close()
+            pool.join()
+    for record, (step, using) in zip(records, todo):
+        record['scenarios'] = using
+    return records
+
+
+if __name__ == '__main__':
+    import argparse
+    import glob
+    import json
+    import sys
+    parser = argparse.ArgumentParser(description='Check (and compile) every file of the scenarios and labyrinths.')
+    parser.add_argument('labs', nargs='*', help='labyrinth files, or directories of them (default: %s, unless '
+                                                'scenarios are given)' % DimLab.FOLDERS[DimLab.L])
+    parser.add_argument('-s', '--scenarios', nargs='+', help='scenario files (default: all those in %s, unless '
+                                                             'labyrinths are given)' % SCENARIOS)
+    parser.add_argument('-j', '--jobs', type=int, help='number of processes (default: one per core)')
+    parser.add_argument('-o', '--outdir', help='directory where the valid labyrinths are compiled')
+    parser.add_argument('-c', '--compression', default='none', choices=sorted(labfile.COMPRESSIONS),
+                        help='compression of the compiled labyrinths (default: %(default)s)')
+    parser.add_argument('-m', '--manifest', help='JSON file where the records of all the files are written')
+    args = parser.parse_args()
+    scenarios, labs = args.scenarios or [], args.labs
+    if not scenarios and not labs:
+        scenarios = sorted(glob.glob(os.path.join(SCENARIOS, '*.txt')))
+        labs = [DimLab.FOLDERS[DimLab.L]]
+    began = time.time()
+    records = validate(scenarios, labs, args.outdir, args.compression, args.jobs)
+    elapsed = time.time() - began
+    failed = [record for record in records if not record['ok']]
+    unchecked = [record for record in records if record['ok'] and 'unchecked' in record]
+    for record in failed + unchecked:
+        sys.stdout.write('%s: %s%s\n' % (record['file'], record.get('error') or 'Unchecked: '+record['unchecked'],
+                                         ' (in %s)' % ', '.join(record['scenarios']) if record['scenarios'] else ''))
+    nlabs = sum(1 for record in records if record['type'] == DimLab.L)
+    sys.stdout.write('%d files (%d labyrinths): %d valid, %d unchecked, %d failed (%.2fs)\n' % (
+        len(records), nlabs, len(records)-len(unchecked)-len(failed), len(unchecked), len(failed), elapsed))
+    if args.manifest:
+        with open(args.manifest, 'w') as ff:
+            json.dump({'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'elapsed': elapsed, 'outdir': args.outdir,
+                       'compression': args.compression, 'files': records}, ff, indent=1, sort_keys=True)
+    sys.exit(1 if failed else 0)